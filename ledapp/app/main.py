@@ -2,58 +2,67 @@
 
 from __future__ import annotations
 
-import argparse
-import asyncio
 import logging
 import sys
 
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QMetaObject, Qt, Q_ARG
+from PySide6.QtCore import QMetaObject, Qt, Q_ARG, QTimer
 
 from ..app_utils import load_app_icon
+from ..core.device_registry import get_registry
+from ..core.startup import StartupOrchestrator
 from ..gui.main_window_pyside import LEDApp_PySide
+from ..main import LAUNCHED_AT
 from ..services import config_service
+from ..util.task_manager import Priority
 
 
 async def attempt_auto_connect(app_instance: LEDApp_PySide):
-    """Try to reconnect to the previously used device in the background."""
+    """Run the startup pipeline (see :mod:`ledapp.core.startup`).
+
+    Connects to the previously used device (the last used one of the
+    device registry, else the one saved in the settings) as soon as the
+    adapter answers, while the schedule, the sun table and the location
+    load. Once the schedule is applied, the reconnect loop takes over.
+    """
     if not app_instance:
         return False
 
-    try:
-        logging.info(
-            "Short delay before auto-connect to allow Bluetooth stack to init..."
-        )
-        await asyncio.sleep(2.0)
-
+    record = get_registry().last_used()
+    if record is not None:
+        last_name, last_addr = record.as_tuple()
+    else:
         last_addr = config_service.get_setting("last_device_address")
         last_name = config_service.get_setting("last_device_name")
-        if not last_addr or not last_name:
-            logging.info(
-                "Auto-connect skipped: no previously used device saved.")
-            return False
-
-        logging.info(
-            "Auto-connect attempt: %s (%s)", last_name, last_addr
-        )
-        app_instance.selected_device = (last_name, last_addr)
+    device = (last_name, last_addr) if last_addr and last_name else None
+    if device:
+        logging.info("Auto-connect attempt: %s (%s)", last_name, last_addr)
+        app_instance.selected_device = device
         QMetaObject.invokeMethod(
             app_instance,
             "update_connection_status_gui",
             Qt.ConnectionType.QueuedConnection,
             Q_ARG(str, "connecting"),
         )
-        future = app_instance.async_helper.run_async_task(
-            app_instance.ble.connect(last_addr),
-            app_instance.connect_results_signal,
-            app_instance.connect_error_signal,
-        )
-        if not future:
-            logging.error(
-                "Auto-connect: failed to start connection task")
+    else:
+        logging.info("Auto-connect skipped: no previously used device saved.")
+        app_instance._initial_connection_attempted = True
+
+    orchestrator = StartupOrchestrator(
+        app_instance,
+        device,
+        launched_at=LAUNCHED_AT,
+        on_connected=lambda: app_instance.connect_results_signal.emit(True),
+        on_connect_error=app_instance.connect_error_signal.emit,
+        on_sun=lambda sun_info: setattr(app_instance, "sun_info", sun_info),
+        on_ready=lambda _report: app_instance.run_in_gui_signal.emit(
+            app_instance.gui_manager.start_reconnect_loop),
+    )
+    try:
+        report = await orchestrator.run()
     except Exception as e:  # pragma: no cover - just in case
         logging.error(
-            "Unexpected error starting auto-connect: %s", e,
+            "Unexpected error in the startup pipeline: %s", e,
             exc_info=True,
         )
         if hasattr(app_instance, "_handle_connect_error"):
@@ -64,11 +73,12 @@ async def attempt_auto_connect(app_instance: LEDApp_PySide):
                 Qt.ConnectionType.QueuedConnection,
                 Q_ARG(str, error_msg),
             )
+        return False
     finally:
         app_instance._initial_connection_attempted = True
         logging.info("_initial_connection_attempted flag set to True")
 
-    return None
+    return report.ready_after is not None
 
 
 class LEDApplication:
@@ -91,11 +101,11 @@ class LEDApplication:
 
         if self.args.tray:
             logging.info("Started with --tray")
-            if config_service.get_setting("auto_connect_on_startup"):
-                async def delayed():
-                    await asyncio.sleep(0.5)
-                    await attempt_auto_connect(self.main_window)
-                self.main_window.async_helper.run_async_task(delayed())
+            if self.args.connect:
+                logging.info("Auto-connect skipped: --connect given.")
+            elif config_service.get_setting("auto_connect_on_startup"):
+                self.main_window.async_helper.run_async_task(
+                    attempt_auto_connect(self.main_window), priority=Priority.SCHEDULE, key="auto_connect")
             else:
                 logging.info(
                     "Auto-connect disabled by configuration.")
@@ -105,15 +115,19 @@ class LEDApplication:
             self.main_window._initial_connection_attempted = True
             self.main_window.show()
 
+        if self.args.profile_cpu or self.args.profile_mem:
+            self.main_window.start_profiling(cpu=self.args.profile_cpu, mem=self.args.profile_mem)
+
+        if self.args.connect or self.args.color:
+            # Same path as a handoff from a second launch
+            QTimer.singleShot(500, lambda: self.main_window.async_helper.run_async_task(
+                self.main_window.control.activate(connect=self.args.connect, color=self.args.color),
+                key="activate"))
+
     @staticmethod
     def _parse_args(argv: list[str]):
-        parser = argparse.ArgumentParser()
-        parser.add_argument(
-            "--tray",
-            action="store_true",
-            help="Start hidden in the system tray.",
-        )
-        return parser.parse_args(argv)
+        from ..main import build_arg_parser
+        return build_arg_parser().parse_args(argv)
 
     def run(self) -> int:
         """Start the Qt event loop."""
@@ -5,6 +5,10 @@ LONGITUDE = 19.1931
 TIMEZONE = "UTC+2" # Ezt a kódrészlet már nem használja aktívan, a tzlocal/pytz kezeli
 CONFIG_FILE = "led_schedule.json" # Ütemezési beállítások fájlja
 SETTINGS_FILE = "led_settings.json" # Általános beállítások fájlja (config_manager használja)
+SCENES_FILE = "led_scenes.json" # Kulcskockás jelenetek (scene_timeline használja)
+DEVICES_FILE = "led_devices.json" # Ismert eszközök nyilvántartása (core.device_registry)
+TRACE_FILE = "led_trace.json" # Chrome/Perfetto trace export (util.tracing)
+PROFILE_DIR = "profiles" # cProfile / tracemalloc dumpok könyvtára (util.profiling)
 CHARACTERISTIC_UUID = "0000fff3-0000-1000-8000-00805f9b34fb"
 
 DAYS = ["Hétfő", "Kedd", "Szerda", "Csütörtök", "Péntek", "Szombat", "Vasárnap"]
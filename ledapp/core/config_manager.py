@@ -4,6 +4,13 @@ from ..services.config_service import (
     load_settings,
     get_setting,
     set_setting,
-    CURRENT_SETTINGS,
     DEFAULT_SETTINGS,
 )
+
+
+def __getattr__(name):
+    # CURRENT_SETTINGS is loaded on first access, not when this module is imported
+    if name == "CURRENT_SETTINGS":
+        from ..services import config_service
+        return config_service.CURRENT_SETTINGS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
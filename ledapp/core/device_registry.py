@@ -0,0 +1,364 @@
+"""Persistent registry of the known LED controllers.
+
+``led_devices.json`` (next to ``led_settings.json``) remembers every
+controller seen by a scan or used for a connection:
+
+* the advertised name, last address and the time it was last seen;
+* the recent RSSI readings (``RSSI_HISTORY`` of them, newest last);
+* the last connection time, model and protocol;
+* user data: a friendly name, groups and per-device ``settings``.
+
+The file is read once, on the first :func:`get_registry` call. Three
+in-memory indexes sit on top of it: by address, by casefolded name
+(advertised and friendly) and by group. Auto-connect, the daemon, the
+``connect`` of a second launch and the reconnect loop look devices up
+there instead of scanning by name. Changes update the indexes in place.
+A scan writes the file once per batch, a connection once per connect.
+
+Without a registry file the record of the ``last_device_address`` /
+``last_device_name`` pair of the settings is the seed. That pair is still
+written, so older versions keep working.
+
+Example file::
+
+    {
+        "version": 1,
+        "last_used": "AA:BB:CC:DD:EE:FF",
+        "devices": [
+            {"address": "AA:BB:CC:DD:EE:FF", "name": "ELK-BLEDOM", "friendly_name": "Nappali",
+             "groups": ["földszint"], "rssi": [[1767261600.0, -61]], "settings": {}, ...}
+        ]
+    }
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields, replace
+
+from ..config import DEVICES_FILE
+
+FILE_VERSION = 1
+RSSI_HISTORY = 20  # RSSI readings kept per device
+
+
+USER_FIELDS = {"friendly_name": str, "groups": list, "model": str, "protocol": str, "settings": dict}
+
+
+def _key(text: str | None) -> str:
+    return (text or "").strip().casefold()
+
+
+def _check_user_fields(changes: dict) -> dict:
+    """``changes`` of the user data fields, type-checked; ``groups`` deduplicated. Raises ValueError."""
+    unknown = set(changes) - set(USER_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown device fields: {', '.join(sorted(unknown))}")
+    checked = {}
+    for name, value in changes.items():
+        if not isinstance(value, USER_FIELDS[name]):
+            raise ValueError(f"device field {name} must be a {USER_FIELDS[name].__name__}, got {type(value).__name__}")
+        if name == "groups":
+            if not all(isinstance(group, str) for group in value):
+                raise ValueError("device field groups must be a list of strings")
+            value = list(dict.fromkeys(value))
+        checked[name] = value
+    return checked
+
+
+@dataclass
+class DeviceRecord:
+    address: str
+    name: str = ""  # advertised name
+    friendly_name: str = ""
+    groups: list[str] = field(default_factory=list)
+    model: str = ""
+    protocol: str = ""
+    last_seen: float | None = None  # epoch seconds
+    last_connected: float | None = None
+    rssi: list[list[float]] = field(default_factory=list)  # [[epoch seconds, dBm], ...], newest last
+    settings: dict = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        return self.friendly_name or self.name or self.address
+
+    @property
+    def has_user_data(self) -> bool:
+        """Identified by the user (friendly name, groups or settings): not interchangeable with its namesakes."""
+        return bool(self.friendly_name or self.groups or self.settings)
+
+    @property
+    def last_rssi(self) -> int | None:
+        return self.rssi[-1][1] if self.rssi else None
+
+    def as_tuple(self) -> tuple[str, str]:
+        """``(name, address)``, the shape of ``app.selected_device``."""
+        return (self.name or self.label, self.address)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DeviceRecord":
+        """Raises TypeError / ValueError on an invalid entry."""
+        known = {f.name for f in fields(cls)}
+        record = cls(**{k: v for k, v in data.items() if k in known})
+        if not isinstance(record.address, str) or not isinstance(record.name, str):
+            raise ValueError("address and name must be strings")
+        _check_user_fields({k: v for k, v in data.items() if k in USER_FIELDS})
+        record.address = record.address.upper()
+        return record
+
+
+class DeviceRegistry:
+    """Known devices with address, name and group indexes; thread-safe."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._devices = {}  # address -> DeviceRecord
+        self._by_name = {}  # casefolded advertised / friendly name -> set of addresses
+        self._by_group = {}  # casefolded group -> set of addresses
+        self._last_used = None  # address
+
+    # --- loading / saving ----------------------------------------------
+    def _path(self) -> str:
+        if self.path is None:
+            from ..services import config_service
+            self.path = config_service.get_data_path(DEVICES_FILE)
+        return self.path
+
+    def load(self):
+        """Reads the file (once); seeds from the settings when there is none."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            path = self._path()
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                self._seed()
+                return
+            except (OSError, ValueError) as e:
+                logging.warning("Device registry: cannot read %s (%s); starting empty", path, e)
+                return
+            for raw in data.get("devices", []):
+                try:
+                    self._index(DeviceRecord.from_dict(raw))
+                except (TypeError, ValueError) as e:
+                    logging.warning("Device registry: skipping invalid entry %r (%s)", raw, e)
+            last_used = (data.get("last_used") or "").upper()
+            self._last_used = last_used if last_used in self._devices else None
+            logging.info("Device registry: %d devices loaded from %s", len(self._devices), path)
+
+    def _seed(self):
+        from ..services import config_service
+        address = config_service.get_setting("last_device_address")
+        if address:
+            record = DeviceRecord(address.upper(), config_service.get_setting("last_device_name") or "")
+            self._index(record)
+            self._last_used = record.address
+
+    def save(self):
+        """Writes the file atomically (temporary file + rename)."""
+        with self._lock:
+            self.load()
+            data = {"version": FILE_VERSION, "last_used": self._last_used,
+                    "devices": [record.to_dict() for record in self._devices.values()]}
+            path = self._path()
+            tmp = path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, path)
+            except OSError as e:
+                logging.error("Device registry: cannot write %s: %s", path, e)
+
+    # --- indexes -------------------------------------------------------
+    def _index(self, record: DeviceRecord):
+        self._devices[record.address] = record
+        for name in {_key(record.name), _key(record.friendly_name)} - {""}:
+            self._by_name.setdefault(name, set()).add(record.address)
+        for group in record.groups:
+            self._by_group.setdefault(_key(group), set()).add(record.address)
+
+    def _unindex(self, record: DeviceRecord):
+        self._devices.pop(record.address, None)
+        for index, keys in ((self._by_name, (record.name, record.friendly_name)), (self._by_group, record.groups)):
+            for key in map(_key, keys):
+                addresses = index.get(key)
+                if addresses is not None:
+                    addresses.discard(record.address)
+                    if not addresses:
+                        del index[key]
+
+    def _records(self, addresses) -> list[DeviceRecord]:
+        """Records of ``addresses``, most recently seen or used first."""
+        records = [self._devices[address] for address in addresses or ()]
+        return sorted(records, key=lambda r: max(r.last_seen or 0, r.last_connected or 0), reverse=True)
+
+    # --- lookups -------------------------------------------------------
+    def get(self, address: str | None) -> DeviceRecord | None:
+        with self._lock:
+            self.load()
+            return self._devices.get((address or "").upper())
+
+    def find(self, name: str | None) -> list[DeviceRecord]:
+        """Devices with this advertised or friendly name (case-insensitive)."""
+        with self._lock:
+            self.load()
+            return self._records(self._by_name.get(_key(name)))
+
+    def group(self, name: str | None) -> list[DeviceRecord]:
+        with self._lock:
+            self.load()
+            return self._records(self._by_group.get(_key(name)))
+
+    def groups(self) -> dict[str, list[str]]:
+        """``{group: [addresses]}``; a group written in several cases is listed under its first spelling."""
+        with self._lock:
+            self.load()
+            result, spelling = {}, {}
+            for record in self._devices.values():
+                for group in record.groups:
+                    result.setdefault(spelling.setdefault(_key(group), group), []).append(record.address)
+            return result
+
+    def resolve(self, text: str | None) -> DeviceRecord | None:
+        """An address, a name or a group to one device (the most recent one of a name or group)."""
+        record = self.get(text)
+        if record is None:
+            matches = self.find(text) or self.group(text)
+            record = matches[0] if matches else None
+        return record
+
+    def last_used(self) -> DeviceRecord | None:
+        with self._lock:
+            self.load()
+            return self._devices.get(self._last_used) if self._last_used else None
+
+    def all(self) -> list[DeviceRecord]:
+        with self._lock:
+            self.load()
+            return self._records(self._devices)
+
+    # --- updates -------------------------------------------------------
+    def _upsert(self, address: str, name: str | None) -> DeviceRecord:
+        address = address.upper()
+        record = self._devices.get(address)
+        if record is None:
+            record = DeviceRecord(address, name or "")
+            self._index(record)
+        elif name and name != record.name:
+            self._unindex(record)
+            record.name = name
+            self._index(record)
+        return record
+
+    def observe(self, devices, now: float | None = None):
+        """Scan results: ``(name, address, rssi)`` tuples (``rssi`` may be None); one save per batch."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.load()
+            for name, address, rssi in devices:
+                record = self._upsert(address, name)
+                record.last_seen = now
+                if rssi is not None:
+                    record.rssi.append([now, rssi])
+                    del record.rssi[:-RSSI_HISTORY]
+            self.save()
+
+    def mark_connected(self, name: str | None, address: str, now: float | None = None) -> DeviceRecord:
+        """A successful connection: the device becomes the last used one."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.load()
+            record = self._upsert(address, name)
+            record.last_seen = record.last_connected = now
+            self._last_used = record.address
+            self.save()
+            return record
+
+    def forget_last_used(self):
+        with self._lock:
+            self.load()
+            if self._last_used is not None:
+                self._last_used = None
+                self.save()
+
+    def readdress(self, old: str, new: str) -> DeviceRecord | None:
+        """The device at ``old`` now advertises at ``new`` (e.g. a rotated address); keeps its user data.
+
+        A record already at ``new`` is another device as far as the registry
+        knows; one with user data is never replaced (returns None). A bare
+        one (only seen by a scan) is merged: its scan history moves over.
+        """
+        with self._lock:
+            self.load()
+            record = self._devices.get(old.upper())
+            if record is None or old.upper() == new.upper():
+                return record
+            existing = self._devices.get(new.upper())
+            if existing is not None and existing.has_user_data:
+                logging.warning("Device registry: not moving %s to %s, that address belongs to %s",
+                                record.label, new, existing.label)
+                return None
+            self._unindex(record)
+            if existing is not None:
+                self._unindex(existing)
+                record.rssi = sorted(record.rssi + existing.rssi)[-RSSI_HISTORY:]
+            record.address = new.upper()
+            record.last_seen = time.time()
+            self._index(record)
+            if self._last_used == old.upper():
+                self._last_used = record.address
+            self.save()
+            logging.info("Device registry: %s moved from %s to %s", record.label, old, new)
+            return record
+
+    def update(self, address: str, **changes) -> DeviceRecord:
+        """Sets user data (``friendly_name``, ``groups``, ``model``, ``protocol``, ``settings``)."""
+        changes = _check_user_fields(changes)
+        with self._lock:
+            self.load()
+            record = self._devices.get(address.upper())
+            if record is None:
+                raise KeyError(address)
+            updated = replace(record, **changes)
+            self._unindex(record)
+            self._index(updated)
+            self.save()
+            return updated
+
+    def remove(self, address: str) -> bool:
+        with self._lock:
+            self.load()
+            record = self._devices.get(address.upper())
+            if record is None:
+                return False
+            self._unindex(record)
+            if self._last_used == record.address:
+                self._last_used = None
+            self.save()
+            return True
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DeviceRegistry:
+    """The process-wide registry; the file is read on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DeviceRegistry()
+        return _registry
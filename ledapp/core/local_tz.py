@@ -0,0 +1,6 @@
+"""A helyi időzóna egyetlen forrása (ütemező, GUI és háttér ciklus közösen használja)."""
+
+from pytz import timezone as pytz_timezone
+
+LOCAL_TZ = pytz_timezone("Europe/Budapest")
+UTC_TZ = pytz_timezone("UTC")
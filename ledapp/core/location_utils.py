@@ -1,11 +1,10 @@
 # core/location_utils.py (Részletesebb hibalogolással)
 
-import requests
 from datetime import datetime
-from suntime import Sun
-from pytz import timezone as pytz_timezone
 import traceback # Importáljuk a tracebacket
 
+# A requests és a suntime csak az első hívásnál töltődik be (induláskor nem kell, lásd ledapp.startup_bench)
+
 # Logolás importálása (ha a reconnect_handler definiálja)
 try:
     from .reconnect_handler import log_event
@@ -15,11 +14,11 @@ except ImportError:
 
 
 BUDAPEST_COORDS = (47.4338, 19.1931)
-LOCAL_TZ = pytz_timezone("Europe/Budapest") # Feltételezzük, hogy ez létezik
-UTC_TZ = pytz_timezone("UTC")
+from .local_tz import LOCAL_TZ, UTC_TZ
 
 def get_coordinates():
     """Megpróbálja lekérni a koordinátákat IP alapján."""
+    import requests
     try:
         log_event("Koordináták lekérése (ip-api.com)...")
         # Növelt timeout és User-Agent beállítása
@@ -54,6 +53,7 @@ def get_sun_times(lat, lon, now=None):
         # Dátum objektum a now alapján, vagy a mai nap, ha nincs megadva
         target_date = now.date() if now else datetime.now(LOCAL_TZ).date()
 
+        from suntime import Sun
         sun = Sun(lat, lon)
         # Használjuk a dátum objektumot a számításhoz
         sunrise_utc_dt = sun.get_sunrise_time(target_date, UTC_TZ)
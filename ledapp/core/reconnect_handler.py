@@ -1,28 +1,26 @@
 # LEDapp/core/reconnect_handler.py (Éjfél átnyúlás javítással)
 import asyncio
-import time
-from datetime import datetime, timedelta, time as dt_time
+from datetime import datetime
 import traceback
 import threading
+import time
 import pytz
 
 from bleak import BleakClient, BleakScanner, BleakError, BLEDevice
 
+from ..util import metrics, rate_limit, tracing
+from ..util.clock import get_clock
+from ..util.power import POWER
+from .device_registry import get_registry
+
 # Szükséges importok
 try:
     from ..config import COLORS, DAYS, CHARACTERISTIC_UUID
-    try:
-        from ..gui.gui2_schedule_logic import LOCAL_TZ
-    except ImportError:
-        try:
-            from ..gui.gui2_schedule_logic import LOCAL_TZ
-        except ImportError:
-            print("Figyelmeztetés: LOCAL_TZ import sikertelen, UTC használata a handlerben.")
-            LOCAL_TZ = pytz.utc
-    from .sun_logic import DAYS_HU
+    from .local_tz import LOCAL_TZ
+    from .schedule_engine import ScheduleEngine, OFF_COMMAND
 except ImportError as e:
     print(f"HIBA: Nem sikerült importálni a szükséges config/logic elemeket a reconnect_handler.py-ban: {e}")
-    COLORS, DAYS, DAYS_HU = [], [], {}
+    COLORS, DAYS = [], []
     CHARACTERISTIC_UUID = "0000fff3-0000-1000-8000-00805f9b34fb"
     LOCAL_TZ = pytz.utc
 
@@ -37,18 +35,43 @@ RESCAN_DELAY = 5.0
 LOOP_SLEEP = 0.5
 SCHEDULE_CHECK_INTERVAL = 5.0
 
+# Metrikák (util.metrics); a rögzítés olcsó, élesben is bekapcsolva marad
+CONNECTED = metrics.gauge("ble_connected", "1 while the supervised device is connected")
+CONNECT_ATTEMPTS = metrics.counter("reconnect_attempts", "Connect attempts of the reconnect loop")
+CONNECT_ERRORS = metrics.counter("reconnect_failures", "Failed connect attempts of the reconnect loop")
+CONNECT_TIME = metrics.histogram("reconnect_connect_seconds", "Successful connect duration in the reconnect loop")
+RESCANS = metrics.counter("reconnect_rescans", "Rescans after MAX_CONNECT_ATTEMPTS failures")
+DISCONNECTS = metrics.counter("reconnect_disconnects", "Lost connections noticed by the reconnect loop")
+PINGS = metrics.histogram("keepalive_ping_seconds", "Keep-alive write duration")
+PING_FAILURES = metrics.counter("keepalive_ping_failures", "Failed keep-alive writes")
+SCHEDULE_CHECKS = metrics.histogram("schedule_check_seconds", "check_and_apply_schedule duration")
+SCHEDULE_CORRECTIONS = metrics.counter("schedule_corrections", "Commands sent to correct the schedule state")
+SCHEDULE_CORRECTION_FAILURES = metrics.counter("schedule_correction_failures", "Failed schedule correction writes")
+
 def log_event(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = get_clock().now().strftime("%Y-%m-%d %H:%M:%S")
     entry = f"[{timestamp}] {message}"
     print(entry)
 
-async def rescan_and_find_device(target_name):
-    # ... (változatlan) ...
+async def write_limited(client, hex_command, clock=None):
+    """A loop saját írása (korrekció, ping) az eszköz sebességkorlátozóján át (util.rate_limit), mint a BLEService-é."""
+    limiter = rate_limit.for_device(getattr(client, 'address', None))
+    await limiter.acquire(clock)
+    try:
+        await client.write_gatt_char(CHARACTERISTIC_UUID, bytes.fromhex(hex_command), response=False)
+    except Exception:
+        limiter.record_failure(client.is_connected) # Megszakadt kapcsolatnál nem csökkenti a sebességet
+        raise
+    limiter.record_success()
+
+async def rescan_and_find_device(target_name, exclude=()):
+    """Név szerint keresi az eszközt; az ``exclude`` címeit (azonos nevű másik ismert lámpa) kihagyja."""
     log_event(f"Új keresés indítása a(z) '{target_name}' nevű eszközhöz...")
     try:
-        devices = await BleakScanner.discover(timeout=15.0)
+        with tracing.span("reconnect.rescan", "reconnect", name=target_name):
+            devices = await BleakScanner.discover(timeout=15.0)
         for device in devices:
-            if device.name == target_name:
+            if device.name == target_name and device.address.upper() not in exclude:
                 log_event(f"Eszköz újra megtalálva: {device.name} ({device.address})")
                 return device.address
         log_event(f"'{target_name}' nevű eszköz nem található a keresés során.")
@@ -61,126 +84,59 @@ async def rescan_and_find_device(target_name):
         return None
 
 
-def _get_schedule_times(schedule_data, date_for_calc, app_sunrise, app_sunset):
-    """
-    Segédfüggvény egy adott nap schedule adataiból a be/ki időpontok kiszámításához.
-    Visszaadja (on_time_dt, off_time_dt, color_name) tuple-t.
-    A dt objektumok már időzóna-aware objektumok lesznek.
-    """
-    on_time_dt = None
-    off_time_dt = None
-    color_name = schedule_data.get("color")
-
-    # --- Bekapcsolási idő ---
-    if schedule_data.get("sunrise", False):
-        offset = schedule_data.get("sunrise_offset", 0)
-        if app_sunrise:
-            try:
-                # app_sunrise már TZ-aware
-                on_time_dt = app_sunrise.replace(year=date_for_calc.year, month=date_for_calc.month, day=date_for_calc.day) + timedelta(minutes=offset)
-            except Exception: pass # Hiba esetén None marad
-    else:
-        on_time_str = schedule_data.get("on_time")
-        if on_time_str:
-            try:
-                time_obj = dt_time.fromisoformat(on_time_str)
-                naive_dt = datetime.combine(date_for_calc, time_obj)
-                on_time_dt = LOCAL_TZ.localize(naive_dt)
-            except ValueError: pass
-
-    # --- Kikapcsolási idő ---
-    if schedule_data.get("sunset", False):
-        offset = schedule_data.get("sunset_offset", 0)
-        if app_sunset:
-            try:
-                # app_sunset már TZ-aware
-                off_time_dt = app_sunset.replace(year=date_for_calc.year, month=date_for_calc.month, day=date_for_calc.day) + timedelta(minutes=offset)
-            except Exception: pass
-    else:
-        off_time_str = schedule_data.get("off_time")
-        if off_time_str:
-            try:
-                time_obj = dt_time.fromisoformat(off_time_str)
-                naive_dt = datetime.combine(date_for_calc, time_obj)
-                off_time_dt = LOCAL_TZ.localize(naive_dt)
-            except ValueError: pass
-
-    # Éjfél átnyúlás kezelése a kikapcsolási időnél
-    if on_time_dt and off_time_dt and off_time_dt <= on_time_dt:
-        off_time_dt += timedelta(days=1)
-
-    return on_time_dt, off_time_dt, color_name
-
-
-async def check_and_apply_schedule(app, client):
-     """Ellenőrzi az ütemezést (aktuális ÉS előző napi átnyúlást) és korrigál."""
-     if not app or not hasattr(app, 'schedule') or not app.schedule or not client or not client.is_connected:
-         return
+def request_schedule_check(app):
+    """Kéri, hogy a kapcsolatfigyelő a következő körben azonnal ellenőrizze az ütemezést."""
+    app._schedule_check_requested = True
+
 
-     now_local = datetime.now(LOCAL_TZ)
-     today_date = now_local.date()
-     yesterday_date = today_date - timedelta(days=1)
+def get_schedule_engine(app):
+    """Visszaadja az app ütemező motorját; ha még nincs, a schedule dictből építi fel."""
+    engine = getattr(app, 'schedule_engine', None)
+    if engine is None:
+        engine = ScheduleEngine.from_schedule(app.schedule)
+        app.schedule_engine = engine
+    return engine
 
-     today_name_py = now_local.strftime('%A')
-     today_name_hu = DAYS_HU.get(today_name_py, today_name_py)
 
-     yesterday_name_py = (now_local - timedelta(days=1)).strftime('%A')
-     yesterday_name_hu = DAYS_HU.get(yesterday_name_py, yesterday_name_py)
+async def check_and_apply_schedule(app, client, clock=None):
+    """Ellenőrzi az ütemezést (aktuális ÉS előző napi átnyúlást) és korrigál.
 
-     # Adatok lekérése a mai és tegnapi napra
-     today_schedule_data = app.schedule.get(today_name_hu, {})
-     yesterday_schedule_data = app.schedule.get(yesterday_name_hu, {})
+    A clock paraméterrel (pl. VirtualClock) a szimulátor ugyanezt a logikát futtatja.
+    Minden hívás bekerül a schedule_check_seconds hisztogramba, a korai kilépések is.
+    """
+    started = time.perf_counter()
+    try:
+        await _check_and_apply_schedule(app, client, clock or get_clock())
+    finally:
+        SCHEDULE_CHECKS.observe(time.perf_counter() - started)
+
+
+async def _check_and_apply_schedule(app, client, clock):
+     if not app or not hasattr(app, 'schedule') or not app.schedule or not client or not client.is_connected:
+         return
+     if getattr(app, 'active_scene', None):
+         return # Jelenet fut, az ütemezés nem avatkozik bele
 
-     # Napkelte/napnyugta adatok lekérése (már TZ-aware objektumoknak kell lenniük)
+     now_local = clock.now(LOCAL_TZ)
+     engine = get_schedule_engine(app)
+
+     # Napkelte/napnyugta adatok (TZ-aware, a motor csak a napszakot használja belőlük)
      app_sunrise_today = app.sunrise if hasattr(app, 'sunrise') and app.sunrise else None
      app_sunset_today = app.sunset if hasattr(app, 'sunset') and app.sunset else None
-     # A tegnapi napkelte/napnyugta nem releváns az átnyúlás szempontjából,
-     # a tegnapi napra vonatkozó számítást a tegnapi dátummal végezzük.
-
-     should_be_on = False
-     final_target_color_name = None
-     final_target_hex_code = None
-     final_target_hex_value = None
 
      try:
-         # --- Előző napról átnyúló intervallum ellenőrzése ---
-         if yesterday_schedule_data:
-             on_dt_y, off_dt_y, color_y = _get_schedule_times(
-                 yesterday_schedule_data, yesterday_date, None, None # Tegnapi napkelte/nyugta nem kell itt
-             )
-             # Csak akkor releváns, ha a kikapcsolás átnyúlik a mai napra ÉS az aktuális idő még előtte van
-             if off_dt_y and off_dt_y.date() == today_date and now_local < off_dt_y:
-                 # És persze a bekapcsolásnak is léteznie kellett tegnap
-                 if on_dt_y and now_local >= on_dt_y: # Technikaiag az on_dt_y tegnapra vonatkozik
-                      should_be_on = True
-                      final_target_color_name = color_y
-                      log_event(f"SCHEDULE CHECK: Aktív intervallum tegnapról ({yesterday_name_hu}): {on_dt_y.strftime('%H:%M')} - {off_dt_y.strftime('%H:%M')}, Szín: {color_y}")
-
-
-         # --- Aktuális napi intervallum ellenőrzése ---
-         # Csak akkor nézzük, ha még nem találtunk aktív intervallumot tegnapról
-         if not should_be_on and today_schedule_data:
-             on_dt_t, off_dt_t, color_t = _get_schedule_times(
-                 today_schedule_data, today_date, app_sunrise_today, app_sunset_today
-             )
-             # Ellenőrizzük, hogy az aktuális idő a mai intervallumban van-e
-             if on_dt_t and off_dt_t and on_dt_t <= now_local < off_dt_t:
-                 should_be_on = True
-                 final_target_color_name = color_t
-                 log_event(f"SCHEDULE CHECK: Aktív intervallum ma ({today_name_hu}): {on_dt_t.strftime('%H:%M')} - {off_dt_t.strftime('%H:%M')}, Szín: {color_t}")
-
-         # --- Színkód kikeresése, ha bekapcsolva kell lennie ---
-         if should_be_on and final_target_color_name:
-             target_color_info = next((c for c in COLORS if c[0] == final_target_color_name), None)
-             if target_color_info:
-                 final_target_hex_code = target_color_info[2] # Parancs
-                 final_target_hex_value = target_color_info[1] # Érték (#rrggbb)
-             else:
+         # --- Kiértékelés (mai és tegnapról átnyúló intervallumok egyaránt) ---
+         decision = engine.evaluate(now_local, app_sunrise_today, app_sunset_today)
+         should_be_on = decision.should_be_on
+         final_target_color_name = decision.color_name
+         final_target_hex_code = decision.command
+         if decision.interval:
+             active = decision.interval
+             log_event(f"SCHEDULE CHECK: Aktív intervallum ({active.rule.name}): {active.start.strftime('%m.%d %H:%M')} - {active.end.strftime('%m.%d %H:%M')}, Szín: {active.color}")
+             if not should_be_on:
                  # Ha a névhez nincs szín (pl. "Nincs kiválasztva"), akkor mégsem kell bekapcsolva lennie
-                 should_be_on = False
                  log_event(f"SCHEDULE CHECK: Aktív intervallumhoz ('{final_target_color_name}') nincs érvényes szín rendelve.")
 
-
          # --- Korrekció végrehajtása ---
          correction_needed = False
          command_to_send = None
@@ -189,28 +145,32 @@ async def check_and_apply_schedule(app, client):
 
          if should_be_on:
              # Ha be kellene kapcsolva lennie, de nincs, VAGY be van, de nem jó színnel
-             if not app.is_led_on or app.last_color_hex != final_target_hex_value:
+             # last_color_hex a GUI-hoz hasonlóan a parancsot tárolja
+             if not app.is_led_on or app.last_color_hex != final_target_hex_code:
                  log_event(f"SCHEDULE CORRECTION: Bekapcsolás/színváltás -> {final_target_color_name} ({now_local.strftime('%H:%M:%S')})")
                  command_to_send = final_target_hex_code
                  new_app_state_on = True
-                 new_app_state_color = final_target_hex_value
+                 new_app_state_color = final_target_hex_code
                  correction_needed = True
          else: # should_be_off
              # Ha ki kellene kapcsolva lennie, de be van kapcsolva
              if app.is_led_on:
                  log_event(f"SCHEDULE CORRECTION: Kikapcsolás ({now_local.strftime('%H:%M:%S')})")
-                 command_to_send = "7e00050300000000ef" # Kikapcsoló parancs
+                 command_to_send = OFF_COMMAND # Kikapcsoló parancs
                  new_app_state_on = False
                  # new_app_state_color marad az utolsó szín
                  correction_needed = True
 
          if correction_needed and command_to_send:
              try:
-                 await client.write_gatt_char(CHARACTERISTIC_UUID, bytes.fromhex(command_to_send), response=False)
+                 with tracing.span("schedule.correction", "schedule", command=command_to_send):
+                     await write_limited(client, command_to_send, clock)
+                 SCHEDULE_CORRECTIONS.inc()
                  app.is_led_on = new_app_state_on
                  app.last_color_hex = new_app_state_color
-                 app.last_user_input = time.time()
+                 app.last_user_input = clock.time()
              except Exception as e:
+                 SCHEDULE_CORRECTION_FAILURES.inc()
                  log_event(f"HIBA az ütemezés korrekciós parancsának küldésekor: {e}")
 
      except Exception as e:
@@ -218,8 +178,15 @@ async def check_and_apply_schedule(app, client):
           traceback.print_exc()
 
 
-async def start_ble_connection_loop(app, stop_event: threading.Event):
-    """Folyamatosan figyeli a kapcsolatot, újracsatlakozik, ébren tartja és ellenőrzi az ütemezést."""
+async def start_ble_connection_loop(app, stop_event: threading.Event, clock=None, client_factory=None):
+    """Folyamatosan figyeli a kapcsolatot, újracsatlakozik, ébren tartja és ellenőrzi az ütemezést.
+
+    Minden idő- és várakozáskezelés a clockon keresztül megy, így VirtualClockkal
+    egy többnapos futás is másodpercek alatt lejátszható. A client_factory
+    (alapból BleakClient) helyett a soak teszt (ledapp.soak) helyettesítő klienst ad.
+    """
+    clock = clock or get_clock()
+    client_factory = client_factory or BleakClient
     # ... (Függvény eleje, változók inicializálása változatlan) ...
     if not app.selected_device or not app.selected_device[0]:
         log_event("Hiba: Nincs kiválasztott eszköznév a kapcsolattartáshoz. Loop leáll.")
@@ -228,9 +195,10 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
     original_device_name = app.selected_device[0]
     current_address = app.selected_device[1]
     log_event(f"Kapcsolat figyelő indítása: '{original_device_name}' ({current_address})")
-    last_ping_time = time.time()
+    last_ping_time = clock.time()
     last_schedule_check_time = 0
     connection_attempts = 0
+    tried_known = set() # A nyilvántartásból már kipróbált címek a mostani kimaradás alatt
 
     while True:
         if stop_event.is_set():
@@ -244,6 +212,9 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
             if not current_client or not current_client.is_connected:
                 # ... (Újracsatlakozási logika változatlan, lásd előző válaszban) ...
                 if app.connection_status != "disconnected":
+                     if app.connection_status == "connected":
+                         DISCONNECTS.inc()
+                     CONNECTED.set(0)
                      if hasattr(app, 'connection_status_signal'):
                          app.connection_status_signal.emit("disconnected")
                      app.connection_status = "disconnected"
@@ -252,8 +223,26 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
 
                 if connection_attempts >= MAX_CONNECT_ATTEMPTS:
                     log_event("Maximum csatlakozási kísérlet elérve, újrakeresés...")
-                    new_address = await rescan_and_find_device(original_device_name)
                     connection_attempts = 0
+                    tried_known.add(current_address.upper())
+                    # Előbb a nyilvántartás névindexe: az eszköz korábban látott másik címe, keresés nélkül.
+                    # A gyári név sok lámpán azonos; a felhasználó által azonosított (barátságos név,
+                    # csoport, beállítás) névrokon másik lámpa, arra nem váltunk át.
+                    namesakes = get_registry().find(original_device_name)
+                    claimed = {r.address for r in namesakes
+                               if r.has_user_data and r.address != current_address.upper()}
+                    known = [r.address for r in namesakes
+                             if r.address not in tried_known and r.address not in claimed]
+                    if known:
+                        new_address = known[0]
+                        log_event(f"Ismert másik cím a nyilvántartásból: {new_address}")
+                    else:
+                        RESCANS.inc()
+                        tried_known.clear()
+                        new_address = await rescan_and_find_device(original_device_name, exclude=claimed)
+                        if new_address and new_address.upper() != current_address.upper():
+                            await asyncio.get_running_loop().run_in_executor(
+                                None, get_registry().readdress, current_address, new_address)
                     if new_address:
                         if new_address != current_address:
                              log_event(f"Eszköz új címen található: {new_address}")
@@ -264,7 +253,7 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
                     else:
                         log_event(f"Eszköz nem található keresés után sem. Várakozás ({RESCAN_DELAY}s)...")
                         if stop_event.is_set(): break
-                        await asyncio.sleep(RESCAN_DELAY)
+                        await clock.sleep(RESCAN_DELAY)
                         continue
 
                 try:
@@ -281,29 +270,38 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
                         except Exception as disconn_err: log_event(f"Figyelmeztetés: Hiba a régi kliens bontásakor: {disconn_err}")
 
                     log_event(f"Új BleakClient létrehozása és hozzárendelése: {current_address}...")
-                    client = BleakClient(current_address)
+                    client = client_factory(current_address)
                     app.ble.client = client
 
                     log_event(f"Csatlakozás megkezdése: {current_address} (timeout={CONNECT_TIMEOUT}s)...")
-                    await client.connect(timeout=CONNECT_TIMEOUT)
+                    CONNECT_ATTEMPTS.inc()
+                    connect_started = time.perf_counter()
+                    with tracing.span("reconnect.connect", "reconnect", address=current_address,
+                                      attempt=connection_attempts + 1):
+                        await client.connect(timeout=CONNECT_TIMEOUT)
+                    CONNECT_TIME.observe(time.perf_counter() - connect_started)
+                    CONNECTED.set(1)
 
                     if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("connected")
                     app.connection_status = "connected"
                     log_event(f"Sikeresen csatlakozva: '{original_device_name}' ({current_address})")
-                    last_ping_time = time.time()
+                    last_ping_time = clock.time()
                     last_schedule_check_time = 0 # Azonnali ellenőrzés kérése
                     connection_attempts = 0
+                    tried_known.clear()
 
                 except (BleakError, asyncio.TimeoutError, asyncio.CancelledError) as e:
+                    CONNECT_ERRORS.inc()
                     log_event(f"Kapcsolódási hiba #{connection_attempts + 1} ({type(e).__name__}): {e}")
                     if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("disconnected")
                     app.connection_status = "disconnected"
                     if app.ble: app.ble.client = None
                     connection_attempts += 1
                     if stop_event.is_set(): break
-                    await asyncio.sleep(RECONNECT_DELAY)
+                    await clock.sleep(RECONNECT_DELAY)
                     continue
                 except Exception as e:
+                    CONNECT_ERRORS.inc()
                     log_event(f"Általános hiba a kapcsolat létrehozásakor #{connection_attempts + 1}: {e}")
                     log_event(f"Traceback:\n{traceback.format_exc()}")
                     if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("disconnected")
@@ -311,7 +309,7 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
                     if app.ble: app.ble.client = None
                     connection_attempts += 1
                     if stop_event.is_set(): break
-                    await asyncio.sleep(RECONNECT_DELAY)
+                    await clock.sleep(RECONNECT_DELAY)
                     continue
 
             # --- Ha Csatlakozva van: Ping és Ütemezés ---
@@ -320,14 +318,19 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
                      log_event("Kliens csatlakozva, de app státusz nem 'connected'. Státusz frissítése.")
                      if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("connected")
                      app.connection_status = "connected"
+                     CONNECTED.set(1)
                      last_schedule_check_time = 0 # Azonnali ellenőrzés
 
-                 now = time.time()
+                 now = clock.time()
 
                  # *** Ütemezés Ellenőrzés ***
+                 if getattr(app, '_schedule_check_requested', False):
+                     app._schedule_check_requested = False
+                     last_schedule_check_time = 0 # GUI mentés után azonnali ellenőrzés
                  if now - last_schedule_check_time >= SCHEDULE_CHECK_INTERVAL:
                      # Itt már a javított logikát hívjuk
-                     await check_and_apply_schedule(app, current_client)
+                     with tracing.span("schedule.check", "schedule"):
+                         await check_and_apply_schedule(app, current_client, clock)
                      last_schedule_check_time = now
 
                  # *** Keep-Alive Ping ***
@@ -340,11 +343,14 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
                  if should_ping:
                      try:
                          if current_client and current_client.is_connected:
-                             await current_client.write_gatt_char(CHARACTERISTIC_UUID, bytes.fromhex(KEEP_ALIVE_COMMAND), response=False)
-                             last_ping_time = time.time()
+                             with PINGS.time(), tracing.span("keepalive.ping", "reconnect"):
+                                 await write_limited(current_client, KEEP_ALIVE_COMMAND, clock)
+                             last_ping_time = clock.time()
                          else:
                              log_event("Ping kihagyva, a kliens már nem csatlakozik (pingelés előtt ellenőrizve).")
                      except (BleakError, asyncio.CancelledError) as e:
+                         PING_FAILURES.inc()
+                         CONNECTED.set(0)
                          log_event(f"Hiba ping küldésekor ({type(e).__name__}): {e}")
                          if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("disconnected")
                          app.connection_status = "disconnected"
@@ -352,20 +358,23 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
                          if stop_event.is_set(): break
                          continue
                      except Exception as e:
+                         PING_FAILURES.inc()
+                         CONNECTED.set(0)
                          log_event(f"Általános hiba ping küldésekor: {e}")
                          log_event(f"Traceback:\n{traceback.format_exc()}")
                          if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("disconnected")
                          app.connection_status = "disconnected"
                          if app.ble: app.ble.client = None
                          if stop_event.is_set(): break
-                         await asyncio.sleep(0.5)
+                         await clock.sleep(0.5)
                          continue
 
             # --- Ciklus végi várakozás ---
             if stop_event.is_set():
                 log_event("Stop event észlelve (ciklus végén), reconnect loop leállítása...")
                 break
-            await asyncio.sleep(LOOP_SLEEP)
+            # Rejtett ablaknál nyújtott, a közös rácsra igazított várakozás; megjelenítéskor azonnal visszatér
+            await POWER.sleep(LOOP_SLEEP, clock)
 
         # --- Globális Hiba és Kilépés Kezelés ---
         except asyncio.CancelledError:
@@ -378,7 +387,7 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
             app.connection_status = "disconnected"
             if hasattr(app, 'connection_status_signal'): app.connection_status_signal.emit("disconnected")
             if stop_event.is_set(): break
-            await asyncio.sleep(LOOP_SLEEP * 4)
+            await clock.sleep(LOOP_SLEEP * 4)
 
     # --- Loop Végi Cleanup ---
     # ... (cleanup logika változatlan) ...
@@ -399,4 +408,5 @@ async def start_ble_connection_loop(app, stop_event: threading.Event):
              log_event(f"Hiba a kliens bontásakor a loop végén: {final_disconn_err}")
     if hasattr(app, 'ble') and app.ble:
         app.ble.client = None
+    CONNECTED.set(0)
     log_event("Reconnect handler cleanup befejezve.")
@@ -0,0 +1,293 @@
+"""Keyframe based light scenes.
+
+A scene is a list of keyframes (``time`` + ``color``) stored in
+``led_scenes.json``. :func:`compile_scene` turns the keyframes into the
+minimal, sorted stream of protocol frames once, so :class:`ScenePlayer`
+only has to sleep until the next frame and write it.
+
+Example file::
+
+    {
+        "Műszak": {
+            "days": ["Hétfő", "Kedd"],
+            "step_seconds": 30,
+            "keyframes": [
+                {"time": "08:00", "color": "Piros"},
+                {"time": "08:30", "color": "#0000FF", "transition": "fade"},
+                {"time": "12:00", "color": "off"}
+            ]
+        }
+    }
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time, timedelta
+
+from ..config import COLORS, DAYS, SCENES_FILE
+from ..util import task_manager
+from ..util.clock import get_clock
+from .schedule_engine import OFF_COMMAND, ScheduleEngine
+from .local_tz import LOCAL_TZ
+from .schedule_rules import localize
+
+DEFAULT_STEP_SECONDS = 30
+SECONDS_PER_DAY = 24 * 3600
+
+
+def color_command(red: int, green: int, blue: int) -> str:
+    """Build the colour protocol frame used by the controllers."""
+    return f"7e000503{red:02x}{green:02x}{blue:02x}00ef"
+
+
+def _parse_color(value) -> tuple[int, int, int]:
+    """Accepts a COLORS name, ``#RRGGBB`` or ``off``."""
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"Invalid keyframe color: {value!r}")
+    if value.lower() == "off":
+        return (0, 0, 0)
+    for name, hex_value, _command in COLORS:
+        if name == value:
+            value = hex_value
+            break
+    if len(value) == 7 and value.startswith("#"):
+        try:
+            return (int(value[1:3], 16), int(value[3:5], 16), int(value[5:7], 16))
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid keyframe color: {value!r}")
+
+
+def _parse_days(value) -> frozenset[int]:
+    if value is None:
+        return frozenset(range(7))
+    days = set()
+    for day in value:
+        if day not in DAYS:
+            raise ValueError(f"Unknown day in scene: {day!r}")
+        days.add(DAYS.index(day))
+    return frozenset(days)
+
+
+@dataclass(frozen=True)
+class Keyframe:
+    offset: int  # seconds since local midnight of the start day
+    rgb: tuple[int, int, int]
+    fade: bool = False
+
+
+@dataclass(frozen=True)
+class CompiledScene:
+    """Immutable result of :func:`compile_scene`."""
+
+    name: str
+    days: frozenset[int]
+    frames: tuple[tuple[int, str], ...]
+
+    @property
+    def start(self) -> int:
+        return self.frames[0][0] if self.frames else 0
+
+    @property
+    def end(self) -> int:
+        return self.frames[-1][0] if self.frames else 0
+
+
+def parse_keyframes(raw_keyframes) -> list[Keyframe]:
+    """Parses raw keyframe dicts. A time earlier than its predecessor rolls
+    over to the next day, so night shifts can cross midnight."""
+    keyframes = []
+    day_offset = 0
+    previous = None
+    for raw in raw_keyframes:
+        try:
+            clock = dt_time.fromisoformat(raw["time"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid keyframe time in {raw!r}") from e
+        offset = clock.hour * 3600 + clock.minute * 60 + clock.second + day_offset
+        if previous is not None and offset < previous:
+            day_offset += SECONDS_PER_DAY
+            offset += SECONDS_PER_DAY
+        fade = raw.get("transition", "step") == "fade"
+        keyframes.append(Keyframe(offset, _parse_color(raw.get("color")), fade))
+        previous = offset
+    return keyframes
+
+
+def _interpolate(a, b, ratio):
+    return tuple(round(x + (y - x) * ratio) for x, y in zip(a, b))
+
+
+def compile_scene(name: str, definition: dict) -> CompiledScene:
+    """Compiles a scene definition into sorted, de-duplicated frames.
+
+    Fades are sampled every ``step_seconds``; consecutive frames that would
+    send the same command are dropped, as are frames overwritten by a later
+    frame at the same instant.
+    """
+    keyframes = parse_keyframes(definition.get("keyframes", []))
+    if not keyframes:
+        raise ValueError(f"Scene '{name}' has no keyframes")
+    step = int(definition.get("step_seconds", DEFAULT_STEP_SECONDS))
+    if step <= 0:
+        raise ValueError(f"Scene '{name}': step_seconds must be positive")
+
+    raw_frames = []
+    previous = None
+    for keyframe in keyframes:
+        if keyframe.fade and previous is not None:
+            span = keyframe.offset - previous.offset
+            for t in range(previous.offset + step, keyframe.offset, step):
+                rgb = _interpolate(previous.rgb, keyframe.rgb, (t - previous.offset) / span)
+                raw_frames.append((t, rgb))
+        raw_frames.append((keyframe.offset, keyframe.rgb))
+        previous = keyframe
+
+    frames = []
+    for offset, rgb in raw_frames:
+        command = OFF_COMMAND if rgb == (0, 0, 0) else color_command(*rgb)
+        if frames and frames[-1][0] == offset:
+            frames.pop()
+        if frames and frames[-1][1] == command:
+            continue
+        frames.append((offset, command))
+
+    return CompiledScene(name, _parse_days(definition.get("days")), tuple(frames))
+
+
+def find_schedule_overlaps(scene: CompiledScene, schedule: dict, tz=None, sunrise=None, sunset=None):
+    """Lists the weekly schedule windows that overlap the scene.
+
+    Each scene day is checked against the next date falling on that weekday,
+    using the same :class:`ScheduleEngine` the background loop evaluates.
+    Returns ``(day_name, (scene_start, scene_end), (on, off))`` tuples, all in
+    seconds since that day's midnight.
+    """
+    if tz is None:
+        tz = LOCAL_TZ
+    engine = ScheduleEngine.from_schedule(schedule)
+    today = datetime.now(tz).date()
+    overlaps = []
+    for day_index in sorted(scene.days):
+        day = today + timedelta(days=(day_index - today.weekday()) % 7)
+        midnight = localize(tz, datetime.combine(day, dt_time()))
+        for interval in engine.intervals_on(day, tz, sunrise, sunset):
+            window = (
+                int((interval.start - midnight).total_seconds()),
+                int((interval.end - midnight).total_seconds()),
+            )
+            if window[0] < scene.end and scene.start < window[1]:
+                overlaps.append((DAYS[day_index], (scene.start, scene.end), window))
+    return overlaps
+
+
+def load_scenes(path: str = SCENES_FILE, schedule: dict | None = None) -> dict[str, CompiledScene]:
+    """Loads and compiles every scene in ``path``. Invalid scenes are skipped."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw_scenes = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error("Scenes: could not read %s: %s", path, e)
+        return {}
+
+    scenes = {}
+    for name, definition in raw_scenes.items():
+        try:
+            scene = compile_scene(name, definition)
+        except (ValueError, TypeError) as e:
+            logging.error("Scenes: skipping '%s': %s", name, e)
+            continue
+        if schedule:
+            for day_name, _scene_window, window in find_schedule_overlaps(scene, schedule):
+                logging.warning(
+                    "Scenes: '%s' overlaps the %s schedule (%02d:%02d-%02d:%02d)",
+                    name, day_name,
+                    window[0] // 3600, window[0] % 3600 // 60,
+                    window[1] // 3600 % 24, window[1] % 3600 // 60,
+                )
+        scenes[name] = scene
+        logging.info("Scenes: compiled '%s' into %d frames", name, len(scene.frames))
+    return scenes
+
+
+class ScenePlayer:
+    """Plays a compiled scene through ``app.ble``.
+
+    While a scene is playing ``app.active_scene`` holds its name, which makes
+    the background schedule check stand back instead of fighting the scene.
+    """
+
+    def __init__(self, app, clock=None):
+        self.app = app
+        self.clock = clock or get_clock()
+
+    async def play(self, scene: CompiledScene, start_day: datetime | None = None, apply_final: bool = False):
+        """Joins the run of ``scene`` started on ``start_day`` (default: the one in progress).
+
+        Returns False without sending anything when the scene does not run
+        that day, or when its last frame is already past, unless
+        ``apply_final`` asks for the end state to be sent anyway.
+        """
+        if not scene.frames:
+            return False
+        now = self.clock.now(LOCAL_TZ)
+        midnight = self._run_midnight(scene, now, start_day)
+        if midnight is None:
+            logging.info("Scenes: '%s' does not run on %s", scene.name, DAYS[(start_day or now).weekday()])
+            return False
+
+        offsets = [offset for offset, _command in scene.frames]
+        elapsed = int((now - midnight).total_seconds())
+        if elapsed > scene.end and not apply_final:
+            logging.info("Scenes: '%s' already finished (last frame %ds ago)", scene.name, elapsed - scene.end)
+            return False
+        # Catch up with the frame that should currently be shown, then walk
+        # the remaining frames one by one.
+        index = max(0, bisect.bisect_right(offsets, elapsed) - 1)
+        base = self.clock.time() - elapsed
+
+        self.app.active_scene = scene.name
+        logging.info("Scenes: playing '%s' from frame %d/%d", scene.name, index + 1, len(offsets))
+        try:
+            # Background output: a user command (power-off) is written before the queued frames
+            with task_manager.priority(task_manager.Priority.SCHEDULE):
+                for offset, command in scene.frames[index:]:
+                    delay = base + offset - self.clock.time()
+                    if delay > 0:
+                        await self.clock.sleep(delay)
+                    await self.app.ble.send_command(command)
+                    self.app.is_led_on = command != OFF_COMMAND
+                    if self.app.is_led_on:
+                        self.app.last_color_hex = command
+                    self.app.last_user_input = self.clock.time()
+        finally:
+            self.app.active_scene = None
+            logging.info("Scenes: '%s' finished", scene.name)
+        return True
+
+    @staticmethod
+    def _run_midnight(scene: CompiledScene, now: datetime, start_day: datetime | None):
+        """Local midnight of the start day of the run to join; None when it does not run."""
+        if start_day is not None:
+            days = [start_day.date()]
+        else:
+            days = [now.date()]
+            if scene.end >= SECONDS_PER_DAY:
+                # Runs past midnight: yesterday's run may still be going (restart, ctl scene)
+                days.insert(0, now.date() - timedelta(days=1))
+        midnight = None
+        for day in days:
+            candidate = LOCAL_TZ.localize(datetime.combine(day, dt_time()))
+            if scene.days and candidate.weekday() not in scene.days:
+                continue
+            midnight = candidate
+            if (now - candidate).total_seconds() <= scene.end:
+                break  # in progress or still ahead
+        return midnight
@@ -0,0 +1,80 @@
+"""Qt-free schedule evaluation shared by the GUI and the background loop.
+
+The engine works on an immutable :class:`ParsedSchedule` built once from
+an ``app.schedule`` dict. Everything that decides whether the LEDs should
+be on (midnight spans, sunrise/sunset offsets, rules and holidays) lives
+here, so every caller gets the same answer for the same moment.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from ..config import COLORS
+from ..util import tracing
+from .schedule_rules import RuleSet, ScheduleInterval, build_rule_set
+
+OFF_COMMAND = "7e00050300000000ef"
+
+
+@dataclass(frozen=True)
+class ParsedSchedule:
+    """Immutable, pre-indexed form of a schedule dict."""
+
+    rules: RuleSet
+    colors: tuple[tuple[str, str], ...]  # (name, command)
+
+    def color_command(self, name: str) -> str | None:
+        return next((command for color, command in self.colors if color == name), None)
+
+
+@dataclass(frozen=True)
+class ScheduleDecision:
+    should_be_on: bool
+    color_name: str | None = None
+    command: str = OFF_COMMAND
+    interval: ScheduleInterval | None = None
+
+
+def parse_schedule(schedule: dict) -> ParsedSchedule:
+    return ParsedSchedule(build_rule_set(schedule or {}), tuple((c[0], c[2]) for c in COLORS))
+
+
+class ScheduleEngine:
+    """Evaluates a :class:`ParsedSchedule` for a given moment.
+
+    Per-day interval indexes are memoized by the rule set on (date, sunrise,
+    sunset), so repeated checks within a day are a bisect each.
+    """
+
+    def __init__(self, parsed: ParsedSchedule):
+        self.parsed = parsed
+
+    @classmethod
+    def from_schedule(cls, schedule: dict) -> "ScheduleEngine":
+        with tracing.span("schedule.compile", "schedule"):
+            return cls(parse_schedule(schedule))
+
+    def intervals_on(self, day: date, tz, sunrise=None, sunset=None) -> list[ScheduleInterval]:
+        """Intervals that start on ``day``, sorted by start."""
+        return list(self.parsed.rules.intervals_for(day, tz, sunrise, sunset).intervals)
+
+    def evaluate(self, now: datetime, sunrise=None, sunset=None) -> ScheduleDecision:
+        """What the LEDs should show at ``now`` (tz-aware).
+
+        An active interval whose colour is unknown (e.g. "Nincs kiválasztva")
+        counts as off.
+        """
+        with tracing.span("schedule.evaluate", "schedule"):
+            interval = self.parsed.rules.active_at(now, sunrise, sunset)
+        if interval is None:
+            return ScheduleDecision(False)
+        command = self.parsed.color_command(interval.color)
+        if command is None:
+            return ScheduleDecision(False, interval.color, OFF_COMMAND, interval)
+        return ScheduleDecision(True, interval.color, command, interval)
+
+    def next_change(self, now: datetime, sunrise=None, sunset=None) -> datetime | None:
+        with tracing.span("schedule.next_change", "schedule"):
+            return self.parsed.rules.next_fire(now, sunrise, sunset)
@@ -0,0 +1,396 @@
+"""Rule based schedules.
+
+The weekday entries of ``led_schedule.json`` stay the simple form (one
+interval per day). On top of them the file may carry extra ``rules`` and
+``holidays``::
+
+    {
+        "Hétfő": {"color": "Kék", "on_time": "16:00", "off_time": "03:00", ...},
+        ...
+        "rules": [
+            {"days": ["Hétfő", "Kedd"], "on_time": "06:00", "off_time": "07:00",
+             "color": "Fehér", "date_from": "2026-12-01", "date_to": "2026-12-24"},
+            {"cron": "30 6 * * 1-5", "duration": 45, "color": "Arany"}
+        ],
+        "holidays": ["2026-12-25", "2026-12-26"]
+    }
+
+Cron expressions use the usual ``minute hour day month weekday`` fields
+(weekday 0/7 = Sunday) and mark the *switch-on* moments; ``duration`` is
+the length of the interval in minutes. On a holiday no rule fires.
+
+:class:`RuleSet` indexes rules by weekday and turns one day's rules into an
+:class:`IntervalIndex`, so the active interval is a bisect away and the
+next switching moment is found by jumping day by day instead of scanning
+minutes.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+
+from ..config import DAYS
+
+MINUTES_PER_DAY = 24 * 60
+MAX_LOOKAHEAD_DAYS = 366 * 2
+INDEX_CACHE_SIZE = 16
+RESERVED_KEYS = ("rules", "holidays")
+
+
+def localize(tz, naive: datetime) -> datetime:
+    """Attaches ``tz`` to a naive datetime (pytz and zoneinfo alike)."""
+    if hasattr(tz, "localize"):
+        return tz.normalize(tz.localize(naive))
+    return naive.replace(tzinfo=tz)
+
+
+def _time_of_day(value):
+    return (value.hour, value.minute) if value else None
+
+
+def _parse_hhmm(value) -> int | None:
+    if not value:
+        return None
+    parsed = dt_time.fromisoformat(value)
+    return parsed.hour * 60 + parsed.minute
+
+
+class CronField:
+    """One field of a cron expression, expanded to a sorted value tuple."""
+
+    def __init__(self, spec: str, low: int, high: int):
+        values = set()
+        for part in spec.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                step = int(step_str)
+                if step <= 0:
+                    raise ValueError(f"Invalid cron step: {spec!r}")
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start_str, end_str = part.split("-", 1)
+                start, end = int(start_str), int(end_str)
+            else:
+                start = int(part)
+                end = high if step != 1 else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron value out of range ({low}-{high}): {spec!r}")
+            values.update(range(start, end + 1, step))
+        self.values = tuple(sorted(values))
+        self.is_wildcard = spec == "*"
+
+    def next_at_or_after(self, value: int):
+        index = bisect.bisect_left(self.values, value)
+        return self.values[index] if index < len(self.values) else None
+
+
+class CronExpr:
+    """Five field cron expression with arithmetic next-fire computation."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minute = CronField(fields[0], 0, 59)
+        self.hour = CronField(fields[1], 0, 23)
+        self.day = CronField(fields[2], 1, 31)
+        self.month = CronField(fields[3], 1, 12)
+        weekday = CronField(fields[4], 0, 7)
+        # cron: 0/7 = Sunday; Python: Monday = 0
+        self.weekdays = frozenset((v - 1) % 7 for v in weekday.values)
+        self.weekday_is_wildcard = weekday.is_wildcard
+        self._day_offsets = tuple(h * 60 + m for h in self.hour.values for m in self.minute.values)
+
+    def __repr__(self):
+        return f"CronExpr({self.expression!r})"
+
+    def matches_date(self, day: date) -> bool:
+        if day.month not in self.month.values:
+            return False
+        dom_ok = day.day in self.day.values
+        dow_ok = day.weekday() in self.weekdays
+        if self.day.is_wildcard or self.weekday_is_wildcard:
+            return dom_ok and dow_ok
+        return dom_ok or dow_ok  # classic cron: restricted day fields are OR-ed
+
+    def fire_offsets(self, day: date) -> tuple[int, ...]:
+        """Minute-of-day offsets at which the expression fires on ``day``."""
+        return self._day_offsets if self.matches_date(day) else ()
+
+    def next_fire(self, after: datetime) -> datetime | None:
+        """First firing moment strictly after ``after`` (naive, minute resolution)."""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if t.month not in self.month.values:
+                month = self.month.next_at_or_after(t.month)
+                if month is None:
+                    t = datetime(t.year + 1, self.month.values[0], 1)
+                else:
+                    t = datetime(t.year, month, 1)
+                continue
+            if not self.matches_date(t.date()):
+                t = datetime.combine(t.date() + timedelta(days=1), dt_time())
+                continue
+            index = bisect.bisect_left(self._day_offsets, t.hour * 60 + t.minute)
+            if index < len(self._day_offsets):
+                offset = self._day_offsets[index]
+                return t.replace(hour=offset // 60, minute=offset % 60)
+            t = datetime.combine(t.date() + timedelta(days=1), dt_time())
+        return None
+
+
+@dataclass(frozen=True)
+class ScheduleInterval:
+    start: datetime
+    end: datetime
+    color: str
+    rule: "ScheduleRule"
+
+
+@dataclass(frozen=True)
+class ScheduleRule:
+    """One switch-on interval template.
+
+    Either ``cron`` + ``duration`` or ``days`` + on/off times, where the
+    on/off time may follow sunrise/sunset with a minute offset.
+    """
+
+    color: str
+    days: frozenset = frozenset(range(7))
+    on_minute: int | None = None
+    off_minute: int | None = None
+    sunrise: bool = False
+    sunrise_offset: int = 0
+    sunset: bool = False
+    sunset_offset: int = 0
+    cron: CronExpr | None = None
+    duration: int = 0
+    date_from: date | None = None
+    date_to: date | None = None
+    name: str = ""
+
+    def applies_to(self, day: date) -> bool:
+        if self.date_from and day < self.date_from:
+            return False
+        if self.date_to and day > self.date_to:
+            return False
+        if self.cron:
+            return self.cron.matches_date(day)
+        return day.weekday() in self.days
+
+    def intervals_on(self, day: date, tz, sunrise=None, sunset=None) -> list[ScheduleInterval]:
+        """Intervals this rule starts on ``day``. Sun times may be any date's
+        datetimes; only their time of day is used."""
+        if not self.applies_to(day):
+            return []
+        midnight = datetime.combine(day, dt_time())
+
+        def at(minute):
+            return localize(tz, midnight + timedelta(minutes=minute))
+
+        if self.cron:
+            return [
+                ScheduleInterval(at(offset), at(offset + self.duration), self.color, self)
+                for offset in self.cron.fire_offsets(day)
+            ]
+
+        on_minute = self.on_minute
+        if self.sunrise:
+            on_minute = None if not sunrise else sunrise.hour * 60 + sunrise.minute + self.sunrise_offset
+        off_minute = self.off_minute
+        if self.sunset:
+            off_minute = None if not sunset else sunset.hour * 60 + sunset.minute + self.sunset_offset
+        if on_minute is None or off_minute is None:
+            return []
+        if off_minute <= on_minute:
+            off_minute += MINUTES_PER_DAY  # átnyúlás éjfélen
+        return [ScheduleInterval(at(on_minute), at(off_minute), self.color, self)]
+
+
+def _parse_day_names(names) -> frozenset:
+    days = set()
+    for name in names:
+        if name not in DAYS:
+            raise ValueError(f"Unknown day: {name!r}")
+        days.add(DAYS.index(name))
+    return frozenset(days)
+
+
+def parse_rule(raw: dict, name: str = "") -> ScheduleRule:
+    """Builds a :class:`ScheduleRule` from its JSON form. Raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError(f"Rule must be an object: {raw!r}")
+    date_from = date.fromisoformat(raw["date_from"]) if raw.get("date_from") else None
+    date_to = date.fromisoformat(raw["date_to"]) if raw.get("date_to") else None
+    color = raw.get("color", "")
+    if raw.get("cron"):
+        duration = int(raw.get("duration", 0))
+        if duration <= 0:
+            raise ValueError(f"Cron rule needs a positive duration: {raw!r}")
+        return ScheduleRule(
+            color=color, cron=CronExpr(raw["cron"]), duration=duration,
+            date_from=date_from, date_to=date_to, name=name,
+        )
+    days = _parse_day_names(raw["days"]) if "days" in raw else frozenset(range(7))
+    return ScheduleRule(
+        color=color,
+        days=days,
+        on_minute=None if raw.get("sunrise") else _parse_hhmm(raw.get("on_time")),
+        off_minute=None if raw.get("sunset") else _parse_hhmm(raw.get("off_time")),
+        sunrise=bool(raw.get("sunrise", False)),
+        sunrise_offset=int(raw.get("sunrise_offset", 0) or 0),
+        sunset=bool(raw.get("sunset", False)),
+        sunset_offset=int(raw.get("sunset_offset", 0) or 0),
+        date_from=date_from,
+        date_to=date_to,
+        name=name,
+    )
+
+
+class IntervalIndex:
+    """Sorted intervals with bisect lookup of the interval covering a moment.
+
+    Overlapping intervals are allowed; the one that started last wins.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda i: i.start)
+        self.starts = [i.start for i in self.intervals]
+        self._max_end = []
+        running = None
+        for interval in self.intervals:
+            running = interval.end if running is None or interval.end > running else running
+            self._max_end.append(running)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def find(self, moment: datetime) -> ScheduleInterval | None:
+        index = bisect.bisect_right(self.starts, moment) - 1
+        while index >= 0 and self._max_end[index] > moment:
+            if self.intervals[index].end > moment:
+                return self.intervals[index]
+            index -= 1
+        return None
+
+    def boundaries_after(self, moment: datetime):
+        return [t for i in self.intervals for t in (i.start, i.end) if t > moment]
+
+
+class RuleSet:
+    """All rules of a schedule, indexed by weekday."""
+
+    def __init__(self, rules=(), holidays=()):
+        self.rules = tuple(rules)
+        self.holidays = frozenset(holidays)
+        self._by_weekday = {day: [] for day in range(7)}
+        for rule in self.rules:
+            # Cron rules with a day-of-month part can fire on any weekday.
+            days = range(7) if rule.cron else rule.days
+            for day in days:
+                self._by_weekday[day].append(rule)
+        self._active_weekdays = frozenset(d for d, rules in self._by_weekday.items() if rules)
+        self._index_cache = {}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def intervals_for(self, day: date, tz, sunrise=None, sunset=None) -> IntervalIndex:
+        """Index of every interval that starts on ``day``.
+
+        Built once per (day, sun times) and kept in a small cache, so the
+        rules of a day are expanded only when the date or sun times change.
+        """
+        key = (day, tz, _time_of_day(sunrise), _time_of_day(sunset))
+        index = self._index_cache.get(key)
+        if index is None:
+            if day in self.holidays:
+                index = IntervalIndex(())
+            else:
+                intervals = []
+                for rule in self._by_weekday[day.weekday()]:
+                    intervals.extend(rule.intervals_on(day, tz, sunrise, sunset))
+                index = IntervalIndex(intervals)
+            if len(self._index_cache) >= INDEX_CACHE_SIZE:
+                self._index_cache.pop(next(iter(self._index_cache)))
+            self._index_cache[key] = index
+        return index
+
+    def active_at(self, moment: datetime, sunrise=None, sunset=None) -> ScheduleInterval | None:
+        """Interval covering ``moment`` (tz-aware), including ones that
+        started the day before and run past midnight."""
+        tz = moment.tzinfo
+        today = moment.date()
+        found = self.intervals_for(today, tz, sunrise, sunset).find(moment)
+        if found is None:
+            found = self.intervals_for(today - timedelta(days=1), tz, sunrise, sunset).find(moment)
+        return found
+
+    def next_fire(self, moment: datetime, sunrise=None, sunset=None) -> datetime | None:
+        """Next switch-on or switch-off moment strictly after ``moment``."""
+        tz = moment.tzinfo
+        best = None
+        day = moment.date() - timedelta(days=1)  # tegnapi átnyúlás vége
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            # Intervals of later days start after their midnight, so once a
+            # candidate precedes that midnight the search is over.
+            if best is not None and localize(tz, datetime.combine(day, dt_time())) > best:
+                break
+            boundaries = self.intervals_for(day, tz, sunrise, sunset).boundaries_after(moment)
+            if boundaries:
+                earliest = min(boundaries)
+                best = earliest if best is None or earliest < best else best
+            day = self._next_candidate_day(day)
+            if day is None:
+                break
+        return best
+
+    def _next_candidate_day(self, day: date) -> date | None:
+        """Jumps straight to the next weekday that has rules at all."""
+        if not self._active_weekdays:
+            return None
+        for step in range(1, 8):
+            candidate = day + timedelta(days=step)
+            if candidate.weekday() in self._active_weekdays:
+                return candidate
+        return None
+
+
+def build_rule_set(schedule: dict) -> RuleSet:
+    """Builds a :class:`RuleSet` from an ``app.schedule`` style dict.
+
+    Each weekday entry becomes a single-day rule; entries of ``rules`` are
+    added after them. Broken rules are logged and skipped.
+    """
+    rules = []
+    for day in DAYS:
+        day_data = schedule.get(day)
+        if not day_data:
+            continue
+        try:
+            rule = parse_rule(dict(day_data, days=[day]), name=day)
+        except (ValueError, TypeError) as e:
+            logging.warning("Schedule: ignoring invalid entry for %s: %s", day, e)
+            continue
+        if rule.on_minute is not None or rule.sunrise:
+            rules.append(rule)
+
+    for index, raw in enumerate(schedule.get("rules", []) or []):
+        try:
+            rules.append(parse_rule(raw, name=raw.get("name", f"rule-{index + 1}") if isinstance(raw, dict) else ""))
+        except (ValueError, TypeError, KeyError) as e:
+            logging.warning("Schedule: ignoring invalid rule #%d: %s", index + 1, e)
+
+    holidays = []
+    for value in schedule.get("holidays", []) or []:
+        try:
+            holidays.append(date.fromisoformat(value))
+        except (ValueError, TypeError):
+            logging.warning("Schedule: ignoring invalid holiday %r", value)
+    return RuleSet(rules, holidays)
@@ -0,0 +1,129 @@
+"""Loading and saving ``led_schedule.json`` without Qt."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import date
+
+from ..config import COLORS, DAYS, CONFIG_FILE
+from .schedule_rules import RESERVED_KEYS, parse_rule
+
+
+def default_day() -> dict:
+    return {
+        "color": COLORS[0][0] if COLORS else "",
+        "on_time": "",
+        "off_time": "",
+        "sunrise": False,
+        "sunrise_offset": 0,
+        "sunset": False,
+        "sunset_offset": 0,
+    }
+
+
+def default_schedule() -> dict:
+    return {day: default_day() for day in DAYS}
+
+
+def merge_schedule(loaded_data: dict) -> dict:
+    """Validates raw JSON data against the weekday defaults.
+
+    Unknown keys are dropped, offsets are coerced to int, mistyped values
+    fall back to the default. ``rules`` and ``holidays`` lists are kept.
+    """
+    merged_schedule = {}
+    for day in DAYS:
+        day_data = default_day()
+        raw_day = loaded_data.get(day)
+        if isinstance(raw_day, dict):
+            for key in day_data:
+                if key not in raw_day:
+                    continue
+                loaded_val = raw_day[key]
+                if key.endswith("_offset"):
+                    try:
+                        day_data[key] = int(loaded_val)
+                    except (ValueError, TypeError):
+                        logging.warning("Schedule: invalid offset %r for %s/%s, using 0", loaded_val, day, key)
+                        day_data[key] = 0
+                elif isinstance(loaded_val, type(day_data[key])):
+                    day_data[key] = loaded_val
+                else:
+                    logging.warning(
+                        "Schedule: type mismatch for %s/%s (%s), using default",
+                        day, key, type(loaded_val).__name__,
+                    )
+        merged_schedule[day] = day_data
+    for key in RESERVED_KEYS:
+        if isinstance(loaded_data.get(key), list):
+            merged_schedule[key] = loaded_data[key]
+    return merged_schedule
+
+
+def validate_schedule(data) -> dict:
+    """Strict counterpart of :func:`merge_schedule` for schedules sent by
+    integrations: anything :func:`merge_schedule` would drop or default is an
+    error here. Returns the merged schedule; raises ValueError listing the problems.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("schedule must be an object")
+    errors = [f"unknown key {key!r}" for key in data if key not in DAYS and key not in RESERVED_KEYS]
+    defaults = default_day()
+    for day in DAYS:
+        raw_day = data.get(day)
+        if raw_day is None:
+            continue
+        if not isinstance(raw_day, dict):
+            errors.append(f"{day}: must be an object")
+            continue
+        for key, value in raw_day.items():
+            if key not in defaults:
+                errors.append(f"{day}: unknown key {key!r}")
+            elif type(value) is not type(defaults[key]):
+                errors.append(f"{day}/{key}: expected {type(defaults[key]).__name__}")
+        try:
+            parse_rule(dict(raw_day, days=[day]), name=day)
+        except (ValueError, TypeError) as e:
+            errors.append(f"{day}: {e}")
+    for key in RESERVED_KEYS:
+        if key in data and not isinstance(data[key], list):
+            errors.append(f"{key}: must be a list")
+    for index, raw in enumerate(data.get("rules") or []):
+        try:
+            parse_rule(raw)
+        except (ValueError, TypeError, KeyError) as e:
+            errors.append(f"rules[{index}]: {e}")
+    for value in data.get("holidays") or []:
+        try:
+            date.fromisoformat(value)
+        except (ValueError, TypeError):
+            errors.append(f"holidays: invalid date {value!r}")
+    if errors:
+        raise ValueError("; ".join(errors))
+    return merge_schedule(data)
+
+
+def load_schedule(path: str = CONFIG_FILE) -> dict:
+    """Reads the schedule file; returns the default schedule on any error."""
+    if not os.path.exists(path):
+        logging.info("Schedule: no saved schedule (%s), using defaults", path)
+        return default_schedule()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            loaded_data = json.load(f)
+        if not isinstance(loaded_data, dict):
+            raise ValueError("top level must be an object")
+        return merge_schedule(loaded_data)
+    except json.JSONDecodeError:
+        logging.error("Schedule: %s is not valid JSON, using defaults", path)
+    except Exception as e:
+        logging.error("Schedule: error loading %s: %s, using defaults", path, e)
+    return default_schedule()
+
+
+def save_schedule(schedule: dict, path: str = CONFIG_FILE) -> None:
+    """Writes the schedule file. Raises OSError on failure."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(schedule, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,197 @@
+"""Startup pipeline: adapter probe, connect, schedule, sun table and location at once.
+
+Instead of sleeping a fixed time before the auto-connect and then loading
+everything one step after another, :class:`StartupOrchestrator` runs the
+phases as concurrent tasks on the caller's loop::
+
+    adapter -> connect ----------------.
+    schedule (load + compile) ----------+--> apply (first schedule check)
+    sun (last known coordinates) ------'
+    location (IP lookup) -> sun_refresh
+
+``apply`` needs the connection, the compiled schedule and the sun times.
+The network location lookup is not waited for: the sun table is computed
+from the coordinates saved last time and recomputed if the lookup moves
+them. Every phase is timed (log line, ``startup_*`` metrics, trace spans).
+The report's ``ready_after`` is the time from launch to "connected and
+schedule applied".
+
+The module is Qt-free. The GUI hooks in with callbacks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from ..config import CONFIG_FILE
+from ..services import config_service
+from ..services.ble_service import ADAPTER_PROBE_TIMEOUT
+from ..util import metrics, tracing
+from . import schedule_store
+from .reconnect_handler import check_and_apply_schedule, request_schedule_check
+from .schedule_engine import ScheduleEngine
+
+LOCATION_MOVED = 0.01  # degrees; a smaller change does not rewrite the saved position
+READY_TIME = metrics.gauge("startup_ready_seconds", "Launch to connected and schedule applied")
+
+
+@dataclass
+class PhaseTiming:
+    name: str
+    started: float  # seconds after launch
+    duration: float = 0.0
+    ok: bool = True
+    detail: str = ""
+
+
+@dataclass
+class StartupReport:
+    launched_at: float  # time.perf_counter() at launch
+    phases: dict[str, PhaseTiming] = field(default_factory=dict)
+    ready_after: float | None = None
+
+    def summary(self) -> str:
+        phases = ", ".join(
+            f"{p.name} {p.started:.2f}+{p.duration:.2f}s{'' if p.ok else ' FAILED'}{f' ({p.detail})' if p.detail else ''}"
+            for p in sorted(self.phases.values(), key=lambda p: p.started))
+        ready = f"ready after {self.ready_after:.2f}s" if self.ready_after is not None else "not ready"
+        return f"{ready}: {phases}"
+
+
+class StartupOrchestrator:
+    """Runs the startup phases of one app instance concurrently.
+
+    ``app`` is the shared application state (GUI window or headless app):
+    ``ble``, ``schedule``, ``schedule_engine``, ``latitude``/``longitude``
+    and ``sunrise``/``sunset`` are filled in. ``device`` is ``(name,
+    address)`` or None, in which case there is nothing to connect to and
+    only the data phases run.
+
+    Callbacks (called on the loop thread): ``on_connected()``,
+    ``on_connect_error(message)``, ``on_sun(sun_info)`` and
+    ``on_ready(report)``, the last one once the schedule has been applied.
+    """
+
+    def __init__(self, app, device: tuple[str, str] | None, launched_at: float | None = None,
+                 schedule_path: str = CONFIG_FILE, probe_timeout: float = ADAPTER_PROBE_TIMEOUT,
+                 use_location: bool = True, on_connected=None, on_connect_error=None, on_sun=None, on_ready=None):
+        self.app = app
+        self.device = device
+        self.schedule_path = schedule_path
+        self.probe_timeout = probe_timeout
+        self.use_location = use_location
+        self.on_connected = on_connected
+        self.on_connect_error = on_connect_error
+        self.on_sun = on_sun
+        self.on_ready = on_ready
+        self.report = StartupReport(time.perf_counter() if launched_at is None else launched_at)
+
+    async def _phase(self, name: str, coro):
+        """Times ``coro`` as phase ``name``; returns its result, None on error."""
+        timing = PhaseTiming(name, time.perf_counter() - self.report.launched_at)
+        self.report.phases[name] = timing
+        try:
+            with tracing.span(f"startup.{name}", "startup"):
+                result = await coro
+            if result is False:
+                timing.ok = False
+            return result
+        except Exception as e:
+            timing.ok, timing.detail = False, str(e) or type(e).__name__
+            logging.warning("Startup: %s failed: %s", name, timing.detail)
+            return None
+        finally:
+            timing.duration = time.perf_counter() - self.report.launched_at - timing.started
+            metrics.gauge(f"startup_{name}_seconds", f"Duration of the {name} startup phase").set(timing.duration)
+
+    async def run(self) -> StartupReport:
+        connect = asyncio.ensure_future(self._connect())
+        schedule = asyncio.ensure_future(self._phase("schedule", self._load_schedule()))
+        sun = asyncio.ensure_future(self._phase("sun", self._sun_table(self._last_coordinates())))
+        location = asyncio.ensure_future(self._phase("location", self._locate(sun))) if self.use_location else None
+        try:
+            connected, _schedule, _sun = await asyncio.gather(connect, schedule, sun)
+            if connected:
+                await self._phase("apply", self._apply())
+            if location is not None:
+                await location
+        finally:
+            for task in (connect, schedule, sun, location):
+                if task is not None:
+                    task.cancel()
+        logging.info("Startup: %s", self.report.summary())
+        return self.report
+
+    # --- phases --------------------------------------------------------
+    async def _connect(self) -> bool:
+        if not self.device or not self.device[1]:
+            self.report.phases["connect"] = PhaseTiming("connect", 0.0, ok=False, detail="no saved device")
+            return False
+        ble = self.app.ble
+        await self._phase("adapter", ble.wait_until_ready(self.probe_timeout))
+        return bool(await self._phase("connect", self._connect_device(ble)))
+
+    async def _connect_device(self, ble) -> bool:
+        try:
+            await ble.connect(self.device[1])
+        except Exception as e:
+            if self.on_connect_error:
+                self.on_connect_error(str(e) or type(e).__name__)
+            raise
+        if self.on_connected:
+            self.on_connected()
+        return True
+
+    async def _load_schedule(self):
+        def load():
+            schedule = schedule_store.load_schedule(self.schedule_path)
+            return schedule, ScheduleEngine.from_schedule(schedule)
+
+        self.app.schedule, self.app.schedule_engine = await asyncio.get_running_loop().run_in_executor(None, load)
+
+    @staticmethod
+    def _last_coordinates() -> tuple[float, float]:
+        return config_service.get_setting("last_latitude"), config_service.get_setting("last_longitude")
+
+    async def _sun_table(self, coordinates: tuple[float, float], located: bool = False):
+        def compute():
+            from .location_utils import get_sun_times  # suntime is loaded on first use
+            return get_sun_times(*coordinates)
+
+        sunrise, sunset = await asyncio.get_running_loop().run_in_executor(None, compute)
+        app = self.app
+        app.latitude, app.longitude = coordinates
+        app.sunrise, app.sunset = sunrise, sunset
+        if self.on_sun:
+            self.on_sun({"latitude": coordinates[0], "longitude": coordinates[1],
+                         "sunrise": sunrise, "sunset": sunset, "located": located})
+
+    async def _locate(self, first_sun: asyncio.Future):
+        from .location_utils import get_coordinates  # requests is loaded on first use
+
+        lat, lon, located = await asyncio.get_running_loop().run_in_executor(None, get_coordinates)
+        if not located:
+            return False
+        await asyncio.shield(first_sun)  # the table from the saved position must not land last
+        last_lat, last_lon = self._last_coordinates()
+        moved = abs(lat - last_lat) >= LOCATION_MOVED or abs(lon - last_lon) >= LOCATION_MOVED
+        if moved:
+            config_service.set_setting("last_latitude", float(lat))
+            config_service.set_setting("last_longitude", float(lon))
+        # Also when the position did not move: cheap, and the GUI shows the "located" flag
+        await self._phase("sun_refresh", self._sun_table((float(lat), float(lon)), located=True))
+        if moved:
+            request_schedule_check(self.app)
+        return True
+
+    async def _apply(self):
+        await check_and_apply_schedule(self.app, self.app.ble.client)
+        report = self.report
+        report.ready_after = time.perf_counter() - report.launched_at
+        READY_TIME.set(report.ready_after)
+        logging.info("Startup: connected and schedule applied %.2fs after launch", report.ready_after)
+        if self.on_ready:
+            self.on_ready(report)
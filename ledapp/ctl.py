@@ -0,0 +1,129 @@
+"""``ledapp ctl``: command line client for a running instance.
+
+Examples::
+
+    python -m ledapp ctl status
+    python -m ledapp ctl color Piros
+    python -m ledapp ctl color "#20a0ff"
+    python -m ledapp ctl off
+    python -m ledapp ctl scene Műszak
+    python -m ledapp ctl scene --stop
+    python -m ledapp ctl reload
+    python -m ledapp ctl trace start
+    python -m ledapp ctl trace export /tmp/ledapp-trace.json
+    python -m ledapp ctl profile start --mem
+    python -m ledapp ctl profile stop
+    python -m ledapp ctl timers
+    python -m ledapp ctl tasks
+    python -m ledapp ctl devices --group földszint
+    python -m ledapp ctl devices AA:BB:CC:DD:EE:FF --friendly-name Nappali --groups földszint,esti
+    echo '[{"method": "set_color", "params": {"color": "Kék"}},
+           {"method": "status"}]' | python -m ledapp ctl batch
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from .services.ipc_client import IPCClient, IPCError
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="ledapp ctl", description="Control a running LEDapp instance.")
+    parser.add_argument("--endpoint", help="IPC socket / endpoint file (default: per-user)")
+    parser.add_argument("--timeout", type=float, default=3.0)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="print the current state as JSON")
+    color = commands.add_parser("color", help="set a color (name, #RRGGBB or raw frame)")
+    color.add_argument("color")
+    commands.add_parser("on", help="turn on with the last color")
+    commands.add_parser("off", help="turn off")
+    scene = commands.add_parser("scene", help="play a scene from led_scenes.json")
+    scene.add_argument("name", nargs="?")
+    scene.add_argument("--stop", action="store_true", help="stop the running scene")
+    scene.add_argument("--final", action="store_true", help="send the end state of a scene that is already over")
+    commands.add_parser("reload", help="reload the schedule file")
+    trace = commands.add_parser("trace", help="record BLE/schedule spans and export Chrome trace JSON")
+    trace.add_argument("action", choices=("start", "stop", "export"))
+    trace.add_argument("path", nargs="?", help="export target (default: led_trace.json of the instance)")
+    profile = commands.add_parser("profile", help="cProfile / tracemalloc around the running instance")
+    profile.add_argument("action", choices=("start", "stop", "snapshot"))
+    profile.add_argument("--cpu", action="store_true", help="start only cProfile")
+    profile.add_argument("--mem", action="store_true", help="start only tracemalloc")
+    commands.add_parser("timers", help="list the timers scheduled on the instance's timer wheel")
+    commands.add_parser("tasks", help="list the queued and running background tasks")
+    devices = commands.add_parser("devices", help="list the device registry, or edit one device")
+    devices.add_argument("address", nargs="?", help="device to edit")
+    devices.add_argument("--group", help="list only this group")
+    devices.add_argument("--friendly-name", help="set the friendly name of the device")
+    devices.add_argument("--groups", help="set the groups of the device (comma separated, '' for none)")
+    devices.add_argument("--forget", action="store_true", help="remove the device from the registry")
+    batch = commands.add_parser("batch", help="send a JSON array of {method, params} in one round trip")
+    batch.add_argument("json", nargs="?", help="JSON text (default: read stdin)")
+    return parser
+
+
+def _single_call(args):
+    if args.command == "status":
+        return "status", None
+    if args.command == "color":
+        return "set_color", {"color": args.color}
+    if args.command in ("on", "off"):
+        return "power", {"on": args.command == "on"}
+    if args.command == "scene":
+        if not args.stop and not args.name:
+            raise SystemExit("ledapp ctl scene: give a scene name or --stop")
+        if args.stop:
+            return "scene", {"name": None}
+        return "scene", {"name": args.name, "apply_final": True} if args.final else {"name": args.name}
+    if args.command == "trace":
+        params = {"path": args.path} if args.action == "export" and args.path else None
+        return f"trace.{args.action}", params
+    if args.command == "profile":
+        if args.action == "start" and (args.cpu or args.mem):
+            return "profile.start", {"cpu": args.cpu, "mem": args.mem}
+        return f"profile.{args.action}", None
+    if args.command in ("timers", "tasks"):
+        return args.command, None
+    if args.command == "devices":
+        if not args.address:
+            return "devices", {"group": args.group} if args.group else None
+        if args.forget:
+            return "devices.remove", {"address": args.address}
+        changes = {}
+        if args.friendly_name is not None:
+            changes["friendly_name"] = args.friendly_name
+        if args.groups is not None:
+            changes["groups"] = [g.strip() for g in args.groups.split(",") if g.strip()]
+        if not changes:
+            raise SystemExit("ledapp ctl devices: give --friendly-name, --groups or --forget with an address")
+        return "devices.update", {"address": args.address, **changes}
+    return "schedule.reload", None
+
+
+def main(argv=None) -> int:
+    args = _build_parser().parse_args(argv)
+    client = IPCClient(args.endpoint, timeout=args.timeout)
+    try:
+        if args.command == "batch":
+            calls = json.loads(args.json if args.json is not None else sys.stdin.read())
+            if not isinstance(calls, list):
+                raise SystemExit("ledapp ctl batch: expected a JSON array")
+            responses = client.batch([(c["method"], c.get("params")) for c in calls])
+            print(json.dumps(responses, ensure_ascii=False, indent=2))
+            return 1 if any(r is None or "error" in r for r in responses) else 0
+        result = client.call(*_single_call(args))
+    except IPCError as e:
+        print(f"ledapp ctl: {e}", file=sys.stderr)
+        return 1
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"ledapp ctl: invalid batch: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+"""Headless daemon: BLE supervisor and schedule engine without Qt.
+
+Started with ``python -m ledapp --headless``. Runs the same reconnect /
+keep-alive / schedule loop as the GUI build on a bare asyncio loop and
+never imports PySide6, so it fits small display-less Linux hosts.
+
+SIGINT / SIGTERM stop the loop and disconnect cleanly, SIGHUP reloads the
+schedule file. Unless ``--no-ipc`` is given the local control socket is
+served too, so ``ledapp ctl`` works against the daemon; ``--http-port``
+(or the ``http_api_enabled`` setting) adds the optional HTTP/WebSocket API
+and ``--mqtt-host`` (or ``mqtt_enabled``) the MQTT bridge. ``--metrics-port``
+serves Prometheus metrics; a JSON snapshot is written on exit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import logging
+import signal
+import threading
+from datetime import datetime, time as dt_time, timedelta
+
+from .config import CONFIG_FILE
+from .core import schedule_store
+from .core.device_registry import get_registry
+from .core.local_tz import LOCAL_TZ
+from .core.reconnect_handler import request_schedule_check, start_ble_connection_loop
+from .core.schedule_engine import ScheduleEngine
+from .core.schedule_rules import localize
+from .services import config_service
+from .services.ble_service import BLEService
+from .services.control_service import ControlService
+from .services.instance_guard import claim_primary
+from .services.ipc_service import InstanceRunningError, IPCServer
+from .util import metrics, tracing
+from .util.loop_monitor import LoopMonitor
+from .util.profiling import PROFILER
+from .util.clock import get_clock
+
+SHUTDOWN_TIMEOUT = 10.0
+
+
+class HeadlessApp:
+    """Application state shared with the reconnect loop (no Qt signals)."""
+
+    def __init__(self, device: tuple[str, str], schedule_path: str = CONFIG_FILE):
+        self.selected_device = device
+        self.schedule_path = schedule_path
+        self.ble = BLEService()
+        self.connection_status = "disconnected"
+        self.schedule = {}
+        self.schedule_engine = None
+        self.latitude = None
+        self.longitude = None
+        self.sunrise = None
+        self.sunset = None
+        self.is_led_on = False
+        self.last_color_hex = None
+        self.last_user_input = get_clock().time()
+        self.active_scene = None
+
+    def reload_schedule(self):
+        self.schedule = schedule_store.load_schedule(self.schedule_path)
+        self.schedule_engine = ScheduleEngine.from_schedule(self.schedule)
+        request_schedule_check(self)
+        logging.info("Daemon: schedule loaded from %s", self.schedule_path)
+
+
+class LEDDaemon:
+    """Owns the event loop tasks of the headless build."""
+
+    def __init__(self, app: HeadlessApp, use_sun: bool = True, use_ipc: bool = True,
+                 http_address: tuple[str, int] | None = None, mqtt_bridge=None, metrics_port: int = 0,
+                 profile: tuple[str, ...] = ()):
+        self.app = app
+        self.use_sun = use_sun
+        self.control = ControlService(app, schedule_path=app.schedule_path)
+        self.ipc_server = IPCServer(self.control) if use_ipc else None
+        self.http_api = None
+        if http_address is not None:
+            from .services.http_api import HTTPAPI
+            self.http_api = HTTPAPI(self.control, *http_address)
+        self.mqtt_bridge = mqtt_bridge(self.control) if mqtt_bridge else None
+        self.metrics_server = metrics.MetricsServer(port=metrics_port) if metrics_port else None
+        self.profile = profile
+        self.stop_event = threading.Event()
+        self._stopped = None
+
+    def request_stop(self):
+        if not self.stop_event.is_set():
+            logging.info("Daemon: shutdown requested")
+            self.stop_event.set()
+            self._stopped.set()
+
+    def _install_signal_handlers(self, loop):
+        handlers = {signal.SIGINT: self.request_stop, signal.SIGTERM: self.request_stop}
+        if hasattr(signal, "SIGHUP"):
+            handlers[signal.SIGHUP] = self.app.reload_schedule
+        for sig, handler in handlers.items():
+            try:
+                loop.add_signal_handler(sig, handler)
+            except NotImplementedError:
+                # Windows: no loop signal support, fall back to signal.signal
+                signal.signal(sig, lambda *_args, h=handler: loop.call_soon_threadsafe(h))
+
+    async def _refresh_sun_times(self):
+        """Fetches location once, then recomputes sun times after each midnight."""
+        from .core.location_utils import get_coordinates, get_sun_times
+
+        clock = get_clock()
+        loop = asyncio.get_running_loop()
+        lat, lon, located = await loop.run_in_executor(None, get_coordinates)
+        self.app.latitude, self.app.longitude = lat, lon
+        logging.info("Daemon: location %.4f, %.4f (%s)", lat, lon, "located" if located else "default")
+        while not self.stop_event.is_set():
+            now = clock.now(LOCAL_TZ)
+            self.app.sunrise, self.app.sunset = get_sun_times(lat, lon, now=now)
+            request_schedule_check(self.app)
+            tomorrow = localize(LOCAL_TZ, datetime.combine(now.date() + timedelta(days=1), dt_time()))
+            await clock.sleep((tomorrow - now).total_seconds() + 1)
+
+    async def run(self) -> int:
+        loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self.ipc_server:
+            try:
+                await self.ipc_server.start()
+            except InstanceRunningError as e:
+                logging.error("Daemon: %s", e)
+                return 1
+        if self.http_api:
+            try:
+                await self.http_api.start()
+            except OSError as e:
+                logging.error("Daemon: HTTP API could not start: %s", e)
+                self.http_api = None
+        if self.mqtt_bridge:
+            await self.mqtt_bridge.start()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logging.error("Daemon: metrics endpoint could not start: %s", e)
+                self.metrics_server = None
+        self._install_signal_handlers(loop)
+        self.app.reload_schedule()
+        monitor = LoopMonitor(loop, "daemon", on_health=lambda health, detail: logging.warning(
+            "Daemon: event loop %s (%s)", health, detail))
+        monitor.start()
+        PROFILER.register_loop(loop, "daemon")
+        if self.profile:
+            PROFILER.start(cpu="cpu" in self.profile, mem="mem" in self.profile)
+
+        name, address = self.app.selected_device
+        logging.info("Daemon: supervising '%s' (%s)", name, address)
+        supervisor = asyncio.create_task(start_ble_connection_loop(self.app, self.stop_event))
+        helpers = [asyncio.create_task(self._refresh_sun_times())] if self.use_sun else []
+
+        stop_wait = asyncio.create_task(self._stopped.wait())
+        await asyncio.wait({supervisor, stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+        self.stop_event.set()
+        stop_wait.cancel()
+        for task in helpers:
+            task.cancel()
+
+        # The supervisor may be sleeping in a rescan/retry delay; cancelling
+        # it lands in its CancelledError branch, which disconnects the device.
+        supervisor.cancel()
+        try:
+            await asyncio.wait_for(supervisor, SHUTDOWN_TIMEOUT)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            logging.warning("Daemon: supervisor did not stop within %.0fs", SHUTDOWN_TIMEOUT)
+        if self.app.ble.client:
+            await self.app.ble.disconnect()
+        await asyncio.gather(*helpers, return_exceptions=True)
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.mqtt_bridge:
+            await self.mqtt_bridge.stop()
+        if self.http_api:
+            await self.http_api.stop()
+        if self.ipc_server:
+            await self.ipc_server.stop()
+        monitor.stop()
+        if PROFILER.active:
+            for path in PROFILER.stop():
+                logging.info("Daemon: profile written to %s", path)
+        logging.info("Daemon: stopped")
+        return 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="ledapp --headless", description="Run LEDapp without a GUI.")
+    parser.add_argument("--address", help="device address (default: last used device)")
+    parser.add_argument("--name", help="device name, friendly name or group from the device registry; "
+                                       "the advertised name is used for rescans (default: last used device)")
+    parser.add_argument("--schedule", default=CONFIG_FILE, help="schedule file")
+    parser.add_argument("--no-sun", action="store_true", help="do not look up location / sun times")
+    parser.add_argument("--no-ipc", action="store_true", help="do not serve the local control socket")
+    parser.add_argument("--http-port", type=int, help="serve the HTTP/WebSocket API on this port (needs aiohttp)")
+    parser.add_argument("--mqtt-host", help="bridge state and commands to this MQTT broker")
+    parser.add_argument("--mqtt-port", type=int, help="MQTT broker port (default: mqtt_port setting)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    parser.add_argument("--profile-cpu", action="store_true", help="run under cProfile, dump on exit")
+    parser.add_argument("--profile-mem", action="store_true", help="trace allocations, dump a snapshot on exit")
+    parser.add_argument("--trace", action="store_true",
+                        help="record spans from startup (export with 'ledapp ctl trace export')")
+    return parser.parse_args(argv)
+
+
+def _resolve_device(args) -> tuple[str | None, str | None]:
+    """``(address, advertised name)`` of the device to supervise: registry lookup, else the settings."""
+    registry = get_registry()
+    if args.address:
+        record = registry.get(args.address)
+    elif args.name:
+        record = registry.resolve(args.name)
+    else:
+        record = registry.last_used()
+    if record is not None:
+        return args.address or record.address, record.name or args.name or record.address
+    address = args.address or config_service.get_setting("last_device_address")
+    return address, args.name or config_service.get_setting("last_device_name") or address
+
+
+def run_headless(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv or [])
+    if not claim_primary():
+        logging.error("Daemon: another LEDapp instance is already running")
+        return 1
+    address, name = _resolve_device(args)
+    if not address:
+        logging.error("Daemon: no device given and no previously used device saved (use --address)")
+        return 2
+
+    if args.trace or config_service.get_setting("trace_enabled"):
+        tracing.TRACER.start(config_service.get_setting("trace_buffer_size"))
+    use_ipc = not args.no_ipc and config_service.get_setting("ipc_enabled")
+    http_address = None
+    if args.http_port is not None or config_service.get_setting("http_api_enabled"):
+        from .services import http_api
+        if not http_api.is_available():
+            logging.error("Daemon: the HTTP API needs aiohttp (pip install aiohttp)")
+            return 2
+        http_address = (config_service.get_setting("http_api_host"),
+                        args.http_port or config_service.get_setting("http_api_port"))
+    mqtt_bridge = None
+    if args.mqtt_host or config_service.get_setting("mqtt_enabled"):
+        from .services.mqtt_bridge import MQTTBridge
+        mqtt_bridge = functools.partial(
+            MQTTBridge,
+            host=args.mqtt_host or config_service.get_setting("mqtt_host"),
+            port=args.mqtt_port or config_service.get_setting("mqtt_port"),
+            base_topic=config_service.get_setting("mqtt_base_topic"),
+            username=config_service.get_setting("mqtt_username"),
+            password=config_service.get_setting("mqtt_password"))
+    daemon = LEDDaemon(HeadlessApp((name, address), args.schedule), use_sun=not args.no_sun,
+                       use_ipc=use_ipc, http_address=http_address, mqtt_bridge=mqtt_bridge,
+                       metrics_port=args.metrics_port or config_service.get_setting("metrics_port"),
+                       profile=tuple(kind for kind in ("cpu", "mem") if getattr(args, f"profile_{kind}")))
+    try:
+        return asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if config_service.get_setting("metrics_dump_file"):
+            metrics.REGISTRY.dump_json(config_service.get_setting("metrics_dump_file"))
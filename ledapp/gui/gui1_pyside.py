@@ -9,12 +9,16 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, Slot, Signal
 from PySide6.QtGui import QFont
 
+from ..util.task_manager import Priority
+
 # Logolás importálása
 try:
     from ..core.reconnect_handler import log_event
 except ImportError:
     def log_event(msg): print(f"[LOG - Dummy GUI1]: {msg}")
 
+SCAN_TASK_TIMEOUT = 30.0 # mp; a felderítés 12 mp, ennyi után a keresés biztosan elakadt
+
 
 class GUI1_Widget(QWidget):
     def __init__(self, main_app, parent=None):
@@ -107,10 +111,12 @@ class GUI1_Widget(QWidget):
         self.progress_label.setText("Keresés folyamatban...")
         self.progress_bar.setRange(0, 0)
         self.update_button_states()
+        # Háttérmunka: a felhasználói parancsok megelőzik; ismételt kattintás a futó kereséshez csatlakozik
         self.main_app.async_helper.run_async_task(
             self.main_app.ble.scan(),
             self.main_app.scan_results_signal,
-            self.main_app.scan_error_signal
+            self.main_app.scan_error_signal,
+            priority=Priority.SCAN, key="scan", timeout=SCAN_TASK_TIMEOUT
         )
 
     @Slot(object)
@@ -150,7 +156,8 @@ class GUI1_Widget(QWidget):
         self.main_app.async_helper.run_async_task(
             self.main_app.ble.connect(address),
             self.main_app.connect_results_signal,
-            self.main_app.connect_error_signal
+            self.main_app.connect_error_signal,
+            key="connect", replace=True # Másik eszköz választásakor az előző csatlakozás megszakad
         )
 
     @Slot(bool)
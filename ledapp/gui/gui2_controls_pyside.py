@@ -60,6 +60,7 @@ class GUI2_ControlsWidget(QWidget):
         power_layout.setSpacing(5)
 
         self.power_off_btn = QPushButton("Kikapcsol")
+        self.power_off_btn.setObjectName("powerOffButton") # Stílus: style.qss (:disabled állapottal)
         font_power = QFont("Arial", 12)
         self.power_off_btn.setFont(font_power)
         self.power_off_btn.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
@@ -68,6 +69,7 @@ class GUI2_ControlsWidget(QWidget):
         power_layout.addWidget(self.power_off_btn)
 
         self.power_on_btn = QPushButton("Bekapcsol")
+        self.power_on_btn.setObjectName("powerOnButton")
         self.power_on_btn.setFont(font_power)
         self.power_on_btn.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
         self.power_on_btn.setMinimumSize(100, 40)
@@ -133,14 +135,7 @@ class GUI2_ControlsWidget(QWidget):
             log_event("Figyelmeztetés: Nincs utoljára használt szín a bekapcsoláshoz.")
 
     def update_power_buttons(self):
-        """Frissíti a ki/bekapcsoló gombok állapotát és stílusát."""
-        if self.main_app.is_led_on:
-            self.power_off_btn.setEnabled(True)
-            self.power_off_btn.setStyleSheet("background-color: #ff6b6b; color: white; border: 1px solid #555; border-radius: 3px;")
-            self.power_on_btn.setEnabled(False)
-            self.power_on_btn.setStyleSheet("background-color: #dddddd; color: #888888; border: 1px solid #aaaaaa; border-radius: 3px;")
-        else:
-            self.power_off_btn.setEnabled(False)
-            self.power_off_btn.setStyleSheet("background-color: #dddddd; color: #888888; border: 1px solid #aaaaaa; border-radius: 3px;")
-            self.power_on_btn.setEnabled(True)
-            self.power_on_btn.setStyleSheet("background-color: #4CAF50; color: white; border: 1px solid #555; border-radius: 3px;")
+        """Frissíti a ki/bekapcsoló gombok állapotát; a színt a style.qss :disabled szabálya adja."""
+        is_on = bool(self.main_app.is_led_on)
+        self.power_off_btn.setEnabled(is_on) # Változatlan állapotnál a Qt nem csinál semmit
+        self.power_on_btn.setEnabled(not is_on)
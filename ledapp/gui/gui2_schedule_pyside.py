@@ -11,11 +11,13 @@ import sys
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGridLayout,
     QComboBox, QLineEdit, QCheckBox, QFrame, QSpacerItem, QSizePolicy,
-    QMessageBox, QGroupBox
+    QMessageBox, QGroupBox, QTableView, QHeaderView, QAbstractItemView
 )
-from PySide6.QtCore import Qt, QTimer, Slot, QTime
+from PySide6.QtCore import Qt, Slot, QTime
 from PySide6.QtGui import QFont, QColor
 
+from ..util import timer_wheel
+
 # --- Logolás ---
 try:
     from ..core.reconnect_handler import log_event
@@ -32,6 +34,8 @@ try:
     from ..core.location_utils import get_sun_times, LOCAL_TZ
     from . import gui2_schedule_logic as logic
     from .gui2_controls_pyside import GUI2_ControlsWidget
+    from .schedule_model import ScheduleTableModel, install_delegates
+    from .ui_state import set_style_property
     logic.LOCAL_TZ = LOCAL_TZ
     log_event("GUI2Schedule: Szükséges modulok sikeresen importálva.")
 
@@ -66,6 +70,8 @@ except ImportError as e:
             def check_schedule(widget): pass
             @staticmethod
             def get_local_sun_info(): return {"latitude": 0, "longitude": 0, "sunrise": None, "sunset": None, "located": False}
+            @staticmethod
+            def now_local(): return datetime.now(pytz.utc)
         logic = DummyLogic()
     if 'GUI2_ControlsWidget' not in globals():
         from PySide6.QtWidgets import QLabel
@@ -75,6 +81,8 @@ except ImportError as e:
     if 'DAYS' not in globals(): DAYS = []
     if 'LOCAL_TZ' not in globals(): LOCAL_TZ = pytz.utc
 
+CLOCK_TOLERANCE = 0.05 # mp; ennyit késhet az óra a másodperc-határhoz képest
+
 
 # --- Osztály Definíció ---
 class GUI2_Widget(QWidget):
@@ -94,8 +102,8 @@ class GUI2_Widget(QWidget):
         top_left_widget = QWidget(); top_left_layout = QVBoxLayout(top_left_widget)
         top_left_layout.setContentsMargins(0,0,0,0); top_left_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
         device_name = self.main_app.selected_device[0] if self.main_app.selected_device else "Ismeretlen"
-        device_label = QLabel(f"Csatlakoztatott eszköz: {device_name}"); device_label.setFont(QFont("Arial", 12))
-        top_left_layout.addWidget(device_label); self.status_indicator_label = QLabel("Állapot: Lekérdezés...")
+        self.device_label = QLabel(f"Csatlakoztatott eszköz: {device_name}"); self.device_label.setFont(QFont("Arial", 12))
+        top_left_layout.addWidget(self.device_label); self.status_indicator_label = QLabel("Állapot: Lekérdezés..."); self.status_indicator_label.setObjectName("statusIndicatorLabel")
         font_status = QFont("Arial", 11, QFont.Weight.Bold); self.status_indicator_label.setFont(font_status)
         top_left_layout.addWidget(self.status_indicator_label); top_bar_layout.addWidget(top_left_widget, 1)
 
@@ -106,22 +114,21 @@ class GUI2_Widget(QWidget):
         self.time_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
         info_layout.addWidget(self.time_label)
         try:
-            sun_info = logic.get_local_sun_info(); self.main_app.latitude = sun_info["latitude"]; self.main_app.longitude = sun_info["longitude"]
+            # Az indítási folyamat (core.startup) már kiszámolta: ne blokkoljuk a GUI-t a hálózati helylekéréssel
+            sun_info = getattr(self.main_app, 'sun_info', None) or logic.get_local_sun_info(); self.main_app.latitude = sun_info["latitude"]; self.main_app.longitude = sun_info["longitude"]
             self.main_app.sunrise = sun_info["sunrise"]; self.main_app.sunset = sun_info["sunset"]; located = sun_info["located"]
         except Exception as e: log_event(f"Hiba a get_local_sun_info hívásakor GUI2 initben: {e}"); located = False; self.main_app.latitude = 47.4338; self.main_app.longitude = 19.1931; self.main_app.sunrise = None; self.main_app.sunset = None
-        sunrise_str = self.main_app.sunrise.strftime('%H:%M') if self.main_app.sunrise else "N/A"; sunset_str = self.main_app.sunset.strftime('%H:%M') if self.main_app.sunset else "N/A"
-        self.sun_label = QLabel(f"Napkelte: {sunrise_str} | Naplemente: {sunset_str}"); self.sun_label.setFont(QFont("Arial", 11, QFont.Weight.Bold)); self.sun_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        info_layout.addWidget(self.sun_label); lat = self.main_app.latitude; lon = self.main_app.longitude
-        tz_name = logic.LOCAL_TZ.zone if hasattr(logic, 'LOCAL_TZ') and hasattr(logic.LOCAL_TZ, 'zone') else str(getattr(logic, 'LOCAL_TZ', 'Ismeretlen'))
-        self.coord_label = QLabel(f"Koordináták: {lat:.4f}°É, {lon:.4f}°K | Időzóna: {tz_name}"); self.coord_label.setFont(QFont("Arial", 10, QFont.Weight.Bold)); self.coord_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.sun_label = QLabel(); self.sun_label.setFont(QFont("Arial", 11, QFont.Weight.Bold)); self.sun_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        info_layout.addWidget(self.sun_label)
+        self.coord_label = QLabel(); self.coord_label.setFont(QFont("Arial", 10, QFont.Weight.Bold)); self.coord_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         info_layout.addWidget(self.coord_label); top_bar_layout.addWidget(info_widget, 2)
 
         # Jobb: Pozíció státusz
         top_right_widget = QWidget(); top_right_layout = QVBoxLayout(top_right_widget); top_right_layout.setContentsMargins(0,0,0,0); top_right_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignRight)
-        status_text = "Pozíció: Meghatározva" if located else "Pozíció: Alapértelmezett"; status_color = "lime" if located else "#FFA500"
-        self.position_status_label = QLabel(status_text); font_pos_status = QFont("Arial", 10, QFont.Weight.Bold); self.position_status_label.setFont(font_pos_status); self.position_status_label.setStyleSheet(f"color: {status_color}; background-color: transparent;")
-        top_right_layout.addWidget(self.position_status_label); coord_only_label = QLabel(f"({lat:.2f}, {lon:.2f})"); coord_only_label.setFont(QFont("Arial", 8)); coord_only_label.setStyleSheet("color: gray; background-color: transparent;")
-        top_right_layout.addWidget(coord_only_label, 0, Qt.AlignmentFlag.AlignRight); top_bar_layout.addWidget(top_right_widget, 1)
+        self.position_status_label = QLabel(); self.position_status_label.setObjectName("positionStatusLabel"); font_pos_status = QFont("Arial", 10, QFont.Weight.Bold); self.position_status_label.setFont(font_pos_status)
+        top_right_layout.addWidget(self.position_status_label); self.coord_only_label = QLabel(); self.coord_only_label.setFont(QFont("Arial", 8)); self.coord_only_label.setStyleSheet("color: gray; background-color: transparent;")
+        top_right_layout.addWidget(self.coord_only_label, 0, Qt.AlignmentFlag.AlignRight); top_bar_layout.addWidget(top_right_widget, 1)
+        self.show_sun_info(located)
         # --- Felső sáv vége ---
         main_layout.addLayout(top_bar_layout)
         main_layout.addStretch(1) # Rugalmas térköz visszaállítása
@@ -131,41 +138,20 @@ class GUI2_Widget(QWidget):
         main_layout.addWidget(self.controls_widget, 0, Qt.AlignmentFlag.AlignCenter)
         main_layout.addStretch(1) # Rugalmas térköz visszaállítása
 
-        # --- Ütemező Táblázat (GroupBox nélkül) ---
-        table_container = QWidget()
-        table_layout = QGridLayout(table_container)
-        table_layout.setSpacing(5)
-        table_layout.setHorizontalSpacing(15)
-        table_layout.setVerticalSpacing(8)
-        table_layout.setColumnStretch(1, 1); table_layout.setColumnStretch(2, 0); table_layout.setColumnStretch(3, 0); table_layout.setColumnStretch(5, 0); table_layout.setColumnStretch(7, 0)
-        headers = ["Nap", "Szín", "Fel", "Le", "Napkelte", "+/-", "Napnyugta", "+/-"]
-        for i, header in enumerate(headers): label = QLabel(header); label.setFont(QFont("Arial", 10, QFont.Weight.Bold)); align = Qt.AlignmentFlag.AlignLeft if i == 0 else Qt.AlignmentFlag.AlignCenter; table_layout.addWidget(label, 0, i, align)
-        self.schedule_widgets = {}; self.time_comboboxes = []; logic.load_schedule_from_file(self.main_app); color_display_names = ["Nincs kiválasztva"] + [c[0] for c in COLORS]; valid_color_names = [c[0] for c in COLORS]
-        for i, day_hu in enumerate(DAYS):
-            row = i + 1; day_widgets = {}; schedule_data = self.main_app.schedule.get(day_hu, {})
-            day_label = QLabel(day_hu, font=QFont("Arial", 10)); table_layout.addWidget(day_label, row, 0, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-            color_cb = QComboBox(); color_cb.addItems(color_display_names); saved_color = schedule_data.get("color", ""); color_cb.setCurrentIndex(color_display_names.index(saved_color) if saved_color in valid_color_names else 0)
-            table_layout.addWidget(color_cb, row, 1); day_widgets["color"] = color_cb
-            time_values = [""] + [f"{h:02d}:{m:02d}" for h in range(24) for m in range(0, 60, 5)]
-            # <<<--- ITT VAN A VÁLTOZTATÁS --->>>
-            on_time_cb = QComboBox(); on_time_cb.addItems(time_values); on_time_cb.setCurrentText(schedule_data.get("on_time", "")); on_time_cb.setEditable(True); on_time_cb.setFixedWidth(85) # Szélesség növelve
-            table_layout.addWidget(on_time_cb, row, 2, Qt.AlignmentFlag.AlignCenter); day_widgets["on_time"] = on_time_cb; self.time_comboboxes.append(on_time_cb)
-            off_time_cb = QComboBox(); off_time_cb.addItems(time_values); off_time_cb.setCurrentText(schedule_data.get("off_time", "")); off_time_cb.setEditable(True); off_time_cb.setFixedWidth(85) # Szélesség növelve
-            table_layout.addWidget(off_time_cb, row, 3, Qt.AlignmentFlag.AlignCenter); day_widgets["off_time"] = off_time_cb; self.time_comboboxes.append(off_time_cb)
-            # <<<--- VÁLTOZTATÁS VÉGE --->>>
-            sunrise_cb = QCheckBox(); sunrise_cb.setChecked(schedule_data.get("sunrise", False)); table_layout.addWidget(sunrise_cb, row, 4, Qt.AlignmentFlag.AlignCenter)
-            day_widgets["sunrise"] = sunrise_cb; sunrise_cb.stateChanged.connect(lambda state, d=day_hu: self.toggle_sun_time(state, d, "sunrise"))
-            sunrise_offset_entry = QLineEdit(str(schedule_data.get("sunrise_offset", 0))); sunrise_offset_entry.setFixedWidth(40); sunrise_offset_entry.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            table_layout.addWidget(sunrise_offset_entry, row, 5, Qt.AlignmentFlag.AlignCenter); day_widgets["sunrise_offset"] = sunrise_offset_entry
-            sunset_cb = QCheckBox(); sunset_cb.setChecked(schedule_data.get("sunset", False)); table_layout.addWidget(sunset_cb, row, 6, Qt.AlignmentFlag.AlignCenter)
-            day_widgets["sunset"] = sunset_cb; sunset_cb.stateChanged.connect(lambda state, d=day_hu: self.toggle_sun_time(state, d, "sunset"))
-            sunset_offset_entry = QLineEdit(str(schedule_data.get("sunset_offset", 0))); sunset_offset_entry.setFixedWidth(40); sunset_offset_entry.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            table_layout.addWidget(sunset_offset_entry, row, 7, Qt.AlignmentFlag.AlignCenter); day_widgets["sunset_offset"] = sunset_offset_entry
-            self.schedule_widgets[day_hu] = day_widgets
-            self.toggle_sun_time(sunrise_cb.checkState(), day_hu, "sunrise")
-            self.toggle_sun_time(sunset_cb.checkState(), day_hu, "sunset")
+        # --- Ütemező Táblázat (modell/nézet) ---
+        # Cellánként nincs widget: a nézet csak a látható sorokat rajzolja, szerkesztéskor a delegate ad szerkesztőt
+        self.schedule_model = ScheduleTableModel(self)
+        self.schedule_view = QTableView(); self.schedule_view.setModel(self.schedule_model); install_delegates(self.schedule_view)
+        self.schedule_view.setEditTriggers(QAbstractItemView.EditTrigger.AllEditTriggers); self.schedule_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.schedule_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed); self.schedule_view.verticalHeader().setDefaultSectionSize(32) # Nincs soronkénti méretszámítás
+        self.schedule_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed); self.schedule_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for column, width in enumerate((0, 85, 85, 80, 60, 90, 60)):
+            if width: self.schedule_view.setColumnWidth(column, width)
+        self.schedule_view.setMinimumWidth(760); self.schedule_view.setMinimumHeight(self.schedule_view.horizontalHeader().sizeHint().height() + 7 * 32 + 4)
+        self.schedule_model.validityChanged.connect(self.on_schedule_validity_changed)
+        self.load_schedule_into_table()
         # --- Ütemező Táblázat Vége ---
-        main_layout.addWidget(table_container, 0, Qt.AlignmentFlag.AlignCenter)
+        main_layout.addWidget(self.schedule_view, 0, Qt.AlignmentFlag.AlignCenter)
         main_layout.addSpacing(10)
 
         # --- Ütemező és Indítási Gombok / Checkbox egy sorban ---
@@ -186,8 +172,9 @@ class GUI2_Widget(QWidget):
         schedule_action_layout.addStretch(1)
         reset_button = QPushButton("Alaphelyzet"); reset_button.clicked.connect(self.reset_schedule_gui)
         schedule_action_layout.addWidget(reset_button)
-        save_button = QPushButton("Mentés"); save_button.clicked.connect(lambda: logic.save_schedule(self))
-        schedule_action_layout.addWidget(save_button)
+        self.save_button = QPushButton("Mentés"); self.save_button.clicked.connect(lambda: logic.save_schedule(self))
+        self.on_schedule_validity_changed(not self.schedule_model.has_errors)
+        schedule_action_layout.addWidget(self.save_button)
         main_layout.addLayout(schedule_action_layout)
         # --- Ütemező és Indítási Gombok Vége ---
 
@@ -204,15 +191,64 @@ class GUI2_Widget(QWidget):
         # --- Alsó Gombok Vége ---
 
         # --- Időzítők ---
-        self.update_time_timer = QTimer(self) # Csak az óra időzítője
-        self.update_time_timer.timeout.connect(self.update_time)
-        self.update_time_timer.start(1000)
-        self.update_time()
+        self._clock_timer = None # Az óra saját QTimer helyett a közös időzítő keréken (util.timer_wheel) jár
+        self.start_timers()
+
+    # --- Gyorsítótárazott képernyő (GuiManager) ---
+    def refresh(self):
+        """Újbóli megjelenítéskor csak az adatokat frissíti: eszköznév, nap adatok, ütemezés, kapcsolók.
+
+        A widgetek megmaradnak, helylekérés nincs: a nap adatokat az indítási
+        folyamat (vagy az első megnyitás) már kiszámolta.
+        """
+        device_name = self.main_app.selected_device[0] if self.main_app.selected_device else "Ismeretlen"
+        self.device_label.setText(f"Csatlakoztatott eszköz: {device_name}")
+        sun_info = getattr(self.main_app, 'sun_info', None)
+        self.show_sun_info(sun_info["located"] if sun_info else self._located)
+        self.load_schedule_into_table()
+        if self.startup_checkbox.isEnabled():
+            self.startup_checkbox.blockSignals(True)
+            self.startup_checkbox.setChecked(bool(config_service.get_setting("start_with_windows")))
+            self.startup_checkbox.blockSignals(False)
+        if hasattr(self.controls_widget, 'update_power_buttons'):
+            self.controls_widget.update_power_buttons()
+
+    def show_sun_info(self, located):
+        """Napkelte/napnyugta, koordináta és pozíció címkék a main_app adataiból."""
+        self._located = located
+        sunrise_str = self.main_app.sunrise.strftime('%H:%M') if self.main_app.sunrise else "N/A"; sunset_str = self.main_app.sunset.strftime('%H:%M') if self.main_app.sunset else "N/A"
+        self.sun_label.setText(f"Napkelte: {sunrise_str} | Naplemente: {sunset_str}"); lat = self.main_app.latitude; lon = self.main_app.longitude
+        tz_name = logic.LOCAL_TZ.zone if hasattr(logic, 'LOCAL_TZ') and hasattr(logic.LOCAL_TZ, 'zone') else str(getattr(logic, 'LOCAL_TZ', 'Ismeretlen'))
+        self.coord_label.setText(f"Koordináták: {lat:.4f}°É, {lon:.4f}°K | Időzóna: {tz_name}")
+        self.position_status_label.setText("Pozíció: Meghatározva" if located else "Pozíció: Alapértelmezett")
+        set_style_property(self.position_status_label, "located", bool(located)) # Szín: style.qss
+        self.coord_only_label.setText(f"({lat:.2f}, {lon:.2f})")
+
+    def load_schedule_into_table(self):
+        """Betölti az ütemezést a fájlból az ütemező táblázat modelljébe."""
+        logic.load_schedule_from_file(self.main_app)
+        self.schedule_model.load(self.main_app.schedule)
+
+    @Slot(bool)
+    def on_schedule_validity_changed(self, valid):
+        """A cellánkénti ellenőrzés eredménye: hibás cella mellett a Mentés le van tiltva."""
+        if not hasattr(self, 'save_button'): return # A táblázat a gombok előtt töltődik be
+        self.save_button.setEnabled(valid)
+        error = self.schedule_model.first_error()
+        self.save_button.setToolTip("" if valid or error is None else error[1])
 
     # --- Slot Metódusok ---
+    def start_timers(self):
+        if self._clock_timer is None:
+            # Másodperc-határra igazítva; a tűrésen belül más időzítőkkel közös ébredés, a frissítés a GUI szálon fut
+            wheel = timer_wheel.for_loop(self.main_app.async_helper.loop)
+            self._clock_timer = wheel.call_every(1.0, self.main_app.run_in_gui_signal.emit, self.update_time,
+                                                 delay=1.0 - time.time() % 1.0, tolerance=CLOCK_TOLERANCE, name="gui2.clock")
+        self.update_time()
+
     def stop_timers(self):
         log_event("GUI2 Timers stopping (only clock timer)...")
-        if hasattr(self, 'update_time_timer'): self.update_time_timer.stop()
+        if getattr(self, '_clock_timer', None) is not None: self._clock_timer.cancel(); self._clock_timer = None
         log_event("GUI2 Timers stopped.")
 
     @Slot()
@@ -223,16 +259,7 @@ class GUI2_Widget(QWidget):
                                      QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
             log_event("Ütemező GUI visszaállítása alaphelyzetbe...")
-            for day, widgets in self.schedule_widgets.items():
-                widgets["color"].setCurrentIndex(0)
-                widgets["on_time"].setCurrentText("")
-                widgets["off_time"].setCurrentText("")
-                widgets["sunrise"].setChecked(False)
-                widgets["sunrise_offset"].setText("0")
-                widgets["sunset"].setChecked(False)
-                widgets["sunset_offset"].setText("0")
-                self.toggle_sun_time(Qt.CheckState.Unchecked.value, day, "sunrise")
-                self.toggle_sun_time(Qt.CheckState.Unchecked.value, day, "sunset")
+            self.schedule_model.reset_rows()
 
 
     @Slot(int)
@@ -266,49 +293,12 @@ class GUI2_Widget(QWidget):
              config_service.set_setting("start_with_windows", not is_checked)
 
 
-    # <<<--- ITT VAN A MÓDOSÍTOTT LOGIKA --->>>
-    @Slot(int, str, str)
-    def toggle_sun_time(self, state, day, sun_event_type):
-        """
-        Engedélyezi/letiltja a megfelelő idő és offset mezőket a Napkelte/Napnyugta
-        checkbox állapota alapján. Letiltáskor kiüríti az idő mezőt.
-        """
-        is_checked = bool(state == Qt.CheckState.Checked.value)
-
-        if day not in self.schedule_widgets:
-            log_event(f"HIBA: Ismeretlen nap a toggle_sun_time-ban: {day}")
-            return
-
-        day_widgets = self.schedule_widgets[day]
-
-        offset_entry_key = f"{sun_event_type}_offset"
-        time_combo_key = "on_time" if sun_event_type == "sunrise" else "off_time"
-
-        if offset_entry_key not in day_widgets or time_combo_key not in day_widgets:
-            log_event(f"HIBA: Hiányzó widget kulcsok a toggle_sun_time-ban: {offset_entry_key} vagy {time_combo_key}")
-            return
-
-        offset_entry = day_widgets[offset_entry_key]
-        time_combo = day_widgets[time_combo_key]
-
-        if is_checked:
-            # Ha a Napkelte/Napnyugta be van jelölve:
-            time_combo.setEnabled(False)    # <<< Idő mező letiltása >>>
-            time_combo.setCurrentText("")   # <<< Idő mező kiürítése >>>
-            offset_entry.setEnabled(True)   # Offset mező engedélyezése
-        else:
-            # Ha a Napkelte/Napnyugta nincs bejelölve:
-            time_combo.setEnabled(True)     # <<< Idő mező engedélyezése >>>
-            offset_entry.setEnabled(False)  # Offset mező letiltása
-            # offset_entry.setText("0") # Opcionális: offset nullázása
-    # <<<--- MÓDOSÍTOTT LOGIKA VÉGE --->>>
-
-
     @Slot()
     def update_time(self):
         try:
-            now = datetime.now(logic.LOCAL_TZ)
-            magyar_nap = DAYS_HU.get(now.strftime('%A'), now.strftime('%A'))
+            now = logic.now_local()
+            # DAYS_HU hétfőtől induló lista (korábban hibásan dict-ként .get()-tel olvastuk)
+            magyar_nap = DAYS_HU[now.weekday()] if len(DAYS_HU) == 7 else now.strftime('%A')
             self.time_label.setText(f"{now.strftime('%Y.%m.%d')} | {magyar_nap} | {now.strftime('%H:%M:%S')}")
         except Exception as e:
             log_event(f"Hiba az idő frissítésekor: {e}")
@@ -2,32 +2,48 @@
 
 import sys
 import os
-import threading
-import asyncio
 # import traceback # No longer needed for logging exceptions
 import logging # Import the logging module
 import time # Import time for sleep
 
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QMessageBox
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QMessageBox, QStackedWidget, QSizePolicy
 from PySide6.QtCore import Qt, QMetaObject
 
 # Core application imports
 from .gui1_pyside import GUI1_Widget
-from .gui2_schedule_pyside import GUI2_Widget
+# A GUI2 (ütemező) modul csak az első megnyitáskor töltődik be: a sun/location
+# logika és a requests nélkül a tálcás indulás gyorsabb (lásd ledapp.startup_bench)
 from ..core.reconnect_handler import start_ble_connection_loop
+from ..util import metrics
+from ..util.power import POWER, ACTIVE
+from ..util.task_manager import Priority
 # (Old try-except ImportError for dummy fallbacks removed to ensure fail-fast on missing components)
 
+GUI2_MODULE = f"{__package__}.gui2_schedule_pyside"
+SCREEN_SWITCHES = metrics.histogram("gui_screen_switch_seconds", "GuiManager screen switch time (build or refresh)")
+
+
+def is_gui2_widget(widget):
+    """isinstance(widget, GUI2_Widget), a GUI2 modul betöltése nélkül."""
+    module = sys.modules.get(GUI2_MODULE)
+    return module is not None and isinstance(widget, module.GUI2_Widget)
+
+
 class GuiManager:
     """Segédosztály a GUI megjelenítésének és váltásának kezelésére."""
 
     def __init__(self, app_instance: QMainWindow):
         self.app = app_instance
-        self.reconnect_thread = None
+        self.reconnect_task = None # A reconnect loop futása az AsyncHelper hurkán (concurrent Future)
         self.central_widget = self.app.centralWidget()
         self.main_layout = self.central_widget.layout()
         if not self.main_layout:
              self.main_layout = QVBoxLayout(self.central_widget)
              logging.warning("GuiManager init, layout létrehozva.")
+        # Képernyő gyorsítótár: a GUI1/GUI2 egyszer épül fel, váltáskor csak a látható lap cserélődik
+        self.stack = QStackedWidget(self.central_widget)
+        self.main_layout.addWidget(self.stack)
+        self._screens = {}
 
 
     def _apply_stylesheet(self):
@@ -61,61 +77,65 @@ class GuiManager:
                 else: logging.error("Hiba: Nem található elsődleges képernyő.")
             except Exception as e: logging.error(f"Hiba az ablak középre igazítása közben: {e}")
 
-    def _clear_layout(self, layout):
-        """Rekurzív layout törlő (fallback)."""
-        if layout is not None:
-            while layout.count():
-                item = layout.takeAt(0)
-                widget = item.widget()
-                if widget is not None:
-                    if hasattr(widget, 'stop_timers') and callable(widget.stop_timers):
-                        try: widget.stop_timers()
-                        except Exception as e: logging.error(f"Hiba a widget stop_timers hívásakor (_clear_layout): {e}")
-                    widget.deleteLater()
-                else:
-                    sub_layout = item.layout()
-                    if sub_layout is not None:
-                        self._clear_layout(sub_layout)
-
-    def clear_window_content(self):
-        """Törli az aktuálisan megjelenített GUI widgetet."""
-        current_widget = self.app._current_gui_widget
-        if isinstance(current_widget, GUI2_Widget):
-             logging.info("clear_window_content: GUI2 volt aktív, reconnect loop stop jelzés...")
+    def _show_screen(self, key, factory):
+        """Megjeleníti a `key` képernyőt a QStackedWidgetben.
+
+        Minden képernyő csak egyszer épül fel (`factory(app)`), később csak az
+        adatait frissítjük (`refresh()`), a widgetek nem törlődnek. A rejtett
+        képernyő időzítői állnak, és a mérete nem számít bele az ablakéba.
+        """
+        started = time.perf_counter()
+        previous = self.app._current_gui_widget
+        widget = self._screens.get(key)
+        built = widget is None
+        if built:
+            widget = factory(self.app)
+            self._screens[key] = widget
+            self.stack.addWidget(widget)
+        if previous is not None and previous is not widget:
+            if hasattr(previous, 'stop_timers') and callable(previous.stop_timers):
+                try: previous.stop_timers()
+                except Exception as e: logging.error(f"Hiba a {previous.objectName()} stop_timers hívásakor: {e}")
+            previous.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        widget.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Preferred)
+        if not built and hasattr(widget, 'refresh'):
+            widget.refresh()
+        # Rejtett ablakban (tálca, util.power) a UI időzítők állnak
+        if POWER.mode == ACTIVE:
+            if not built and hasattr(widget, 'start_timers'):
+                widget.start_timers()
+        elif hasattr(widget, 'stop_timers'):
+            widget.stop_timers()
+        self.stack.setCurrentWidget(widget)
+        self.app._current_gui_widget = widget
+        elapsed = time.perf_counter() - started
+        SCREEN_SWITCHES.observe(elapsed)
+        logging.debug(f"Képernyőváltás: {key} ({'felépítve' if built else 'gyorsítótárból'}) {elapsed * 1000:.1f} ms")
+        return widget
+
+    def leave_gui2(self):
+        """GUI2 elhagyásakor leállítja a reconnect loopot (a képernyő a gyorsítótárban marad)."""
+        if is_gui2_widget(self.app._current_gui_widget):
+             logging.info("leave_gui2: GUI2 volt aktív, reconnect loop stop jelzés...")
              if hasattr(self.app, '_stop_reconnect_event'):
                  self.app._stop_reconnect_event.set()
-             self.reconnect_thread = None
-
-        if current_widget:
-            logging.info(f"clear_window_content: Aktuális widget törlése: {current_widget.objectName()}")
-            if hasattr(current_widget, 'stop_timers') and callable(current_widget.stop_timers):
-                try: current_widget.stop_timers()
-                except Exception as e: logging.error(f"Hiba a {current_widget.objectName()} stop_timers hívásakor: {e}")
-
-            current_widget.setParent(None)
-            current_widget.deleteLater()
-            self.app._current_gui_widget = None
-        else:
-            logging.warning("clear_window_content: Nem volt aktuális widget referencia, layout ürítése fallbackként.")
-            self._clear_layout(self.main_layout) # Fallback
+             self.app.async_helper.cancel_task("reconnect") # Ne várjon a ciklus végi alvás végéig
+             self.reconnect_task = None
 
     def load_gui1(self):
-        """Betölti az első képernyőt."""
-        self.clear_window_content()
+        """Megjeleníti az első képernyőt."""
+        self.leave_gui2()
         self.app.setWindowTitle("LED-Irányító 2000 - Csatlakozás")
-        self.app.resize(600, 450) # Eredeti méret visszaállítása
-
-        widget = GUI1_Widget(self.app)
-        self.main_layout.addWidget(widget)
-        self.app._current_gui_widget = widget
+        widget = self._show_screen("gui1", GUI1_Widget)
 
         widget.update_button_states()
         widget.update_device_list()
 
+        self.app.resize(600, 450) # Eredeti méret visszaállítása
         self.center_window()
 
     def load_gui2(self):
-        """Betölti a második képernyőt és elindítja a reconnect loopot."""
+        """Megjeleníti a második képernyőt és elindítja a reconnect loopot."""
         if not self.app.selected_device:
             logging.error("Hiba: Nincs kiválasztott eszköz a GUI2 betöltésekor.")
             # Előfordulhat auto-connect hiba után, ne jelenítsünk meg hibaüzenetet itt
@@ -123,57 +143,34 @@ class GuiManager:
             self.load_gui1() # Visszatérünk GUI1-re, ha nincs eszköz
             return False
 
-        self.clear_window_content()
         self.app.setWindowTitle(f"LED-Irányító 2000 - {self.app.selected_device[0]}")
+        from .gui2_schedule_pyside import GUI2_Widget
+        self._show_screen("gui2", GUI2_Widget)
+
+        self.app.refresh_status_widgets() # A gyorsítótárazott képernyő a rejtett ideje alatti állapotot is mutassa
         # GUI2 méretének beállítása (ez felülírhatja a tartalom méretét)
-        # Lehet, hogy jobb a tartalomra bízni vagy fix méretet használni
         self.app.resize(1080, 864) # Vagy egy kisebb/nagyobb fix méret
-
-        widget = GUI2_Widget(self.app)
-        self.main_layout.addWidget(widget)
-        self.app._current_gui_widget = widget
-
-        self.app.update_connection_status_gui(self.app.connection_status)
         self.center_window()
+        return self.start_reconnect_loop()
 
-        # Reconnect thread indítása
-        if self.reconnect_thread is None or not self.reconnect_thread.is_alive():
-            logging.info("Reconnect thread indítása (GuiManager)...")
+    def start_reconnect_loop(self):
+        """Elindítja a kapcsolatfigyelő loopot az AsyncHelper hurkán, ha még nem fut (GUI2 vagy az indítási folyamat hívja).
+
+        Saját szál és hurok helyett a közös hurkon fut: ugyanott, ahol a BLE kliens
+        készült, és a várakozásai a hurok időzítő kerekén (util.timer_wheel) osztoznak
+        a többi időzítővel.
+        """
+        if self.reconnect_task is None or self.reconnect_task.done():
+            logging.info("Reconnect loop indítása az AsyncHelper hurkán (GuiManager)...")
             if hasattr(self.app, '_stop_reconnect_event'):
                 self.app._stop_reconnect_event.clear() # Stop jelzés törlése
             else:
                  logging.critical("HIBA: Nincs _stop_reconnect_event az app példányon GUI2 töltésekor!")
                  return False
 
-            self.reconnect_thread = threading.Thread(
-                target=self._run_reconnect_loop_target,
-                args=(self.app, self.app._stop_reconnect_event),
-                daemon=True
-            )
-            self.reconnect_thread.start()
+            self.reconnect_task = self.app.async_helper.run_async_task(
+                start_ble_connection_loop(self.app, self.app._stop_reconnect_event),
+                priority=Priority.KEEPALIVE, key="reconnect")
+            if self.reconnect_task is None:
+                return False # A hurok nem fut (a hibát a run_async_task logolta)
         return True
-
-    @staticmethod
-    def _run_reconnect_loop_target(app_instance, stop_event):
-        """Külön szálon futó asyncio hurok a kapcsolattartáshoz."""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            logging.info("Reconnect loop thread (új hurok) indítása...")
-            from ..core.reconnect_handler import start_ble_connection_loop
-            loop.run_until_complete(start_ble_connection_loop(app_instance, stop_event))
-        except Exception as e:
-            logging.exception(f"Hiba a reconnect loop futtatása közben: {e}")
-        finally:
-            logging.info("Reconnect loop thread befejeződött.")
-            if loop.is_running():
-                try:
-                    if sys.version_info >= (3, 7):
-                        loop.run_until_complete(loop.shutdown_asyncgens())
-                    loop.call_soon_threadsafe(loop.stop)
-                    time.sleep(0.1)
-                except RuntimeError as e:
-                    logging.error(f"RuntimeError during reconnect loop stop: {e}")
-            if not loop.is_closed():
-                loop.close()
-                logging.info("Asyncio event loop closed in reconnect thread.")
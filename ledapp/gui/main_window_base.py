@@ -15,19 +15,25 @@ from PySide6.QtWidgets import (
     QLabel, QPushButton, QListWidget, QProgressBar, QMessageBox, QFrame,
     QSpacerItem, QSizePolicy, QSystemTrayIcon # QSystemTrayIcon hozzáadva
 )
-from PySide6.QtCore import Qt, QTimer, Signal, Slot, QObject, QThread, QMetaObject, Q_ARG
+from PySide6.QtCore import Qt, QTimer, Signal, Slot, QObject, QThread, QMetaObject, Q_ARG, QEvent
 from PySide6.QtGui import QIcon, QColor, QPalette, QFont
 
 # Importáljuk a szükséges konfigurációs és backend elemeket
 try:
     from ..config import COLORS, DAYS, CONFIG_FILE
     from ..services.ble_service import BLEService
+    from ..services.control_service import ControlService
+    from ..core.device_registry import get_registry
+    from ..services.ipc_service import IPCServer
+    from ..util import metrics, tracing
+    from ..util.profiling import PROFILER
+    from ..util.power import POWER, ACTIVE
     from ..core.reconnect_handler import log_event  # Logolás
     from ..util.async_helper import AsyncHelper
-    from .gui_manager import GuiManager
-    # GUI Widget importok itt is kellenek az isinstance miatt
+    from .gui_manager import GuiManager, is_gui2_widget
+    from .ui_state import UiState, set_style_property, set_text, set_tooltip
+    # GUI Widget importok itt is kellenek az isinstance miatt (a GUI2-t lustán, is_gui2_widget)
     from .gui1_pyside import GUI1_Widget
-    from .gui2_schedule_pyside import GUI2_Widget
     # Új import a config kezelőhöz
     from ..services import config_service
 except ImportError as e:
@@ -45,21 +51,6 @@ except ImportError as e:
     # de a biztonság kedvéért most csak logolunk és megyünk tovább
     # sys.exit(1) # Kilépés hiba esetén
 
-# Időzóna kezelés
-import pytz
-try:
-    import tzlocal
-    LOCAL_TZ = tzlocal.get_localzone()
-    log_event(f"Helyi időzóna (tzlocal): {LOCAL_TZ.zone if LOCAL_TZ else 'Ismeretlen'}")
-except Exception:
-    log_event("tzlocal nem található vagy hiba történt, 'Europe/Budapest' használata.")
-    try:
-        LOCAL_TZ = pytz.timezone("Europe/Budapest")
-        log_event(f"Helyi időzóna (fix): {LOCAL_TZ.zone}")
-    except pytz.UnknownTimeZoneError:
-        log_event("Figyelmeztetés: 'Europe/Budapest' időzóna sem található. UTC használata.")
-        LOCAL_TZ = pytz.utc
-
 
 class LEDApp_BaseWindow(QMainWindow):
     # --- Signals ---
@@ -69,6 +60,9 @@ class LEDApp_BaseWindow(QMainWindow):
     connect_results_signal = Signal(bool)
     connect_error_signal = Signal(str)
     command_error_signal = Signal(str)
+    control_state_signal = Signal(str) # Külső vezérlés (IPC) utáni frissítés
+    loop_health_signal = Signal(str, str, str) # Async hurok állapota (hurok, ok/degraded/stalled, részletek)
+    run_in_gui_signal = Signal(object) # Tetszőleges hívható futtatása a GUI szálon (pl. profiler)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -85,6 +79,8 @@ class LEDApp_BaseWindow(QMainWindow):
 
         # --- Segédosztályok Inicializálása ---
         self.async_helper = AsyncHelper(self)
+        # Állapotfrissítések összevonása: képkockánként egyszer, csak a változás kerül a widgetekre
+        self.ui_state = UiState(self._apply_ui_state, parent=self)
         # Fontos, hogy a GuiManager megkapja az app példányt, amiben az event van
         self.gui_manager = GuiManager(self)
 
@@ -120,6 +116,42 @@ class LEDApp_BaseWindow(QMainWindow):
         self.ble = BLEService()
         self._is_auto_starting = False # Új flag az automatikus indulás jelzésére
         self._initial_connection_attempted = False # Új flag
+        self.active_scene = None # Éppen lejátszott jelenet neve (ScenePlayer állítja)
+
+        # --- Külső vezérlés (ledapp ctl) ---
+        # A parancsok az AsyncHelper hurkán, ugyanazon a BLEService írási során mennek át
+        if config_service.get_setting("trace_enabled"):
+            tracing.TRACER.start(config_service.get_setting("trace_buffer_size"))
+        self.control = ControlService(self)
+        self.control.add_listener(self.control_state_signal.emit)
+        self.ipc_server = None
+        self.http_api = None
+        self.mqtt_bridge = None
+        self.metrics_server = None
+        if config_service.get_setting("ipc_enabled"):
+            self.ipc_server = IPCServer(self.control)
+            self._start_frontend(self.ipc_server, "IPC szerver")
+        if config_service.get_setting("http_api_enabled"):
+            from ..services import http_api # aiohttp csak bekapcsolt API esetén töltődik be
+            if http_api.is_available():
+                self.http_api = http_api.HTTPAPI(self.control,
+                                                 config_service.get_setting("http_api_host"),
+                                                 config_service.get_setting("http_api_port"))
+                self._start_frontend(self.http_api, "HTTP API")
+            else:
+                log_event("HTTP API be van kapcsolva, de az aiohttp nincs telepítve.")
+        if config_service.get_setting("mqtt_enabled"):
+            from ..services.mqtt_bridge import MQTTBridge
+            self.mqtt_bridge = MQTTBridge(self.control,
+                                          config_service.get_setting("mqtt_host"),
+                                          config_service.get_setting("mqtt_port"),
+                                          config_service.get_setting("mqtt_base_topic"),
+                                          config_service.get_setting("mqtt_username"),
+                                          config_service.get_setting("mqtt_password"))
+            self._start_frontend(self.mqtt_bridge, "MQTT híd")
+        if config_service.get_setting("metrics_port"):
+            self.metrics_server = metrics.MetricsServer(port=config_service.get_setting("metrics_port"))
+            self._start_frontend(self.metrics_server, "Metrika végpont")
 
         # --- GUI Indítása ---
         self.gui_manager._apply_stylesheet()
@@ -134,6 +166,53 @@ class LEDApp_BaseWindow(QMainWindow):
         self.connect_results_signal.connect(self._handle_connect_results)
         self.connect_error_signal.connect(self._handle_connect_error)
         self.command_error_signal.connect(self._handle_command_error)
+        self.control_state_signal.connect(self._handle_control_state)
+        self.loop_health_signal.connect(self._handle_loop_health)
+        self.run_in_gui_signal.connect(lambda fn: fn())
+        # A watchdog szálából érkező állapotváltás Qt signalon jut a GUI szálra
+        self.loop_health = {} # hurok neve -> (állapot, részletek)
+        self.async_helper.loop_monitor.on_health = (
+            lambda health, detail: self.loop_health_signal.emit("async_helper", health, detail))
+        # A profiler a GUI szálat is lefedi (cProfile szálanként működik)
+        PROFILER.register_thread("gui", self.run_in_gui_signal.emit)
+        # Energiatakarékos mód: rejtett ablaknál állnak a UI időzítők (util.power)
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(POWER.refresh) # Tétlen mód kezdete (ha közben nem volt bemenet)
+        POWER.add_listener(self._on_power_mode)
+        POWER.set_visible(False) # Megjelenítésig (showEvent) rejtett; tálcás indulásnál az is marad
+
+    # --- Energiatakarékos mód (util.power) ---
+    def _update_power_visibility(self):
+        visible = self.isVisible() and not self.isMinimized()
+        POWER.set_visible(visible)
+        if visible: self._idle_timer.stop()
+        else: self._idle_timer.start(int(POWER.idle_after * 1000) + 100)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_power_visibility()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_power_visibility()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange: # Kis méretre tétel
+            self._update_power_visibility()
+
+    def _on_power_mode(self, mode):
+        """A POWER figyelője; bármelyik szálról jöhet, a GUI szálon alkalmazzuk."""
+        self.run_in_gui_signal.emit(lambda: self._apply_power_mode(mode))
+
+    def _apply_power_mode(self, mode):
+        widget = self._current_gui_widget
+        if mode == ACTIVE:
+            if hasattr(widget, 'start_timers'): widget.start_timers()
+            self.refresh_status_widgets() # A rejtett ideje alatti állapot
+        elif hasattr(widget, 'stop_timers'):
+            widget.stop_timers()
 
     # *** ÚJ SLOT a disconnect utáni GUI1 töltéshez ***
     @Slot()
@@ -154,11 +233,12 @@ class LEDApp_BaseWindow(QMainWindow):
         # Utolsó eszköz törlése a konfigurációból is
         config_service.set_setting("last_device_address", None)
         config_service.set_setting("last_device_name", None)
+        get_registry().forget_last_used() # Az eszköz a nyilvántartásban marad, csak nem csatlakozunk hozzá automatikusan
 
         self.update_connection_status_gui("disconnected") # GUI azonnali frissítése
 
         # 2. Reconnect Loop Leállítása (Signal az eventtel)
-        log_event("Reconnect thread leállításának jelzése...")
+        log_event("Reconnect loop leállításának jelzése...")
         self._stop_reconnect_event.set() # Event beállítása
 
         async def do_disconnect():
@@ -180,7 +260,7 @@ class LEDApp_BaseWindow(QMainWindow):
                 QMetaObject.invokeMethod(self, "_load_gui1_slot", Qt.ConnectionType.QueuedConnection)
 
         # Aszinkron disconnect indítása az AsyncHelperrel
-        self.async_helper.run_async_task(do_disconnect(), None, self.command_error_signal)
+        self.async_helper.run_async_task(do_disconnect(), None, self.command_error_signal, key="disconnect")
 
         # Azonnal frissítjük a GUI1 gombjait és listáját (ha éppen az látható)
         self.update_button_states_if_gui1()
@@ -193,34 +273,62 @@ class LEDApp_BaseWindow(QMainWindow):
              self._current_gui_widget.update_device_list() # Az üres self.devices listát mutatja
 
 
+    def _update_tray_tooltip(self):
+        """ Tálca tooltip: kapcsolat állapota + az async hurok egészsége, ha nem rendben van. """
+        if not (hasattr(self, 'tray_icon') and self.tray_icon):
+            return
+        status = self.connection_status
+        device_name_str = f": {self.selected_device[0]}" if self.selected_device and self.selected_device[0] else ""
+        if status == "connected": tooltip = f"LED-Irányító 2000 (Csatlakozva{device_name_str})"
+        elif status == "connecting": tooltip = f"LED-Irányító 2000 (Csatlakozás...{device_name_str})"
+        else: tooltip = "LED-Irányító 2000 (Nincs kapcsolat)"
+        for loop_name, (health, detail) in getattr(self, 'loop_health', {}).items():
+            if health == "stalled": tooltip += f"\nAsync hurok ({loop_name}) akad: {detail}"
+            elif health == "degraded": tooltip += f"\nAsync hurok ({loop_name}) lassú: {detail}"
+        set_tooltip(self.tray_icon, tooltip)
+
     # --- Signal Handler Slotok ---
+    @Slot(str, str, str)
+    def _handle_loop_health(self, loop_name, health, detail):
+        """ A LoopMonitor állapotváltása (a watchdog szálról, signalon keresztül). """
+        log_event(f"Async hurok ({loop_name}) állapota: {health} ({detail})")
+        self.loop_health[loop_name] = (health, detail)
+        self.ui_state.set("loop_health", dict(self.loop_health))
+
     @Slot(str)
     def update_connection_status_gui(self, status):
+        """Az állapot azonnal érvényes, a kijelzése a következő képkockán (UiState) történik."""
         self.connection_status = status
-        current_widget = self._current_gui_widget
+        self.ui_state.set("connection", status)
+
+    def refresh_status_widgets(self):
+        """Az aktuális állapot újbóli kijelzése, pl. képernyőváltás után."""
+        self.ui_state.invalidate()
+        self.ui_state.set("connection", self.connection_status)
+        self.ui_state.set("loop_health", dict(self.loop_health))
 
+    def _apply_ui_state(self, changed):
+        """A UiState képkockánként egyszer hívja, csak a megváltozott kulcsokkal."""
         # Ha a tálca ikon létezik, frissítsük a tooltipjét
-        if hasattr(self, 'tray_icon') and self.tray_icon:
-             device_name_str = f": {self.selected_device[0]}" if self.selected_device and self.selected_device[0] else ""
-             if status == "connected": tooltip = f"LED-Irányító 2000 (Csatlakozva{device_name_str})"
-             elif status == "connecting": tooltip = f"LED-Irányító 2000 (Csatlakozás...{device_name_str})"
-             else: tooltip = "LED-Irányító 2000 (Nincs kapcsolat)"
-             self.tray_icon.setToolTip(tooltip)
-
-        if isinstance(current_widget, GUI2_Widget):
+        self._update_tray_tooltip()
+        if "connection" not in changed:
+            return
+        status = changed["connection"]
+        current_widget = self._current_gui_widget
+        if is_gui2_widget(current_widget):
             label = getattr(current_widget, 'status_indicator_label', None)
-            if label and label.isVisible():
-                if status == "connected": text, color = "Állapot: Csatlakoztatva", "lime"
-                elif status == "connecting": text, color = "Állapot: Csatlakozás...", "#FFA500"
-                else: text, color = "Állapot: Nincs kapcsolat", "#FF6B6B"
-                label.setText(text)
-                label.setStyleSheet(f"QLabel {{ color: {color}; font-weight: bold; background-color: transparent; }}")
+            if label:
+                if status == "connected": text = "Állapot: Csatlakoztatva"
+                elif status == "connecting": text = "Állapot: Csatlakozás..."
+                else: text, status = "Állapot: Nincs kapcsolat", "disconnected"
+                set_text(label, text)
+                set_style_property(label, "status", status) # Szín: style.qss, QLabel#statusIndicatorLabel[status=...]
         elif isinstance(current_widget, GUI1_Widget):
             progress_label = getattr(current_widget, 'progress_label', None)
             if progress_label and progress_label.isVisible():
-                 if status == "connecting": progress_label.setText("Csatlakozás...")
-                 elif status == "disconnected": progress_label.setText("Kapcsolat bontva.")
-                 elif status == "connected": progress_label.setText("Csatlakozva") # GUI1-en is jelezzük
+                 if status == "connecting": set_text(progress_label, "Csatlakozás...")
+                 elif status == "disconnected": set_text(progress_label, "Kapcsolat bontva.")
+                 elif status == "connected": set_text(progress_label, "Csatlakozva") # GUI1-en is jelezzük
 
     @Slot(object)
     def _handle_scan_results(self, devices):
@@ -259,6 +367,7 @@ class LEDApp_BaseWindow(QMainWindow):
             if self.selected_device:
                 config_service.set_setting("last_device_address", self.selected_device[1])
                 config_service.set_setting("last_device_name", self.selected_device[0])
+                get_registry().mark_connected(*self.selected_device) # Eszköznyilvántartás: utoljára használt
                 log_event(f"Utolsó eszköz elmentve: {self.selected_device[0]} ({self.selected_device[1]})")
             else:
                  log_event("Figyelmeztetés: Sikeres csatlakozás, de self.selected_device üres.")
@@ -342,19 +451,51 @@ class LEDApp_BaseWindow(QMainWindow):
              # Ha parancsküldéskor derül ki, hogy nincs kapcsolat, és GUI2 van nyitva,
              # akkor visszadobhatnánk GUI1-re, de ezt a reconnect handlernek kellene kezelnie.
              # Lehet, hogy itt is jelezni kellene a felhasználónak egyértelműbben.
-             if isinstance(self._current_gui_widget, GUI2_Widget):
+             if is_gui2_widget(self._current_gui_widget):
                   # Opcionális: Hibaüzenet a GUI2-n
                   # QMessageBox.warning(self, "Kapcsolati Hiba", "Megszakadt a kapcsolat az eszközzel.")
                   # Vagy hagyatkozunk a státuszjelzőre és a reconnect loopra.
                   pass
 
 
+    @Slot(str)
+    def _handle_control_state(self, topic):
+        """Külső vezérlés után frissíti a GUI2-t (a fő szálon fut)."""
+        widget = self._current_gui_widget
+        if not is_gui2_widget(widget):
+            return
+        if topic == "schedule":
+            widget.refresh() # Az ütemező táblázat újratöltése a fájlból (a widgetek megmaradnak)
+        elif hasattr(widget, 'controls_widget') and hasattr(widget.controls_widget, 'update_power_buttons'):
+            widget.controls_widget.update_power_buttons()
+
+
+    def _start_frontend(self, frontend, label):
+        """ Elindít egy külső vezérlő felületet (IPC, HTTP) az AsyncHelper hurkán. """
+        # run_coroutine_threadsafe akkor is sorba áll, ha a hurok szála még épp csak indul
+        started = asyncio.run_coroutine_threadsafe(frontend.start(), self.async_helper.loop)
+        started.add_done_callback(
+            lambda f: f.exception() and log_event(f"{label} nem indult el: {f.exception()}"))
+
     def base_cleanup(self):
          """ Alapvető cleanup műveletek kilépéskor. """
          log_event("Base cleanup műveletek indítása (kilépés)...")
+         POWER.remove_listener(self._on_power_mode)
+         if PROFILER.active:
+             # A hurkok még futnak, így minden szál profilja lezárható
+             PROFILER.stop()
+         for frontend, label in ((self.mqtt_bridge, "MQTT híd"), (self.http_api, "HTTP API"),
+                                 (self.ipc_server, "IPC szerver"), (self.metrics_server, "Metrika végpont")):
+             if frontend and self.async_helper.loop.is_running():
+                 try:
+                     asyncio.run_coroutine_threadsafe(frontend.stop(), self.async_helper.loop).result(timeout=1.0)
+                 except Exception as e:
+                     log_event(f"Hiba a(z) {label} leállításakor: {e}")
          # Jelezzük a reconnect loopnak (ha még futna), hogy álljon le
          self._stop_reconnect_event.set()
          # Async hurok leállítását kérjük
          self.async_helper.stop_loop()
+         if config_service.get_setting("metrics_dump_file"):
+             metrics.REGISTRY.dump_json(config_service.get_setting("metrics_dump_file"))
          log_event("Base cleanup (stop kérések) befejezve.")
          # A szálak leállása és a loop bezárása a háttérben történik meg (daemon=True, stop())
@@ -7,7 +7,7 @@ import traceback
 import sys # Hozzáadva sys import
 
 from PySide6.QtWidgets import QApplication, QMessageBox, QSystemTrayIcon, QMenu
-from PySide6.QtCore import Qt, Slot, QTimer, QMetaObject, Q_ARG # QMetaObject és Q_ARG hozzáadva
+from PySide6.QtCore import Qt, Slot, Signal, QTimer, QMetaObject, Q_ARG # QMetaObject és Q_ARG hozzáadva
 from PySide6.QtGui import QIcon, QAction
 
 # Importáljuk az alap ablak osztályt és a GUI managert
@@ -15,18 +15,30 @@ from .main_window_base import LEDApp_BaseWindow, log_event
 from .gui_manager import GuiManager # GuiManager importálása
 # GUI widgetek importálása az isinstance és egyéb hivatkozások miatt
 from .gui1_pyside import GUI1_Widget
-from .gui2_schedule_pyside import GUI2_Widget
 from ..app_utils import load_app_icon # Import the new function
+from ..core.device_registry import get_registry
+from ..services import config_service
+from ..services.control_service import ControlError
+from ..util.power import POWER
+from ..util.profiling import PROFILER
+from ..util import timer_wheel
+
+INITIAL_GUI_RETRY = 1.0 # mp; újrapróbálkozás, amíg az auto-connect fut
 
 class LEDApp_PySide(LEDApp_BaseWindow):
+    show_window_signal = Signal() # Második indítás kérte az ablak megjelenítését
+
     def __init__(self, start_hidden=False, parent=None): # start_hidden paraméter hozzáadva
         super().__init__(parent)
+        self.show_window_signal.connect(self.show_window_from_tray)
         self._force_quit = False
         self._start_hidden = start_hidden # Indítási állapot tárolása
         self._initial_gui_loaded = False # Segédfalg, hogy tudjuk, betöltöttük-e már a GUI-t
 
         # ----- Rendszer Tálca Ikon Létrehozása -----
         self.tray_icon = None
+        self.profile_action = None
+        self.snapshot_action = None
         app_icon = load_app_icon() # Use the utility function
 
         if not app_icon.isNull():
@@ -41,8 +53,19 @@ class LEDApp_PySide(LEDApp_BaseWindow):
             show_action.triggered.connect(self.show_window_from_tray)
             exit_action.triggered.connect(self.quit_application)
 
+            # Profilozás (cProfile + tracemalloc) a futó alkalmazáson, debug build nélkül
+            self.profile_action = QAction("Profilozás (CPU + memória)", self)
+            self.profile_action.setCheckable(True)
+            self.profile_action.toggled.connect(self.toggle_profiling)
+            self.snapshot_action = QAction("Memória pillanatkép", self)
+            self.snapshot_action.setEnabled(False)
+            self.snapshot_action.triggered.connect(self.take_memory_snapshot)
+
             tray_menu.addAction(show_action)
             tray_menu.addSeparator()
+            tray_menu.addAction(self.profile_action)
+            tray_menu.addAction(self.snapshot_action)
+            tray_menu.addSeparator()
             tray_menu.addAction(exit_action)
 
             self.tray_icon.setContextMenu(tray_menu)
@@ -86,8 +109,10 @@ class LEDApp_PySide(LEDApp_BaseWindow):
         # akkor várjunk, és ne töltsük be még a GUI1-et sem, ha rejtve indultunk.
         elif not self._initial_connection_attempted and self._is_auto_starting:
             log_event("Kezdeti GUI betöltése felfüggesztve, amíg az auto-connect befejeződik.")
-            # Időzítő, hogy később újra próbálkozzon, ha valamiért elakadna
-            QTimer.singleShot(1000, self.load_initial_gui)
+            # Később újra próbálkozik, ha valamiért elakadna; a közös időzítő keréken, a hívás a GUI szálon fut
+            timer_wheel.for_loop(self.async_helper.loop).call_later(
+                INITIAL_GUI_RETRY, self.run_in_gui_signal.emit, self.load_initial_gui,
+                tolerance=0.25, name="gui.initial_load_retry")
             return # Ne csináljunk most semmit
         else: # Ha nincs kapcsolat, vagy nincs eszköz, vagy a kezdeti próba sikertelen volt
             log_event("Nincs kapcsolat, vagy nincs eszköz, vagy auto-connect sikertelen. GUI1 betöltése...")
@@ -116,9 +141,34 @@ class LEDApp_PySide(LEDApp_BaseWindow):
         self.activateWindow()
         log_event("Főablak megjelenítve a tálcáról.")
 
+    async def handle_activation(self, show=False, connect=None):
+        """Második indításból átadott argumentumok (az AsyncHelper hurkán fut).
+
+        A ``connect`` cím, eszköznév (hirdetett vagy barátságos) vagy csoport lehet;
+        az eszköznyilvántartás indexeiből oldjuk fel, keresés nélkül.
+        """
+        if show:
+            self.show_window_signal.emit()
+        if connect:
+            record = get_registry().resolve(connect)
+            if record is not None:
+                name, connect = record.as_tuple()
+            else:
+                same_device = config_service.get_setting("last_device_address") == connect
+                name = config_service.get_setting("last_device_name") if same_device else connect
+            self.selected_device = (name or connect, connect)
+            self.connection_status_signal.emit("connecting")
+            try:
+                success = await self.ble.connect(connect)
+            except Exception as e:
+                self.connect_error_signal.emit(f"{type(e).__name__}: {e}")
+                raise ControlError(f"connect failed: {e}") from e
+            self.connect_results_signal.emit(success)
+
     @Slot(QSystemTrayIcon.ActivationReason)
     def handle_tray_activation(self, reason):
         """Kezeli a tálca ikonra kattintást."""
+        POWER.note_activity()
         # Bal klikk (Trigger) vagy dupla klikk (DoubleClick) esetén
         if reason == QSystemTrayIcon.ActivationReason.Trigger or reason == QSystemTrayIcon.ActivationReason.DoubleClick:
              if self.isHidden():
@@ -131,6 +181,42 @@ class LEDApp_PySide(LEDApp_BaseWindow):
         # Jobb klikk (Context) esetén a menü automatikusan megjelenik
 
 
+    def start_profiling(self, cpu=True, mem=True):
+        """Elindítja a profilozást (parancssori kapcsolóból is), és szinkronizálja a menüt."""
+        PROFILER.start(cpu=cpu, mem=mem)
+        self._sync_profiling_actions()
+
+    def _sync_profiling_actions(self):
+        if self.profile_action:
+            self.profile_action.blockSignals(True)
+            self.profile_action.setChecked(PROFILER.active)
+            self.profile_action.blockSignals(False)
+            self.snapshot_action.setEnabled(PROFILER.mem_active)
+
+    @Slot(bool)
+    def toggle_profiling(self, checked):
+        """Tálca menü: profilozás be/ki; leállításkor a dumpok helyét üzenetben jelzi."""
+        if checked:
+            self.start_profiling()
+            log_event("Profilozás elindítva a tálca menüből.")
+        else:
+            paths = PROFILER.stop()
+            self._sync_profiling_actions()
+            log_event(f"Profilozás leállítva, dumpok: {paths}")
+            if self.tray_icon and paths:
+                self.tray_icon.showMessage("LED-Irányító 2000", "Profil mentve:\n" + "\n".join(paths),
+                                           QSystemTrayIcon.MessageIcon.Information, 5000)
+
+    @Slot()
+    def take_memory_snapshot(self):
+        """Tálca menü: tracemalloc pillanatkép + top-N különbség az előzőhöz képest."""
+        path = PROFILER.snapshot_mem()
+        if path:
+            log_event(f"Memória pillanatkép mentve: {path}")
+            if self.tray_icon:
+                self.tray_icon.showMessage("LED-Irányító 2000", f"Memória pillanatkép:\n{path}",
+                                           QSystemTrayIcon.MessageIcon.Information, 5000)
+
     @Slot()
     def quit_application(self):
         """Biztonságosan bezárja az alkalmazást a tálcáról."""
@@ -0,0 +1,279 @@
+"""Model/view schedule editor: a table model over the schedule data.
+
+:class:`ScheduleTableModel` holds one row per schedule entry (a weekday
+today) and edits the day dicts in place. No widget exists per cell: the
+``QTableView`` paints only the visible rows, and the delegates create an
+editor (time / color combo box, offset spin box) only while a cell is
+being edited. The sunrise/sunset switches are plain check state cells.
+
+Validation is incremental. ``setData`` revalidates only the edited cell
+and the cells that depend on it (toggling "sunrise" clears and revalidates
+the on time), keeps the errors in a dict and reports the change with
+``validityChanged``. Saving never has to walk widgets: :meth:`to_schedule`
+returns the data as it is.
+"""
+
+from __future__ import annotations
+
+import copy
+from datetime import time as dt_time
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QBrush, QColor
+from PySide6.QtWidgets import QComboBox, QSpinBox, QStyledItemDelegate
+
+from ..config import COLORS, DAYS
+from ..core import schedule_store
+
+NO_COLOR = "Nincs kiválasztva"
+COLOR_NAMES = [c[0] for c in COLORS]
+TIME_VALUES = [""] + [f"{h:02d}:{m:02d}" for h in range(24) for m in range(0, 60, 5)]
+OFFSET_LIMIT = 720  # minutes; half a day either way
+
+# (key, header); the column order of the editor
+COLUMNS = (
+    ("color", "Szín"),
+    ("on_time", "Fel"),
+    ("off_time", "Le"),
+    ("sunrise", "Napkelte"),
+    ("sunrise_offset", "+/-"),
+    ("sunset", "Napnyugta"),
+    ("sunset_offset", "+/-"),
+)
+KEYS = tuple(key for key, _header in COLUMNS)
+COLUMN = {key: i for i, key in enumerate(KEYS)}
+SWITCHES = {"sunrise": ("on_time", "sunrise_offset"), "sunset": ("off_time", "sunset_offset")}
+SWITCH_OF = {dependent: switch for switch, dependents in SWITCHES.items() for dependent in dependents}
+
+ERROR_BRUSH = QBrush(QColor("#7A2E2E"))
+DISABLED_BRUSH = QBrush(QColor("#888888"))
+
+
+def validate_cell(day: dict, key: str) -> str | None:
+    """Error message for ``day[key]``, None if the value is valid."""
+    value = day.get(key)
+    if key in ("on_time", "off_time"):
+        if day.get(SWITCH_OF[key]) or not value:
+            return None  # the sun time is used, or the edge is not set
+        try:
+            dt_time.fromisoformat(value)
+        except (TypeError, ValueError):
+            return f"Érvénytelen idő: '{value}'. HH:MM formátum szükséges."
+        return None
+    if key.endswith("_offset"):
+        if isinstance(value, bool) or not isinstance(value, int):
+            return f"Érvénytelen eltolás: '{value}'. Egész szám (perc) szükséges."
+        if abs(value) > OFFSET_LIMIT:
+            return f"Az eltolás legfeljebb ±{OFFSET_LIMIT} perc lehet."
+        return None
+    if key == "color":
+        return None if value in COLOR_NAMES or not value else f"Ismeretlen szín: '{value}'."
+    return None
+
+
+class ScheduleTableModel(QAbstractTableModel):
+    """Table model over ``{row key: day dict}``; row keys are the vertical header."""
+
+    validityChanged = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._keys = []
+        self._rows = []
+        self._errors = {}  # (row, key) -> message
+
+    # --- data in / out -------------------------------------------------
+    def load(self, schedule: dict, row_keys=None):
+        """Replaces the data. ``row_keys`` default to the weekdays."""
+        was_valid = not self._errors
+        self.beginResetModel()
+        self._keys = list(row_keys if row_keys is not None else DAYS)
+        self._rows = [dict(schedule_store.default_day(), **copy.deepcopy(schedule.get(key, {}))) for key in self._keys]
+        self._errors = {}
+        for row, day in enumerate(self._rows):
+            for key in KEYS:
+                message = validate_cell(day, key)
+                if message:
+                    self._errors[row, key] = message
+        self.endResetModel()
+        if was_valid != (not self._errors):
+            self.validityChanged.emit(not self._errors)
+
+    def reset_rows(self):
+        """Every row back to the default day (not saved)."""
+        self.load({}, self._keys)
+
+    def to_schedule(self) -> dict:
+        """The edited rows as schedule data; an empty color becomes the first color."""
+        schedule = {}
+        for key, day in zip(self._keys, self._rows):
+            day = dict(day)
+            if not day["color"] and COLOR_NAMES:
+                day["color"] = COLOR_NAMES[0]
+            for edge, switch in (("on_time", "sunrise"), ("off_time", "sunset")):
+                if day[switch]:
+                    day[edge] = ""
+            schedule[key] = day
+        return schedule
+
+    @property
+    def has_errors(self) -> bool:
+        return bool(self._errors)
+
+    def first_error(self) -> tuple[QModelIndex, str] | None:
+        """(index, message) of the first invalid cell in row order."""
+        if not self._errors:
+            return None
+        row, key = min(self._errors, key=lambda cell: (cell[0], COLUMN[cell[1]]))
+        return self.index(row, COLUMN[key]), f"{self._keys[row]}: {self._errors[row, key]}"
+
+    # --- QAbstractTableModel -------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section][1]
+        return self._keys[section]
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        key = KEYS[index.column()]
+        if key in SWITCHES:
+            return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsUserCheckable
+        flags = Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsEditable
+        switch = SWITCH_OF.get(key)
+        if switch is not None and self._rows[index.row()][switch] == key.endswith("_time"):
+            # The time is not used with a sun switch on, the offset only with it on
+            return Qt.ItemFlag.ItemIsSelectable
+        return flags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, key = index.row(), KEYS[index.column()]
+        value = self._rows[row][key]
+        if key in SWITCHES:
+            if role == Qt.ItemDataRole.CheckStateRole:
+                return Qt.CheckState.Checked if value else Qt.CheckState.Unchecked
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            if key == "color":
+                return value or NO_COLOR
+            return str(value)
+        if role == Qt.ItemDataRole.EditRole:
+            return value
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return None if key == "color" else int(Qt.AlignmentFlag.AlignCenter)
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return ERROR_BRUSH if (row, key) in self._errors else None
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return None if self.flags(index) & Qt.ItemFlag.ItemIsEditable else DISABLED_BRUSH
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._errors.get((row, key))
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid():
+            return False
+        row, key = index.row(), KEYS[index.column()]
+        day = self._rows[row]
+        if key in SWITCHES:
+            if role != Qt.ItemDataRole.CheckStateRole:
+                return False
+            value = value in (Qt.CheckState.Checked, Qt.CheckState.Checked.value)
+        elif role != Qt.ItemDataRole.EditRole:
+            return False
+        elif key.endswith("_offset"):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                pass  # kept as typed; validate_cell marks it
+        elif key == "color" and value == NO_COLOR:
+            value = ""
+        elif isinstance(value, str):
+            value = value.strip()
+        if day[key] == value:
+            return True
+        day[key] = value
+        changed = [key]
+        if key in SWITCHES:
+            edge = SWITCHES[key][0]
+            if value:
+                day[edge] = ""  # as before: the sun switch clears the fixed time
+            changed.extend(SWITCHES[key])
+        self._revalidate(row, changed)
+        return True
+
+    def _revalidate(self, row: int, keys: list[str]):
+        was_valid = not self._errors
+        day = self._rows[row]
+        for key in keys:
+            message = validate_cell(day, key)
+            if message:
+                self._errors[row, key] = message
+            else:
+                self._errors.pop((row, key), None)
+        columns = [COLUMN[key] for key in keys]
+        self.dataChanged.emit(self.index(row, min(columns)), self.index(row, max(columns)))
+        if was_valid != (not self._errors):
+            self.validityChanged.emit(not self._errors)
+
+
+class _ComboDelegate(QStyledItemDelegate):
+    """Combo box editor, created only while the cell is edited."""
+
+    items: list[str] = []
+    editable = False
+
+    def createEditor(self, parent, _option, _index):
+        editor = QComboBox(parent)
+        editor.addItems(self.items)
+        editor.setEditable(self.editable)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.ItemDataRole.DisplayRole) or "")
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.ItemDataRole.EditRole)
+
+
+class TimeDelegate(_ComboDelegate):
+    items = TIME_VALUES
+    editable = True  # any HH:MM can be typed, not just the 5 minute steps
+
+
+class ColorDelegate(_ComboDelegate):
+    items = [NO_COLOR] + COLOR_NAMES
+
+
+class OffsetDelegate(QStyledItemDelegate):
+    def createEditor(self, parent, _option, _index):
+        editor = QSpinBox(parent)
+        editor.setRange(-OFFSET_LIMIT, OFFSET_LIMIT)
+        editor.setSuffix(" p")
+        editor.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        return editor
+
+    def setEditorData(self, editor, index):
+        value = index.data(Qt.ItemDataRole.EditRole)
+        editor.setValue(value if isinstance(value, int) else 0)
+
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value(), Qt.ItemDataRole.EditRole)
+
+
+def install_delegates(view):
+    """Sets the per-column editors of a view over :class:`ScheduleTableModel`."""
+    delegates = {"color": ColorDelegate(view), "on_time": TimeDelegate(view), "off_time": TimeDelegate(view),
+                 "sunrise_offset": OffsetDelegate(view), "sunset_offset": OffsetDelegate(view)}
+    for key, delegate in delegates.items():
+        view.setItemDelegateForColumn(COLUMN[key], delegate)
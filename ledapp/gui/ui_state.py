@@ -0,0 +1,99 @@
+"""Coalesced, change-only GUI state updates.
+
+Status changes (connection state, loop health) can come in bursts. During a
+reconnect storm the reconnect loop emits a status on every attempt. Instead
+of restyling widgets on every emit, :class:`UiState` keeps only the latest
+value per key and applies the pending keys once per frame (``FRAME_MS``).
+A value equal to the one already applied does not even start the frame
+timer.
+
+The widget helpers below also compare against what the widget shows
+before touching it. Styles switch through dynamic properties matched by
+the rules of ``style.qss`` (e.g. ``QLabel#statusIndicatorLabel[status="connected"]``),
+which only needs a re-polish, not a ``setStyleSheet`` that parses the
+stylesheet again.
+
+All methods run on the GUI thread. Foreign threads reach it through the
+window's queued signals, as before.
+"""
+
+from __future__ import annotations
+
+from PySide6.QtCore import QObject, QTimer
+
+from ..util import metrics
+
+FRAME_MS = 16
+
+UPDATES = metrics.counter("gui_state_updates_total", "Status updates received by UiState")
+APPLIED = metrics.counter("gui_state_applied_total", "Status keys actually applied to widgets")
+
+
+def set_style_property(widget, name: str, value) -> bool:
+    """Sets a dynamic property used by the stylesheet; re-polishes only on change."""
+    if widget.property(name) == value:
+        return False
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+    return True
+
+
+def set_text(widget, text: str) -> bool:
+    if widget.text() == text:
+        return False
+    widget.setText(text)
+    return True
+
+
+def set_tooltip(widget, text: str) -> bool:
+    if widget.toolTip() == text:
+        return False
+    widget.setToolTip(text)
+    return True
+
+
+class UiState(QObject):
+    """Latest-value-wins state per key, applied in one batch per frame.
+
+    ``apply(changed)`` gets ``{key: value}`` of the keys that changed since
+    the last frame.
+    """
+
+    def __init__(self, apply, frame_ms: int = FRAME_MS, parent=None):
+        super().__init__(parent)
+        self._apply = apply
+        self._applied = {}
+        self._pending = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(frame_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def get(self, key, default=None):
+        """The value shown (applied) for ``key``."""
+        return self._applied.get(key, default)
+
+    def set(self, key, value):
+        UPDATES.inc()
+        if key not in self._pending and self._applied.get(key, self) == value:
+            return  # already shown
+        self._pending[key] = value
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def invalidate(self):
+        """Forgets what was applied, e.g. after a screen switch, so the next ``set`` is applied again."""
+        self._applied.clear()
+
+    def flush(self):
+        """Applies the pending keys now (the frame timer calls it)."""
+        self._timer.stop()
+        pending, self._pending = self._pending, {}
+        changed = {key: value for key, value in pending.items() if self._applied.get(key, self) != value}
+        if not changed:
+            return
+        self._applied.update(changed)
+        APPLIED.inc(len(changed))
+        self._apply(changed)
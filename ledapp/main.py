@@ -1,7 +1,12 @@
 """Entry point for the LED application."""
 
+import argparse
 import logging
-from .app import LEDApplication
+import sys
+import time
+
+# Reference point of the startup timings (ledapp.core.startup)
+LAUNCHED_AT = time.perf_counter()
 
 logging.basicConfig(
     level=logging.INFO,
@@ -10,7 +15,74 @@ logging.basicConfig(
 )
 
 
+def build_arg_parser():
+    """Arguments of the GUI build (kept Qt-free for the instance handoff)."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--tray",
+        action="store_true",
+        help="Start hidden in the system tray.",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run the background daemon without a GUI (see ledapp.daemon).",
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="DEVICE",
+        help="Connect to this device (instead of the last used one): address, "
+        "name, friendly name or group from the device registry.",
+    )
+    parser.add_argument(
+        "--color",
+        help="Set this color once connected (name, #RRGGBB).",
+    )
+    parser.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help="Run under cProfile (GUI and AsyncHelper threads); dumped on exit.",
+    )
+    parser.add_argument(
+        "--profile-mem",
+        action="store_true",
+        help="Trace allocations with tracemalloc; snapshot and top-N diff dumped on exit.",
+    )
+    return parser
+
+
+def _hand_off(args) -> int:
+    """Forwards the arguments to the running primary instance."""
+    from .services.ipc_client import IPCError
+    from .services.instance_guard import forward_to_primary
+
+    params = {"show": not args.tray, "connect": args.connect, "color": args.color}
+    try:
+        forward_to_primary(params)
+    except IPCError as e:
+        logging.error("Another instance is running but did not accept the handoff: %s", e)
+        return 1
+    logging.info("Arguments handed over to the running instance.")
+    return 0
+
+
 def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "ctl":
+        from .ctl import main as ctl_main
+        return ctl_main(argv[1:])
+    if "--headless" in argv:
+        # A daemon never imports PySide6
+        from .daemon import run_headless
+        argv.remove("--headless")
+        return run_headless(argv)
+
+    from .services.instance_guard import claim_primary
+    args = build_arg_parser().parse_args(argv)
+    if not claim_primary():
+        return _hand_off(args)
+
+    from .app import LEDApplication
     app = LEDApplication(argv)
     return app.run()
 
@@ -1,8 +1,20 @@
-from .ble_service import BLEService
-from .config_service import (
-    load_settings,
-    get_setting,
-    set_setting,
-    CURRENT_SETTINGS,
-    DEFAULT_SETTINGS,
-)
+# The service modules are loaded on first attribute access: config_service
+# reads the settings file and ble_service pulls in bleak, which command line
+# clients such as ``ledapp ctl`` never need.
+_EXPORTS = {
+    "BLEService": "ble_service",
+    "ControlService": "control_service",
+    "load_settings": "config_service",
+    "get_setting": "config_service",
+    "set_setting": "config_service",
+    "CURRENT_SETTINGS": "config_service",
+    "DEFAULT_SETTINGS": "config_service",
+}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(f".{module_name}", __name__), name)
@@ -1,39 +1,104 @@
 import asyncio
 import logging
+import time
 from bleak import BleakClient, BleakScanner, BleakError
 
 from ..config import CHARACTERISTIC_UUID
+from ..core.device_registry import get_registry
+from ..util import metrics, rate_limit, tracing
+from ..util.task_manager import PriorityLock
+from . import config_service
+
+SCANS = metrics.histogram("ble_scan_seconds", "BLEService.scan duration")
+CONNECTS = metrics.histogram("ble_connect_seconds", "BLEService.connect duration")
+CONNECT_FAILURES = metrics.counter("ble_connect_failures", "BLEService.connect errors")
+WRITES = metrics.histogram("ble_write_seconds", "GATT write duration")
+WRITE_WAITS = metrics.histogram("ble_write_queue_wait_seconds", "Time spent waiting for the write lock")
+WRITE_FAILURES = metrics.counter("ble_write_failures", "Failed or rejected writes")
+ADAPTER_WAITS = metrics.histogram("ble_adapter_ready_seconds", "Time until the adapter answered a probe")
+
+ADAPTER_PROBE_TIMEOUT = 10.0
+ADAPTER_PROBE_MAX_DELAY = 1.0
 
 
 class BLEService:
-    """Bluetooth Low Energy communication service."""
+    """Bluetooth Low Energy communication service.
+
+    Writes from the GUI, scenes and the control front-ends all pass through
+    :meth:`send_command`, whose lock acts as the per-device write queue. The
+    queue is ordered by the writer's task priority (``util.task_manager``),
+    then FIFO: a user command goes ahead of queued background writes. Each
+    write then takes a token from the device's rate limiter
+    (``util.rate_limit``): a burst waits instead of being dropped by the
+    controller.
+    """
 
     def __init__(self):
         self.client = None
         self._connection_lock = asyncio.Lock()
+        self._write_lock = PriorityLock()
+        rate_limit.configure(config_service.get_setting("ble_write_rate"),
+                             config_service.get_setting("ble_write_burst"))
 
     async def scan(self):
-        """Search for BLE devices."""
+        """Search for BLE devices; the named ones (with RSSI) are recorded in the device registry."""
         logging.info("BLEService: Starting device scan...")
         devices_list = []
+        started = time.perf_counter()
         try:
-            discovered = await BleakScanner.discover(timeout=12.0)
+            with tracing.span("ble.scan", "ble"):
+                discovered = await BleakScanner.discover(timeout=12.0, return_adv=True)
             logging.info(
                 "BLEService: Discover finished. Found %d raw devices.",
                 len(discovered),
             )
-            for d in discovered:
+            observed = []
+            for d, adv in discovered.values():
                 if d.name:
                     devices_list.append((d.name, d.address))
+                    observed.append((d.name, d.address, adv.rssi))
                 else:
                     logging.debug("BLEService: skipping unnamed device %s", d.address)
+            if observed:
+                await asyncio.get_running_loop().run_in_executor(None, get_registry().observe, observed)
         except Exception:
             logging.exception("BLEService: error during scan")
             devices_list = []
+        SCANS.observe(time.perf_counter() - started)
 
         logging.info("BLEService: returning %d named devices", len(devices_list))
         return devices_list
 
+    async def wait_until_ready(self, timeout=ADAPTER_PROBE_TIMEOUT):
+        """Wait until the Bluetooth adapter answers, instead of a fixed delay.
+
+        The probe starts and stops a scanner, which fails while the stack
+        (e.g. WinRT right after logon) is still coming up. It retries with a
+        growing delay. It returns False after ``timeout``, and the caller goes
+        on so that connect reports the real error.
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        delay, attempts = 0.05, 0
+        while True:
+            attempts += 1
+            scanner = BleakScanner()
+            try:
+                with tracing.span("ble.adapter_probe", "ble", attempt=attempts):
+                    await scanner.start()
+                    await scanner.stop()
+                ADAPTER_WAITS.observe(time.perf_counter() - started)
+                logging.info("BLEService: adapter ready after %.2fs (%d probes)",
+                             time.perf_counter() - started, attempts)
+                return True
+            except Exception as e:  # any failure means "not ready yet"
+                if time.monotonic() + delay > deadline:
+                    logging.warning("BLEService: adapter not ready after %.1fs: %s", timeout, e)
+                    return False
+                logging.debug("BLEService: adapter probe %d failed: %s", attempts, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, ADAPTER_PROBE_MAX_DELAY)
+
     async def connect(self, address):
         """Connect to a BLE device by address."""
         async with self._connection_lock:
@@ -45,11 +110,15 @@ class BLEService:
 
             logging.info("BLEService: connecting to %s", address)
             self.client = BleakClient(address)
+            started = time.perf_counter()
             try:
-                await self.client.connect(timeout=15.0)
+                with tracing.span("ble.connect", "ble", address=address):
+                    await self.client.connect(timeout=15.0)
+                CONNECTS.observe(time.perf_counter() - started)
                 logging.info("BLEService: connected to %s", address)
                 return True
             except Exception as e:
+                CONNECT_FAILURES.inc()
                 logging.error("BLEService: connection error: %s", e)
                 self.client = None
                 raise e
@@ -64,7 +133,8 @@ class BLEService:
                     "BLEService: disconnecting from %s", client_to_disconnect.address
                 )
                 try:
-                    await client_to_disconnect.disconnect()
+                    with tracing.span("ble.disconnect", "ble"):
+                        await client_to_disconnect.disconnect()
                     logging.info("BLEService: disconnect successful")
                 except BleakError as e:
                     logging.error(
@@ -73,23 +143,48 @@ class BLEService:
 
     async def send_command(self, hex_command):
         """Send a command to the connected device."""
-        if self.client and self.client.is_connected:
+        queued = time.perf_counter()
+        async with self._write_lock:
+            WRITE_WAITS.observe(time.perf_counter() - queued)
+            await self._write(hex_command)
+
+    async def send_commands(self, hex_commands):
+        """Send several commands back to back without other writes in between."""
+        queued = time.perf_counter()
+        async with self._write_lock:
+            WRITE_WAITS.observe(time.perf_counter() - queued)
+            for hex_command in hex_commands:
+                await self._write(hex_command)
+
+    async def _write(self, hex_command):
+        client = self.client
+        if client and client.is_connected:
+            limiter = rate_limit.for_device(client.address)
+            await limiter.acquire()
+            started = time.perf_counter()
             try:
-                await self.client.write_gatt_char(
-                    CHARACTERISTIC_UUID,
-                    bytes.fromhex(hex_command),
-                    response=False,
-                )
+                with tracing.span("ble.write", "ble", command=hex_command):
+                    await client.write_gatt_char(
+                        CHARACTERISTIC_UUID,
+                        bytes.fromhex(hex_command),
+                        response=False,
+                    )
+                WRITES.observe(time.perf_counter() - started)
+                limiter.record_success()
             except BleakError as e:
+                WRITE_FAILURES.inc()
+                limiter.record_failure(client.is_connected)
                 logging.error(
                     "BLEService: error sending command %s: %s", hex_command, e
                 )
                 raise e
             except Exception:
+                WRITE_FAILURES.inc()
                 logging.exception(
                     "BLEService: unexpected error sending command %s", hex_command
                 )
                 raise
         else:
+            WRITE_FAILURES.inc()
             raise BleakError("Cannot send command: Not connected to device.")
 
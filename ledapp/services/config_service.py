@@ -25,10 +25,28 @@ DEFAULT_SETTINGS = {
     "last_device_address": None,
     "last_device_name": None, # Hozzáadva a név is
     "auto_connect_on_startup": True, # Új beállítás: automatikus csatlakozás induláskor
+    "ipc_enabled": True, # Helyi vezérlő socket (ledapp ctl) a futó példányhoz
+    "http_api_enabled": False, # Opcionális HTTP/WebSocket API (aiohttp kell hozzá)
+    "http_api_host": "127.0.0.1",
+    "http_api_port": 8765,
+    "mqtt_enabled": False, # MQTT híd (állapot retained topicokon, parancsok a .../set topicon)
+    "mqtt_host": "localhost",
+    "mqtt_port": 1883,
+    "mqtt_base_topic": "ledapp",
+    "mqtt_username": None,
+    "mqtt_password": None,
+    "metrics_port": 0, # Prometheus /metrics végpont portja (0 = kikapcsolva)
+    "metrics_dump_file": "led_metrics.json", # Metrikák JSON mentése kilépéskor ("" = nincs mentés)
+    "trace_enabled": False, # Span tracer indítása már induláskor (különben: ledapp ctl trace start)
+    "trace_buffer_size": 20000, # Ennyi legutóbbi trace eseményt tart meg a gyűrűs puffer
+    "ble_write_rate": 0, # BLE írások/mp eszközönként (0 = a hibákból tanult érték, lásd util.rate_limit)
+    "ble_write_burst": 4, # Ennyi írás mehet ki egyszerre várakozás nélkül
+    "last_latitude": 47.4338, # Utolsó ismert hely (induláskor ebből számoljuk a napkeltét, hálózat nélkül)
+    "last_longitude": 19.1931,
 }
 
-def _get_settings_path():
-    """ Visszaadja a beállítások fájl teljes elérési útját. """
+def get_data_path(filename):
+    """ Az alkalmazás mellé mentett adatfájl (beállítások, eszköznyilvántartás) teljes elérési útja. """
     if getattr(sys, 'frozen', False):
         # Ha PyInstallerrel fagyasztva van
         app_path = os.path.dirname(sys.executable)
@@ -36,7 +54,11 @@ def _get_settings_path():
         # Normál futtatás esetén a projekt gyökérkönyvtárát keressük meg
         # Feltételezzük, hogy ez a fájl a 'core' mappában van
         app_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(app_path, SETTINGS_FILE)
+    return os.path.join(app_path, filename)
+
+def _get_settings_path():
+    """ Visszaadja a beállítások fájl teljes elérési útját. """
+    return get_data_path(SETTINGS_FILE)
 
 def load_settings():
     """ Betölti a beállításokat a JSON fájlból. """
@@ -79,13 +101,25 @@ def load_settings():
          log_event(f"Nincs mentett beállítás ({path}), alapértelmezett beállítások használva.")
     return settings
 
-# Betöltjük egyszer indításkor, és ezt használjuk a program futása során
-CURRENT_SETTINGS = load_settings()
+# Az első használatkor töltjük be egyszer (nem importáláskor), és ezt használjuk a program futása során
+_current_settings = None
+
+def _settings():
+    global _current_settings
+    if _current_settings is None:
+        _current_settings = load_settings()
+    return _current_settings
+
+def __getattr__(name):
+    # A régi config_service.CURRENT_SETTINGS hivatkozások is az első eléréskor töltenek be
+    if name == "CURRENT_SETTINGS":
+        return _settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_setting(key):
     """ Visszaad egy beállítási értéket a memóriából. """
-    # Használja a már betöltött CURRENT_SETTINGS-et
-    return CURRENT_SETTINGS.get(key, DEFAULT_SETTINGS.get(key))
+    # Használja a már betöltött beállításokat
+    return _settings().get(key, DEFAULT_SETTINGS.get(key))
 
 def set_setting(key, value):
     """ Beállít egy értéket a memóriában és elmenti a fájlba. """
@@ -107,11 +141,12 @@ def set_setting(key, value):
 
     if type_is_ok:
         # Érték frissítése a memóriában
-        CURRENT_SETTINGS[key] = value
+        current_settings = _settings()
+        current_settings[key] = value
         # Tényleges mentés fájlba
         path = _get_settings_path()
         # Biztosítjuk, hogy csak az ismert kulcsokat mentsük, az aktuális értékekkel
-        settings_to_save = {k: CURRENT_SETTINGS.get(k, DEFAULT_SETTINGS[k]) for k in DEFAULT_SETTINGS}
+        settings_to_save = {k: current_settings.get(k, DEFAULT_SETTINGS[k]) for k in DEFAULT_SETTINGS}
         try:
             with open(path, 'w', encoding='utf-8') as f:
                 json.dump(settings_to_save, f, ensure_ascii=False, indent=4)
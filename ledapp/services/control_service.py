@@ -0,0 +1,331 @@
+"""Qt-free control facade shared by the external front-ends.
+
+:class:`ControlService` is the single place that turns "set colour",
+"power", "scene" and "reload schedule" requests into BLE writes and app
+state changes. It runs on the loop that owns ``app.ble`` (the AsyncHelper
+loop in the GUI, the main loop in the daemon), so every front-end goes
+through the same :class:`BLEService` write queue as the GUI buttons.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import os
+
+from ..config import COLORS, CONFIG_FILE, SCENES_FILE, TRACE_FILE
+from ..core import schedule_store
+from ..core.device_registry import get_registry
+from ..core.local_tz import LOCAL_TZ
+from ..core.reconnect_handler import get_schedule_engine, request_schedule_check
+from ..core.scene_timeline import ScenePlayer, load_scenes
+from ..core.schedule_engine import OFF_COMMAND, ScheduleEngine
+from ..util import timer_wheel, tracing
+from ..util.power import POWER
+from ..util.profiling import PROFILER
+from ..util.clock import get_clock
+
+
+class ControlError(Exception):
+    """A control request that cannot be carried out (bad argument, no device)."""
+
+
+class UnknownMethod(ControlError):
+    """:meth:`ControlService.call` of a method that does not exist."""
+
+
+class InvalidParams(ControlError):
+    """Parameters that do not fit the signature of the called method."""
+
+
+def resolve_color(value) -> str:
+    """Turns a COLORS name, ``#RRGGBB`` or a raw colour frame into a command."""
+    if not isinstance(value, str) or not value:
+        raise ControlError(f"invalid color: {value!r}")
+    for name, _hex_value, command in COLORS:
+        if value == name:
+            return command
+    text = value.lower()
+    if len(text) == 7 and text.startswith("#"):
+        try:
+            int(text[1:], 16)
+        except ValueError:
+            raise ControlError(f"invalid color: {value!r}") from None
+        return f"7e000503{text[1:]}00ef"
+    if len(text) == 18 and text.startswith("7e000503") and text.endswith("ef"):
+        return text
+    raise ControlError(f"invalid color: {value!r}")
+
+
+def describe_command(command: str | None) -> dict | None:
+    """``{"name", "hex", "command"}`` for a colour frame, or None."""
+    if not command or len(command) != 18:
+        return None
+    name = next((c[0] for c in COLORS if c[2] == command), None)
+    return {"name": name, "hex": f"#{command[8:14]}", "command": command}
+
+
+class ControlService:
+    """Applies control requests to ``app`` and tells listeners what changed."""
+
+    def __init__(self, app, scenes_path: str = SCENES_FILE, schedule_path: str = CONFIG_FILE):
+        self.app = app
+        self.scenes_path = scenes_path
+        self.schedule_path = schedule_path
+        self._listeners = []
+        self._scene_task = None
+        self.methods = {
+            "status": self.status,
+            "set_color": self.set_color,
+            "power": self.power,
+            "scene": self.play_scene,
+            "schedule.reload": self.reload_schedule,
+            "schedule.save": self.save_schedule,
+            "instance.activate": self.activate,
+            "trace.start": self.trace_start,
+            "trace.stop": self.trace_stop,
+            "trace.export": self.trace_export,
+            "profile.start": self.profile_start,
+            "profile.stop": self.profile_stop,
+            "profile.snapshot": self.profile_snapshot,
+            "timers": self.timers,
+            "tasks": self.tasks,
+            "devices": self.devices,
+            "devices.update": self.update_device,
+            "devices.remove": self.remove_device,
+        }
+
+    # --- listeners -----------------------------------------------------
+    def add_listener(self, callback):
+        """``callback(topic)`` is called after every change; topic is one of
+        ``"color"``, ``"power"``, ``"scene"`` or ``"schedule"``."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def notify(self, topic: str):
+        for callback in list(self._listeners):
+            try:
+                callback(topic)
+            except Exception:
+                logging.exception("ControlService: listener failed for %s", topic)
+
+    # --- queries -------------------------------------------------------
+    def status(self) -> dict:
+        app = self.app
+        clock = get_clock()
+        device = getattr(app, "selected_device", None)
+        sunrise, sunset = getattr(app, "sunrise", None), getattr(app, "sunset", None)
+        schedule = None
+        if getattr(app, "schedule", None):
+            now = clock.now(LOCAL_TZ)
+            engine = get_schedule_engine(app)
+            decision = engine.evaluate(now, sunrise, sunset)
+            following = engine.next_change(now, sunrise, sunset)
+            schedule = {
+                "should_be_on": decision.should_be_on,
+                "color": decision.color_name,
+                "next_change": following.isoformat() if following else None,
+            }
+        return {
+            "connection": getattr(app, "connection_status", "disconnected"),
+            "device": {"name": device[0], "address": device[1]} if device else None,
+            "power": bool(getattr(app, "is_led_on", False)),
+            "color": describe_command(getattr(app, "last_color_hex", None)),
+            "scene": getattr(app, "active_scene", None),
+            "sunrise": sunrise.isoformat() if sunrise else None,
+            "sunset": sunset.isoformat() if sunset else None,
+            "schedule": schedule,
+        }
+
+    def timers(self) -> dict:
+        """Everything scheduled on this loop's timer wheel (see :mod:`ledapp.util.timer_wheel`)."""
+        wheel = timer_wheel.for_loop()
+        return {"wakeups": wheel.wakeups, "fired": wheel.fired, "timers": wheel.snapshot()}
+
+    def tasks(self) -> dict:
+        """The in-flight table of the AsyncHelper task manager (GUI); empty where there is none."""
+        manager = getattr(getattr(self.app, "async_helper", None), "tasks", None)
+        return {"tasks": manager.snapshot() if manager is not None else []}
+
+    def devices(self, group=None) -> dict:
+        """The device registry (see :mod:`ledapp.core.device_registry`), or one group of it."""
+        registry = get_registry()
+        records = registry.group(group) if group else registry.all()
+        last_used = registry.last_used()
+        return {"last_used": last_used.address if last_used else None, "groups": registry.groups(),
+                "devices": [record.to_dict() for record in records]}
+
+    def update_device(self, address, **changes) -> dict:
+        """Friendly name, groups, model, protocol or settings of a known device."""
+        try:
+            return get_registry().update(address, **changes).to_dict()
+        except KeyError:
+            raise ControlError(f"unknown device: {address}") from None
+        except ValueError as e:
+            raise ControlError(str(e)) from e
+
+    def remove_device(self, address) -> dict:
+        if not get_registry().remove(address):
+            raise ControlError(f"unknown device: {address}")
+        return {"removed": address}
+
+    # --- commands ------------------------------------------------------
+    async def _send(self, command: str):
+        try:
+            await self.app.ble.send_command(command)
+        except Exception as e:
+            raise ControlError(f"send failed: {e}") from e
+        self.app.last_user_input = get_clock().time()
+        POWER.note_activity()  # a remote command is user input: no idle mode for a while
+
+    async def set_color(self, color) -> dict:
+        command = resolve_color(color)
+        await self._send(command)
+        self.app.last_color_hex = command
+        self.app.is_led_on = True
+        self.notify("color")
+        return describe_command(command)
+
+    async def power(self, on) -> dict:
+        if not isinstance(on, bool):
+            raise ControlError("'on' must be true or false")
+        if on:
+            command = self.app.last_color_hex
+            if not command:
+                raise ControlError("no previous color to turn on with")
+        else:
+            command = OFF_COMMAND
+        await self._send(command)
+        self.app.is_led_on = on
+        self.notify("power")
+        return {"power": on}
+
+    async def play_scene(self, name=None, apply_final=False) -> dict:
+        """Starts scene ``name`` in the background; ``None`` stops the current one.
+
+        A scene whose last frame is past only sends its end state with ``apply_final``.
+        """
+        if self._scene_task and not self._scene_task.done():
+            self._scene_task.cancel()
+            try:
+                await self._scene_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._scene_task = None
+        if name is None:
+            self.notify("scene")
+            return {"scene": None}
+
+        scenes = load_scenes(self.scenes_path, getattr(self.app, "schedule", None))
+        scene = scenes.get(name)
+        if scene is None:
+            raise ControlError(f"unknown scene: {name!r}")
+        self._scene_task = asyncio.ensure_future(ScenePlayer(self.app).play(scene, apply_final=bool(apply_final)))
+        self._scene_task.add_done_callback(lambda _task: self.notify("scene"))
+        self.notify("scene")
+        return {"scene": name}
+
+    def reload_schedule(self) -> dict:
+        """Re-reads the schedule file and rebuilds the engine."""
+        reload = getattr(self.app, "reload_schedule", None)
+        if callable(reload):
+            reload()
+        else:
+            self.app.schedule = schedule_store.load_schedule(self.schedule_path)
+            self.app.schedule_engine = ScheduleEngine.from_schedule(self.app.schedule)
+            request_schedule_check(self.app)
+        self.notify("schedule")
+        return {"reloaded": True}
+
+    def save_schedule(self, schedule) -> dict:
+        """Validates ``schedule``, writes it to the schedule file and reloads it; returns the saved schedule."""
+        try:
+            merged = schedule_store.validate_schedule(schedule)
+        except ValueError as e:
+            raise ControlError(f"invalid schedule: {e}") from e
+        try:
+            schedule_store.save_schedule(merged, self.schedule_path)
+        except OSError as e:
+            raise ControlError(f"cannot write the schedule: {e}") from e
+        self.reload_schedule()
+        return merged
+
+    async def activate(self, show=False, connect=None, color=None) -> dict:
+        """Arguments handed over by a second launch (see :mod:`.instance_guard`).
+
+        Showing the window and switching devices are up to the front-end's
+        ``app.handle_activation``; the colour goes through :meth:`set_color`
+        once the device is connected.
+        """
+        hook = getattr(self.app, "handle_activation", None)
+        if hook is not None:
+            await hook(show=bool(show), connect=connect)
+        elif connect:
+            raise ControlError("this instance cannot switch devices")
+        if color is not None:
+            await self.set_color(color)
+        return {"show": bool(show), "connect": connect, "color": color}
+
+    def trace_start(self, capacity=None) -> dict:
+        """Starts recording spans (see :mod:`ledapp.util.tracing`)."""
+        if capacity is not None and (not isinstance(capacity, int) or capacity <= 0):
+            raise ControlError("'capacity' must be a positive integer")
+        tracing.TRACER.start(capacity)
+        return {"tracing": True, "capacity": tracing.TRACER.capacity}
+
+    def trace_stop(self) -> dict:
+        tracing.TRACER.stop()
+        return {"tracing": False}
+
+    def trace_export(self, path=TRACE_FILE) -> dict:
+        """Writes the recorded spans as Chrome trace JSON to ``path``."""
+        try:
+            events = tracing.TRACER.export(path)
+        except OSError as e:
+            raise ControlError(f"cannot write {path}: {e}") from e
+        return {"path": os.path.abspath(path), "events": events}
+
+    def profile_start(self, cpu=True, mem=True) -> dict:
+        """cProfile / tracemalloc around the running instance (see :mod:`ledapp.util.profiling`)."""
+        PROFILER.start(cpu=bool(cpu), mem=bool(mem))
+        self.notify("profile")
+        return {"cpu": PROFILER.cpu_active, "mem": PROFILER.mem_active}
+
+    async def profile_stop(self) -> dict:
+        # Stopping waits for the other threads to disable their profiles
+        paths = await asyncio.get_running_loop().run_in_executor(None, PROFILER.stop)
+        self.notify("profile")
+        return {"files": [os.path.abspath(p) for p in paths]}
+
+    def profile_snapshot(self) -> dict:
+        path = PROFILER.snapshot_mem()
+        if path is None:
+            raise ControlError("memory profiling is not running")
+        return {"file": os.path.abspath(path)}
+
+    async def call(self, method: str, params=None):
+        """Runs one named method with ``params`` (dict or list)."""
+        handler = self.methods.get(method)
+        if handler is None:
+            raise UnknownMethod(f"unknown method: {method}")
+        if params is None:
+            args, kwargs = (), {}
+        elif isinstance(params, dict):
+            args, kwargs = (), params
+        elif isinstance(params, list):
+            args, kwargs = params, {}
+        else:
+            raise InvalidParams("params must be an object or an array")
+        # Checked up front, so a TypeError from inside the handler stays a server error
+        try:
+            inspect.signature(handler).bind(*args, **kwargs)
+        except TypeError as e:
+            raise InvalidParams(f"{method}: {e}") from None
+        result = handler(*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
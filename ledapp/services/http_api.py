@@ -0,0 +1,270 @@
+"""Optional local HTTP / WebSocket API (needs ``aiohttp``).
+
+Runs on the loop that owns ``app.ble`` and drives everything through
+:class:`ControlService`, so integrations share the app's BLE connection.
+
+REST::
+
+    GET  /api/state                  current state (same as ``ledapp ctl status``)
+    POST /api/state                  {"color": "..."} and/or {"power": true|false}
+    GET  /api/scenes                 compiled scenes from led_scenes.json
+    POST /api/scenes/{name}/play     start a scene
+    POST /api/scenes/stop            stop the running scene
+    GET  /api/schedule               the loaded schedule dict
+    PUT  /api/schedule               replace the schedule (validated, saved, reloaded)
+    POST /api/schedule/reload        re-read the schedule file
+    GET  /api/trace                  recorded spans as Chrome trace JSON (util.tracing)
+    GET  /metrics                    Prometheus text format (util.metrics)
+
+WebSocket ``/api/ws``: the server pushes ``{"type": "state", "state": ...}``
+on every change; clients send ``{"type": "color", "color": "#rrggbb"}``
+(at any rate, only the newest pending colour is written),
+``{"type": "power", "on": bool}`` or ``{"type": "get"}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import weakref
+
+try:
+    from aiohttp import WSMsgType, web
+except ImportError:  # optional dependency
+    web = None
+    WSMsgType = None
+
+from ..core.scene_timeline import load_scenes
+from ..util.metrics import REGISTRY
+from ..util.tracing import TRACER
+from .control_service import ControlError, ControlService
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+COALESCE_INTERVAL = 0.05  # at most ~20 colour writes per second from WebSockets
+STATE_POLL_INTERVAL = 1.0  # catches changes made outside ControlService (GUI, schedule)
+
+
+def is_available() -> bool:
+    return web is not None
+
+
+class ColorCoalescer:
+    """Keeps only the newest requested colour and writes it at a bounded rate."""
+
+    def __init__(self, control: ControlService, interval: float = COALESCE_INTERVAL):
+        self.control = control
+        self.interval = interval
+        self.received = 0
+        self.written = 0
+        self._pending = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    @property
+    def dropped(self) -> int:
+        return self.received - self.written - (1 if self._pending is not None else 0)
+
+    def submit(self, color: str):
+        self.received += 1
+        self._pending = color
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while self._pending is not None:
+            color, self._pending = self._pending, None
+            self._wakeup.clear()
+            try:
+                await self.control.set_color(color)
+                self.written += 1
+            except ControlError as e:
+                logging.warning("HTTP API: coalesced color %r failed: %s", color, e)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class HTTPAPI:
+    """aiohttp application serving the REST and WebSocket endpoints."""
+
+    def __init__(self, control: ControlService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        if web is None:
+            raise RuntimeError("the HTTP API needs aiohttp (pip install aiohttp)")
+        self.control = control
+        self.host = host
+        self.port = port
+        self._runner = None
+        self._sockets = weakref.WeakSet()
+        self._coalescer = None
+        self._watcher = None
+        self._last_state = None
+
+    def build_app(self):
+        app = web.Application()
+        app.add_routes([
+            web.get("/api/state", self._get_state),
+            web.post("/api/state", self._post_state),
+            web.get("/api/scenes", self._get_scenes),
+            web.post("/api/scenes/stop", self._stop_scene),
+            web.post("/api/scenes/{name}/play", self._play_scene),
+            web.get("/api/schedule", self._get_schedule),
+            web.put("/api/schedule", self._put_schedule),
+            web.post("/api/schedule/reload", self._reload_schedule),
+            web.get("/api/ws", self._websocket),
+            web.get("/api/trace", self._trace),
+            web.get("/metrics", self._metrics),
+        ])
+        return app
+
+    async def start(self):
+        self._coalescer = ColorCoalescer(self.control)
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.control.add_listener(self._on_change)
+        self._watcher = asyncio.ensure_future(self._watch_state())
+        logging.info("HTTP API: listening on http://%s:%d/api", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self.control.remove_listener(self._on_change)
+        self._watcher.cancel()
+        await asyncio.gather(self._watcher, return_exceptions=True)
+        await self._coalescer.close()
+        for ws in list(self._sockets):
+            await ws.close()
+        await self._runner.cleanup()
+        self._runner = None
+        logging.info("HTTP API: stopped")
+
+    # --- state fan-out -------------------------------------------------
+    def _on_change(self, _topic):
+        self._broadcast_if_changed()
+
+    async def _watch_state(self):
+        while True:
+            await asyncio.sleep(STATE_POLL_INTERVAL)
+            if not self._sockets:
+                continue
+            try:
+                self._broadcast_if_changed()
+            except Exception:
+                logging.exception("HTTP API: state poll failed")
+
+    def _broadcast_if_changed(self):
+        state = self.control.status()
+        if state == self._last_state:
+            return
+        self._last_state = state
+        message = {"type": "state", "state": state}
+        for ws in list(self._sockets):
+            if not ws.closed:
+                asyncio.ensure_future(self._send(ws, message))
+
+    async def _send(self, ws, message):
+        # The socket may close between the check above and the send
+        try:
+            await ws.send_json(message)
+        except (ConnectionError, RuntimeError) as e:
+            logging.debug("HTTP API: dropping WebSocket client: %s", e)
+            self._sockets.discard(ws)
+
+    # --- REST handlers -------------------------------------------------
+    @staticmethod
+    def _error(status, message):
+        return web.json_response({"error": message}, status=status)
+
+    async def _get_state(self, request):
+        return web.json_response(self.control.status())
+
+    async def _post_state(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return self._error(400, "body must be JSON")
+        if not isinstance(body, dict) or not ({"color", "power"} & body.keys()):
+            return self._error(400, "expected 'color' and/or 'power'")
+        try:
+            if "color" in body:
+                await self.control.set_color(body["color"])
+            if "power" in body:
+                await self.control.power(body["power"])
+        except ControlError as e:
+            return self._error(409, str(e))
+        return web.json_response(self.control.status())
+
+    async def _get_scenes(self, request):
+        scenes = load_scenes(self.control.scenes_path)
+        return web.json_response({
+            name: {"days": sorted(scene.days), "frames": len(scene.frames), "start": scene.start, "end": scene.end}
+            for name, scene in scenes.items()
+        })
+
+    async def _play_scene(self, request):
+        try:
+            return web.json_response(await self.control.play_scene(request.match_info["name"]))
+        except ControlError as e:
+            return self._error(404, str(e))
+
+    async def _stop_scene(self, request):
+        return web.json_response(await self.control.play_scene(None))
+
+    async def _get_schedule(self, request):
+        return web.json_response(getattr(self.control.app, "schedule", {}) or {})
+
+    async def _put_schedule(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return self._error(400, "body must be JSON")
+        try:
+            return web.json_response(self.control.save_schedule(body))
+        except ControlError as e:
+            return self._error(400, str(e))
+
+    async def _reload_schedule(self, request):
+        return web.json_response(self.control.reload_schedule())
+
+    async def _trace(self, request):
+        return web.json_response(TRACER.to_chrome(), dumps=lambda obj: json.dumps(obj, default=str))
+
+    async def _metrics(self, request):
+        return web.Response(text=REGISTRY.render_prometheus(), content_type="text/plain")
+
+    # --- WebSocket -----------------------------------------------------
+    async def _websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30.0)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        await ws.send_json({"type": "state", "state": self.control.status()})
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    await self._handle_ws_message(ws, message.json())
+                except (ValueError, AttributeError, KeyError):
+                    await ws.send_json({"type": "error", "error": "invalid message"})
+                except ControlError as e:
+                    await ws.send_json({"type": "error", "error": str(e)})
+        finally:
+            self._sockets.discard(ws)
+        return ws
+
+    async def _handle_ws_message(self, ws, data: dict):
+        kind = data.get("type")
+        if kind == "color":
+            self._coalescer.submit(data["color"])
+        elif kind == "power":
+            await self.control.power(data.get("on"))
+        elif kind == "get":
+            await ws.send_json({"type": "state", "state": self.control.status()})
+        else:
+            await ws.send_json({"type": "error", "error": f"unknown message type: {kind!r}"})
@@ -0,0 +1,105 @@
+"""Single-instance guard with argument handoff.
+
+The first process to take the lock file becomes the primary and serves the
+control socket. A later launch (e.g. a manual start while the autostart
+``--tray`` instance runs) fails to take the lock, forwards its arguments to
+the primary with ``instance.activate`` and exits before importing Qt.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+
+from .ipc_client import IPCClient, IPCError, default_endpoint
+
+HANDOFF_WAIT = 3.0  # the primary may still be bringing up its socket
+HANDOFF_RETRY_INTERVAL = 0.05
+
+
+def default_lock_path() -> str:
+    return default_endpoint() + ".lock"
+
+
+class InstanceLock:
+    """Non-blocking, process-lifetime exclusive lock on a small file."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or default_lock_path()
+        self._fd = None
+
+    def acquire(self) -> bool:
+        """False when another process holds the lock.
+
+        A lock file that cannot be opened at all (owned by another user, read-only
+        directory) says nothing about a running instance: the process then runs
+        unguarded, with a warning, instead of failing to start.
+        """
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logging.warning("Instance lock %s unavailable (%s); running without the single-instance guard",
+                            self.path, e)
+            return True
+        try:
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+def forward_to_primary(params: dict, wait: float = HANDOFF_WAIT):
+    """Sends ``params`` to the running primary; returns its answer.
+
+    Retries for up to ``wait`` seconds while the primary's socket is not up
+    yet. Raises :class:`IPCError` if it never answers.
+    """
+    client = IPCClient(timeout=1.0)
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return client.call("instance.activate", params)
+        except IPCError as e:
+            if e.code is not None or time.monotonic() >= deadline:
+                raise
+        time.sleep(HANDOFF_RETRY_INTERVAL)
+
+
+_held_lock = None
+
+
+def claim_primary(path: str | None = None) -> bool:
+    """Takes the instance lock for the rest of the process lifetime."""
+    global _held_lock
+    if _held_lock is not None:
+        return True
+    lock = InstanceLock(path)
+    if not lock.acquire():
+        return False
+    _held_lock = lock
+    return True
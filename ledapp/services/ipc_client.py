@@ -0,0 +1,110 @@
+"""Blocking client for the local control socket (see :mod:`.ipc_service`).
+
+Kept free of asyncio and the service modules so a second launch or
+``ledapp ctl`` can talk to the running instance within milliseconds.
+"""
+
+from __future__ import annotations
+
+import getpass
+import json
+import os
+import socket
+import sys
+import tempfile
+
+SOCKET_NAME = "ledapp.sock"
+ENDPOINT_FILE = "ledapp_ipc.json"
+
+
+class IPCError(Exception):
+    """Transport or JSON-RPC error reported by :class:`IPCClient`."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def use_unix_socket() -> bool:
+    return hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+
+def default_endpoint() -> str:
+    """Unix socket path, or the endpoint file path on Windows."""
+    if use_unix_socket():
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if runtime_dir and os.path.isdir(runtime_dir):
+            return os.path.join(runtime_dir, SOCKET_NAME)
+        return os.path.join(tempfile.gettempdir(), f"ledapp-{getpass.getuser()}.sock")
+    # Same directory as led_settings.json (see config_service._get_settings_path)
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, ENDPOINT_FILE)
+
+
+class IPCClient:
+    """Small blocking client; used by ``ledapp ctl`` and the instance guard."""
+
+    def __init__(self, endpoint: str | None = None, timeout: float = 3.0):
+        self.endpoint = endpoint or default_endpoint()
+        self.timeout = timeout
+        self._next_id = 1
+
+    def _connect(self):
+        if use_unix_socket():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.endpoint)
+            return sock, sock.makefile("rwb")
+        with open(self.endpoint, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        sock = socket.create_connection(("127.0.0.1", info["port"]), timeout=self.timeout)
+        stream = sock.makefile("rwb")
+        stream.write(json.dumps({"auth": info["token"]}).encode("utf-8") + b"\n")
+        stream.flush()
+        if not json.loads(stream.readline() or b"{}").get("ok"):
+            sock.close()
+            raise IPCError("endpoint rejected the token")
+        return sock, stream
+
+    def _exchange(self, payload):
+        try:
+            sock, stream = self._connect()
+        except (OSError, ValueError, KeyError) as e:
+            raise IPCError(f"no running instance at {self.endpoint}: {e}") from e
+        try:
+            stream.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            stream.flush()
+            line = stream.readline()
+        except OSError as e:
+            raise IPCError(f"IPC failed: {e}") from e
+        finally:
+            sock.close()
+        if not line:
+            raise IPCError("connection closed without an answer")
+        return json.loads(line)
+
+    def _request(self, method, params):
+        request = {"jsonrpc": "2.0", "id": self._next_id, "method": method}
+        self._next_id += 1
+        if params is not None:
+            request["params"] = params
+        return request
+
+    def call(self, method: str, params=None):
+        response = self._exchange(self._request(method, params))
+        if "error" in response:
+            raise IPCError(response["error"]["message"], response["error"].get("code"))
+        return response.get("result")
+
+    def batch(self, calls) -> list:
+        """Sends ``[(method, params), ...]`` in one round trip; returns the
+        raw responses in request order."""
+        requests = [self._request(method, params) for method, params in calls]
+        responses = self._exchange(requests)
+        if isinstance(responses, dict):  # the whole batch was rejected
+            raise IPCError(responses["error"]["message"], responses["error"].get("code"))
+        by_id = {r.get("id"): r for r in responses}
+        return [by_id.get(r["id"]) for r in requests]
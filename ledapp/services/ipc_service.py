@@ -0,0 +1,148 @@
+"""Local JSON-RPC control socket of a running instance.
+
+The server listens on a Unix socket (``$XDG_RUNTIME_DIR/ledapp.sock`` or
+``<tmp>/ledapp-<user>.sock``, mode 0600). Where asyncio has no Unix
+sockets (Windows) it falls back to ``127.0.0.1`` on a random port; the
+port and a per-run token are written to an endpoint file next to the
+settings, and clients must present the token first.
+
+Framing is one JSON-RPC 2.0 request (or batch array) per line, answered
+by one response line. Batches run in order on the app's loop, so the
+writes go through the same BLE write queue as the GUI. The blocking client
+lives in :mod:`.ipc_client` so it can be imported without asyncio.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import socket
+
+from .control_service import ControlError, ControlService, UnknownMethod
+from .ipc_client import IPCClient, IPCError, default_endpoint, use_unix_socket  # noqa: F401 (re-export)
+
+MAX_LINE = 1 << 20
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class InstanceRunningError(RuntimeError):
+    """Another instance is already serving the endpoint."""
+
+
+def _error(request_id, code, message):
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+class IPCServer:
+    """Serves :class:`ControlService` methods over the local endpoint."""
+
+    def __init__(self, control: ControlService, endpoint: str | None = None):
+        self.control = control
+        self.endpoint = endpoint or default_endpoint()
+        self._server = None
+        self._token = None
+
+    async def start(self):
+        if use_unix_socket():
+            self._claim_socket_path()
+            self._server = await asyncio.start_unix_server(self._handle_client, path=self.endpoint, limit=MAX_LINE)
+            os.chmod(self.endpoint, 0o600)
+        else:
+            self._token = secrets.token_hex(16)
+            self._server = await asyncio.start_server(self._handle_client, "127.0.0.1", 0, limit=MAX_LINE)
+            port = self._server.sockets[0].getsockname()[1]
+            with open(self.endpoint, "w", encoding="utf-8") as f:
+                json.dump({"port": port, "token": self._token, "pid": os.getpid()}, f)
+        logging.info("IPC: listening on %s", self.endpoint)
+
+    def _claim_socket_path(self):
+        """Removes a stale socket file; refuses if someone still answers."""
+        if not os.path.exists(self.endpoint):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.endpoint)
+        except OSError:
+            os.unlink(self.endpoint)
+            return
+        finally:
+            probe.close()
+        raise InstanceRunningError(f"another instance is listening on {self.endpoint}")
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        try:
+            os.unlink(self.endpoint)
+        except OSError:
+            pass
+        logging.info("IPC: stopped")
+
+    async def _handle_client(self, reader, writer):
+        try:
+            if self._token is not None:
+                hello = await reader.readline()
+                try:
+                    authorized = json.loads(hello).get("auth") == self._token
+                except (ValueError, AttributeError):
+                    authorized = False
+                if not authorized:
+                    writer.write(b'{"error": "unauthorized"}\n')
+                    await writer.drain()
+                    return
+                writer.write(b'{"ok": true}\n')
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_line(line)
+                if response is not None:
+                    writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.debug("IPC: client dropped: %s", e)
+        finally:
+            writer.close()
+
+    async def handle_line(self, line: bytes):
+        """Answers one request line; returns the response object (or None)."""
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            return _error(None, PARSE_ERROR, "parse error")
+        if isinstance(payload, list):
+            if not payload:
+                return _error(None, INVALID_REQUEST, "empty batch")
+            responses = [await self._dispatch(request) for request in payload]
+            return [r for r in responses if r is not None] or None
+        return await self._dispatch(payload)
+
+    async def _dispatch(self, request):
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "invalid request")
+        request_id = request.get("id")
+        method = request["method"]
+        try:
+            result = await self.control.call(method, request.get("params"))
+        except UnknownMethod as e:
+            response = _error(request_id, METHOD_NOT_FOUND, str(e))
+        except ControlError as e:
+            response = _error(request_id, INVALID_PARAMS, str(e))
+        except Exception as e:
+            logging.exception("IPC: %s failed", method)
+            response = _error(request_id, SERVER_ERROR, str(e))
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        # Notifications (no id) get no answer
+        return response if "id" in request else None
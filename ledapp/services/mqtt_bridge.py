@@ -0,0 +1,243 @@
+"""MQTT bridge: retained device state topics and command topics.
+
+Topics (``<base>`` defaults to ``ledapp``, ``<device>`` is the device
+address without separators, e.g. ``aabbccddeeff``)::
+
+    <base>/status                 "online" / "offline" (retained, last will)
+    <base>/<device>/state         JSON shadow, same shape as ``ledapp ctl status`` (retained)
+    <base>/<device>/set           JSON {"color": ..., "power": bool, "scene": name|null}
+                                  or plain text: ON, OFF or a colour
+    <base>/<device>/scene/set     scene name, empty payload stops the scene
+
+State changes are collected and published once per tick; a shadow is only
+re-published when it differs from the last one sent to the broker, so
+subscribers see one retained message per change instead of polling.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import re
+
+from .control_service import ControlError, ControlService
+from .mqtt_client import LocalBroker, MQTTClient, MQTTError
+
+DEFAULT_PORT = 1883
+DEFAULT_BASE_TOPIC = "ledapp"
+PUBLISH_TICK = 0.1
+STATE_POLL_INTERVAL = 1.0  # catches changes made outside ControlService (GUI, schedule)
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+STABLE_CONNECTION = 30.0  # seconds up before the reconnect backoff starts over
+
+
+def device_id(address: str) -> str:
+    """Topic-safe id of a device address."""
+    return re.sub(r"[^0-9A-Za-z_-]", "", address).lower() or "device"
+
+
+class MQTTBridge:
+    """Mirrors :class:`ControlService` state to MQTT and applies commands."""
+
+    def __init__(self, control: ControlService, host: str, port: int = DEFAULT_PORT,
+                 base_topic: str = DEFAULT_BASE_TOPIC, username: str | None = None,
+                 password: str | None = None, tick: float = PUBLISH_TICK, client_factory=MQTTClient):
+        self.control = control
+        self.host = host
+        self.port = port
+        self.base_topic = base_topic.rstrip("/")
+        self.username = username
+        self.password = password
+        self.tick = tick
+        self.client_factory = client_factory
+        self.published = 0
+        self._client = None
+        self._task = None
+        self._dirty = True
+        self._sent = {}  # topic -> last payload sent on this connection
+
+    @property
+    def status_topic(self) -> str:
+        return f"{self.base_topic}/status"
+
+    async def start(self):
+        self.control.add_listener(self._on_change)
+        self._task = asyncio.ensure_future(self._run())
+        logging.info("MQTT: bridging to %s:%d as %s/#", self.host, self.port, self.base_topic)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self.control.remove_listener(self._on_change)
+        client = self._client
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if client is not None and client.is_connected:
+            client.publish(self.status_topic, "offline", retain=True)
+            await client.disconnect()
+        logging.info("MQTT: stopped")
+
+    def _on_change(self, _topic):
+        self._dirty = True
+
+    # --- connection ----------------------------------------------------
+    async def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            client = self.client_factory(
+                self.host, self.port, client_id=f"ledapp-{random.getrandbits(32):08x}",
+                username=self.username, password=self.password,
+                will=(self.status_topic, b"offline", True), on_message=self._on_message)
+            try:
+                await client.connect()
+            except (OSError, asyncio.TimeoutError, MQTTError) as e:
+                logging.warning("MQTT: connect to %s:%d failed (%s)", self.host, self.port, e)
+                delay = await self._backoff(delay)
+                continue
+
+            connected_at = asyncio.get_running_loop().time()
+            self._client, self._sent, self._dirty = client, {}, True
+            logging.info("MQTT: connected to %s:%d", self.host, self.port)
+            try:
+                client.publish(self.status_topic, "online", retain=True)
+                await client.subscribe([f"{self.base_topic}/+/set", f"{self.base_topic}/+/scene/set"])
+                await self._publish_loop(client)
+            except ConnectionError as e:
+                logging.warning("MQTT: connection lost: %s", e)
+            except Exception:
+                # Anything else (OSError from drain, MQTTError, a failing status()) must not end the bridge
+                logging.exception("MQTT: error on the connection to %s:%d", self.host, self.port)
+                with contextlib.suppress(Exception):
+                    await client.disconnect()
+            finally:
+                self._client = None
+            logging.warning("MQTT: disconnected from %s:%d", self.host, self.port)
+            # A broker that accepts and then drops us (ACL kick, restart loop) backs off as well
+            if asyncio.get_running_loop().time() - connected_at >= STABLE_CONNECTION:
+                delay = RECONNECT_MIN_DELAY
+            delay = await self._backoff(delay)
+
+    async def _backoff(self, delay: float) -> float:
+        """Sleeps ``delay`` with jitter; returns the next, doubled delay."""
+        # Jitter keeps several bridges from reconnecting in lockstep
+        wait = delay * random.uniform(0.8, 1.2)
+        logging.info("MQTT: reconnecting in %.1fs", wait)
+        await asyncio.sleep(wait)
+        return min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _publish_loop(self, client):
+        ticks_per_poll = max(1, round(STATE_POLL_INTERVAL / self.tick))
+        tick = 0
+        closed = asyncio.ensure_future(client.wait_closed())
+        try:
+            while not closed.done():
+                tick += 1
+                if self._dirty or tick % ticks_per_poll == 0:
+                    self._dirty = False
+                    await self.flush(client)
+                await asyncio.wait([closed], timeout=self.tick)
+        finally:
+            closed.cancel()
+
+    # --- state ---------------------------------------------------------
+    def shadows(self) -> dict:
+        """``{device id: state}`` of every device this app controls."""
+        state = self.control.status()
+        device = state.get("device")
+        return {device_id(device["address"]): state} if device else {}
+
+    async def flush(self, client):
+        """Publishes every shadow that changed since the last tick, then drains once."""
+        batch = 0
+        for dev, state in self.shadows().items():
+            topic = f"{self.base_topic}/{dev}/state"
+            payload = json.dumps(state, ensure_ascii=False, sort_keys=True)
+            if self._sent.get(topic) != payload:
+                client.publish(topic, payload, retain=True)
+                self._sent[topic] = payload
+                batch += 1
+        if batch:
+            self.published += batch
+            await client.drain()
+
+    # --- commands ------------------------------------------------------
+    def _on_message(self, topic: str, payload: bytes, _retain: bool):
+        parts = topic[len(self.base_topic) + 1:].split("/")
+        if not topic.startswith(self.base_topic + "/") or len(parts) < 2:
+            return
+        target = parts[0]
+        if target not in self.shadows():
+            logging.warning("MQTT: command for unknown device %s ignored", target)
+            return
+        asyncio.ensure_future(self._apply(parts[1:], payload.decode("utf-8", "replace").strip()))
+
+    async def _apply(self, path: list[str], text: str):
+        try:
+            if path == ["scene", "set"]:
+                await self.control.play_scene(text or None)
+                return
+            try:
+                command = json.loads(text)
+            except ValueError:
+                command = text
+            if isinstance(command, str):
+                upper = command.upper()
+                command = {"power": upper == "ON"} if upper in ("ON", "OFF") else {"color": command}
+            if not isinstance(command, dict):
+                raise ControlError("expected a JSON object, ON, OFF or a colour")
+            if "color" in command:
+                await self.control.set_color(command["color"])
+            if "power" in command:
+                await self.control.power(command["power"])
+            if "scene" in command:
+                await self.control.play_scene(command["scene"])
+        except ControlError as e:
+            logging.warning("MQTT: command %r failed: %s", text, e)
+        except Exception:
+            logging.exception("MQTT: command %r failed", text)
+
+
+async def _run_local(port: int, seconds: float):
+    """Development aid: the bridge against an in-process broker and a fake device."""
+
+    class _FakeBLE:
+        client = True
+
+        async def send_command(self, command):
+            logging.info("fake device <- %s", command)
+
+    class _FakeApp:
+        selected_device = ("LED", "AA:BB:CC:DD:EE:FF")
+        connection_status = "connected"
+        is_led_on = False
+        last_color_hex = None
+        schedule = {}
+        sunrise = sunset = None
+        ble = _FakeBLE()
+
+    broker = LocalBroker()
+    port = await broker.start(port=port)
+    bridge = MQTTBridge(ControlService(_FakeApp()), "127.0.0.1", port)
+    await bridge.start()
+    logging.info("local broker on 127.0.0.1:%d, running for %.0fs", port, seconds)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await bridge.stop()
+        await broker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the MQTT bridge against an in-process broker.")
+    parser.add_argument("--local-broker", action="store_true", required=True)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    cli_args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(_run_local(cli_args.port, cli_args.seconds))
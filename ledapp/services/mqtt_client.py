@@ -0,0 +1,301 @@
+"""Minimal MQTT 3.1.1 client and in-process broker on asyncio streams.
+
+Only what the bridge needs: QoS 0 publish / subscribe, retained messages,
+a last will and keep-alive pings. Keeping it dependency-free lets the
+headless build bridge to MQTT without paho, and :class:`LocalBroker`
+makes the bridge runnable against a broker in the same process (e.g.
+``python -m ledapp.services.mqtt_bridge --local-broker``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+
+CONNECT, CONNACK, PUBLISH, SUBSCRIBE, SUBACK = 1, 2, 3, 8, 9
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+CONNACK_ERRORS = {
+    1: "unacceptable protocol version",
+    2: "identifier rejected",
+    3: "server unavailable",
+    4: "bad user name or password",
+    5: "not authorized",
+}
+
+
+class MQTTError(Exception):
+    """Protocol error or refused connection."""
+
+
+def _encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(out)
+
+
+def _string(value) -> bytes:
+    data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+    return struct.pack("!H", len(data)) + data
+
+
+def _packet(kind: int, flags: int, body: bytes) -> bytes:
+    return bytes([kind << 4 | flags]) + _encode_length(len(body)) + body
+
+
+def publish_packet(topic: str, payload: bytes, retain: bool = False) -> bytes:
+    return _packet(PUBLISH, 1 if retain else 0, _string(topic) + payload)
+
+
+async def read_packet(reader: asyncio.StreamReader):
+    """Returns ``(kind, flags, body)``; raises IncompleteReadError on EOF."""
+    header = (await reader.readexactly(1))[0]
+    length, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 21:
+            raise MQTTError("malformed remaining length")
+    return header >> 4, header & 0x0F, await reader.readexactly(length)
+
+
+def parse_publish(flags: int, body: bytes):
+    """``(topic, payload, retain)`` of a PUBLISH body (QoS > 0 ids skipped)."""
+    (topic_length,) = struct.unpack_from("!H", body)
+    topic = body[2:2 + topic_length].decode("utf-8")
+    offset = 2 + topic_length + (2 if flags & 0x06 else 0)
+    return topic, body[offset:], bool(flags & 0x01)
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """MQTT filter matching with ``+`` and ``#`` wildcards."""
+    pattern_parts, topic_parts = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class MQTTClient:
+    """One broker connection; create a new instance to reconnect."""
+
+    def __init__(self, host: str, port: int = 1883, client_id: str = "ledapp", keepalive: int = 60,
+                 username: str | None = None, password: str | None = None,
+                 will: tuple[str, bytes, bool] | None = None, on_message=None):
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.username = username
+        self.password = password
+        self.will = will
+        self.on_message = on_message  # on_message(topic, payload, retain)
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pinger = None
+        self._packet_id = 0
+        self._closed = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._closed is not None and not self._closed.done()
+
+    async def connect(self, timeout: float = 10.0):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout)
+        flags = 0x02  # clean session
+        payload = _string(self.client_id)
+        if self.will:
+            topic, message, retain = self.will
+            flags |= 0x04 | (0x20 if retain else 0)
+            payload += _string(topic) + _string(message)
+        if self.username is not None:
+            flags |= 0x80
+            payload += _string(self.username)
+            if self.password is not None:
+                flags |= 0x40
+                payload += _string(self.password)
+        body = _string("MQTT") + bytes([4, flags]) + struct.pack("!H", self.keepalive) + payload
+        self._writer.write(_packet(CONNECT, 0, body))
+        try:
+            kind, _flags, ack = await asyncio.wait_for(read_packet(self._reader), timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            self._writer.close()
+            raise MQTTError(f"no CONNACK from {self.host}:{self.port}") from e
+        if kind != CONNACK or len(ack) != 2 or ack[1] != 0:
+            self._writer.close()
+            code = ack[1] if kind == CONNACK and len(ack) == 2 else None
+            raise MQTTError(f"connection refused: {CONNACK_ERRORS.get(code, code)}")
+        self._closed = asyncio.get_running_loop().create_future()
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        if self.keepalive:
+            self._pinger = asyncio.ensure_future(self._ping_loop())
+
+    async def wait_closed(self):
+        await asyncio.shield(self._closed)
+
+    def publish(self, topic: str, payload, retain: bool = False):
+        """Queues one QoS 0 publish; call :meth:`drain` after a batch."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self._writer.write(publish_packet(topic, payload, retain))
+
+    async def drain(self):
+        await self._writer.drain()
+
+    async def subscribe(self, filters: list[str]):
+        self._packet_id = self._packet_id % 0xFFFF + 1
+        body = struct.pack("!H", self._packet_id) + b"".join(_string(f) + b"\x00" for f in filters)
+        self._writer.write(_packet(SUBSCRIBE, 0x02, body))
+        await self._writer.drain()
+
+    async def disconnect(self):
+        if not self.is_connected:
+            return
+        try:
+            self._writer.write(_packet(DISCONNECT, 0, b""))
+            await self._writer.drain()
+        except ConnectionError:
+            pass
+        self._close()
+        await asyncio.gather(self._reader_task, return_exceptions=True)
+
+    def _close(self, error=None):
+        if self._pinger:
+            self._pinger.cancel()
+        if self._writer:
+            self._writer.close()
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(error)
+
+    async def _read_loop(self):
+        error = None
+        try:
+            while True:
+                kind, flags, body = await read_packet(self._reader)
+                if kind == PUBLISH and self.on_message is not None:
+                    try:
+                        self.on_message(*parse_publish(flags, body))
+                    except Exception:
+                        logging.exception("MQTT: message handler failed")
+        except (asyncio.IncompleteReadError, ConnectionError, MQTTError) as e:
+            error = e
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._close(error)
+
+    async def _ping_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive / 2)
+            try:
+                self._writer.write(_packet(PINGREQ, 0, b""))
+                await self._writer.drain()
+            except ConnectionError as e:
+                self._close(e)
+                return
+
+
+class LocalBroker:
+    """Tiny QoS 0 broker for running the bridge without external services."""
+
+    def __init__(self):
+        self.retained = {}
+        self._sessions = {}  # writer -> list of filters
+        self._handlers = set()
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for task in list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    def route(self, topic: str, payload: bytes, retain: bool = False):
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        packet = publish_packet(topic, payload)
+        for writer, filters in self._sessions.items():
+            if any(topic_matches(f, topic) for f in filters):
+                writer.write(packet)
+
+    async def _handle(self, reader, writer):
+        will = None
+        self._handlers.add(asyncio.current_task())
+        try:
+            kind, _flags, body = await read_packet(reader)
+            if kind != CONNECT:
+                return
+            will = self._parse_will(body)
+            writer.write(_packet(CONNACK, 0, b"\x00\x00"))
+            self._sessions[writer] = []
+            while True:
+                kind, flags, body = await read_packet(reader)
+                if kind == PUBLISH:
+                    self.route(*parse_publish(flags, body))
+                elif kind == SUBSCRIBE:
+                    self._subscribe(writer, body)
+                elif kind == PINGREQ:
+                    writer.write(_packet(PINGRESP, 0, b""))
+                elif kind == DISCONNECT:
+                    will = None
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, MQTTError, struct.error):
+            pass
+        except asyncio.CancelledError:
+            will = None  # broker shutdown, not a client failure
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self._sessions.pop(writer, None)
+            writer.close()
+            if will:
+                self.route(*will)
+
+    def _subscribe(self, writer, body: bytes):
+        packet_id, offset, added = body[:2], 2, []
+        while offset < len(body):
+            (length,) = struct.unpack_from("!H", body, offset)
+            added.append(body[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 3 + length
+        self._sessions[writer].extend(added)
+        writer.write(_packet(SUBACK, 0, packet_id + b"\x00" * len(added)))
+        for topic, payload in self.retained.items():
+            if any(topic_matches(f, topic) for f in added):
+                writer.write(_packet(PUBLISH, 1, _string(topic) + payload))
+
+    @staticmethod
+    def _parse_will(body: bytes):
+        (name_length,) = struct.unpack_from("!H", body)
+        offset = 2 + name_length + 1
+        flags = body[offset]
+        if not flags & 0x04:
+            return None
+        offset += 3  # flags + keep-alive
+        (length,) = struct.unpack_from("!H", body, offset)
+        offset += 2 + length  # client id
+        (length,) = struct.unpack_from("!H", body, offset)
+        topic = body[offset + 2:offset + 2 + length].decode("utf-8")
+        offset += 2 + length
+        (length,) = struct.unpack_from("!H", body, offset)
+        return topic, body[offset + 2:offset + 2 + length], bool(flags & 0x20)
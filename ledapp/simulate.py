@@ -0,0 +1,188 @@
+"""Replays the schedule against a virtual clock and a stand-in device.
+
+Usage::
+
+    python -m ledapp.simulate --from 2026-01-01 --to 2026-12-31
+
+The real :func:`check_and_apply_schedule` runs at every moment the schedule
+engine reports a change (and at every midnight, when sun times move), so a
+year takes a few thousand evaluations instead of real time. The output is
+the exact command trace the device would have received and the LED on-time
+per calendar day.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+
+from .config import COLORS, CONFIG_FILE, DAYS
+from .core import schedule_store
+from .core.local_tz import LOCAL_TZ
+from .core.location_utils import BUDAPEST_COORDS, get_sun_times
+from .core.reconnect_handler import check_and_apply_schedule
+from .core.schedule_engine import OFF_COMMAND, ScheduleEngine
+from .core.schedule_rules import localize
+from .util.clock import VirtualClock
+
+
+class RecordingClient:
+    """Stand-in for a connected BleakClient that records every write."""
+
+    is_connected = True
+    address = "SIMULATED"
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.writes: list[tuple[datetime, str]] = []
+
+    async def write_gatt_char(self, uuid, data, response=False):
+        self.writes.append((self.clock.now(LOCAL_TZ), data.hex()))
+
+
+class SimulatedApp:
+    """The subset of the application state the schedule check touches."""
+
+    def __init__(self, schedule: dict):
+        self.schedule = schedule
+        self.schedule_engine = ScheduleEngine.from_schedule(schedule)
+        self.sunrise = None
+        self.sunset = None
+        self.is_led_on = False
+        self.last_color_hex = None
+        self.last_user_input = 0.0
+        self.active_scene = None
+
+
+@dataclass
+class SimulationResult:
+    commands: list[tuple[datetime, str]]
+    on_minutes: dict[date, float] = field(default_factory=dict)
+    checks: int = 0
+    elapsed: float = 0.0
+
+
+def _midnight(day: date) -> datetime:
+    return localize(LOCAL_TZ, datetime.combine(day, dt_time()))
+
+
+async def _replay(app, client, clock, start: date, end: date, coords, use_sun: bool) -> int:
+    checks = 0
+    day = start
+    while day <= end:
+        day_start, day_end = _midnight(day), _midnight(day + timedelta(days=1))
+        if use_sun:
+            app.sunrise, app.sunset = get_sun_times(coords[0], coords[1], now=day_start)
+        moment = day_start
+        while moment < day_end:
+            clock.set(moment)
+            await check_and_apply_schedule(app, client, clock)
+            checks += 1
+            following = app.schedule_engine.next_change(moment, app.sunrise, app.sunset)
+            moment = min(following, day_end) if following else day_end
+        day += timedelta(days=1)
+    return checks
+
+
+def _on_minutes_per_day(commands, start: date, end: date) -> dict[date, float]:
+    """Splits the on-periods of the command trace at every local midnight."""
+    totals = {}
+    events = iter(commands)
+    pending = next(events, None)
+    is_on = False
+    day = start
+    while day <= end:
+        moment, day_end = _midnight(day), _midnight(day + timedelta(days=1))
+        total = 0.0
+        while pending and pending[0] < day_end:
+            if is_on:
+                total += (pending[0] - moment).total_seconds()
+            moment = pending[0]
+            is_on = pending[1] != OFF_COMMAND
+            pending = next(events, None)
+        if is_on:
+            total += (day_end - moment).total_seconds()
+        totals[day] = total / 60
+        day += timedelta(days=1)
+    return totals
+
+
+def simulate(schedule: dict, start: date, end: date, coords=BUDAPEST_COORDS,
+             use_sun: bool = True, verbose: bool = False) -> SimulationResult:
+    """Runs the schedule from ``start`` to ``end`` (inclusive)."""
+    clock = VirtualClock(_midnight(start))
+    app = SimulatedApp(schedule)
+    client = RecordingClient(clock)
+
+    began = time.perf_counter()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        checks = asyncio.run(_replay(app, client, clock, start, end, coords, use_sun))
+    result = SimulationResult(client.writes, checks=checks)
+    result.on_minutes = _on_minutes_per_day(client.writes, start, end)
+    result.elapsed = time.perf_counter() - began
+    return result
+
+
+def _describe(command: str) -> str:
+    if command == OFF_COMMAND:
+        return "KI"
+    name = next((c[0] for c in COLORS if c[2] == command), command)
+    return f"BE  {name}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ledapp.simulate", description=__doc__.split("\n")[0])
+    today = date.today()
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=today, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="last day, inclusive (default: +365 days)")
+    parser.add_argument("--schedule", default=CONFIG_FILE, help="schedule file to replay")
+    parser.add_argument("--lat", type=float, default=BUDAPEST_COORDS[0])
+    parser.add_argument("--lon", type=float, default=BUDAPEST_COORDS[1])
+    parser.add_argument("--no-sun", action="store_true", help="ignore sunrise/sunset based entries")
+    parser.add_argument("--summary", action="store_true", help="only print the per-day totals")
+    parser.add_argument("--json", action="store_true", help="machine readable output")
+    parser.add_argument("--verbose", action="store_true", help="show the schedule check log")
+    args = parser.parse_args(argv)
+
+    end = args.end or args.start + timedelta(days=365)
+    if end < args.start:
+        parser.error("--to must not be before --from")
+
+    result = simulate(
+        schedule_store.load_schedule(args.schedule), args.start, end,
+        coords=(args.lat, args.lon), use_sun=not args.no_sun, verbose=args.verbose,
+    )
+
+    if args.json:
+        json.dump({
+            "commands": [{"time": t.isoformat(), "command": c} for t, c in result.commands],
+            "on_minutes": {d.isoformat(): round(m, 2) for d, m in result.on_minutes.items()},
+            "checks": result.checks,
+            "elapsed_ms": round(result.elapsed * 1000, 2),
+        }, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+
+    if not args.summary:
+        for moment, command in result.commands:
+            print(f"{moment.strftime('%Y-%m-%d %H:%M %Z')}  {_describe(command):<16} {command}")
+        print()
+    for day, minutes in result.on_minutes.items():
+        print(f"{day.isoformat()} {DAYS[day.weekday()]:<10} {int(minutes) // 60:02d}:{int(minutes) % 60:02d}")
+    print(
+        f"\n{(end - args.start).days + 1} nap, {len(result.commands)} parancs, "
+        f"{result.checks} ellenőrzés, {result.elapsed * 1000:.1f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
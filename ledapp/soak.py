@@ -0,0 +1,360 @@
+"""Reconnect soak test with leak detection.
+
+Usage::
+
+    python -m ledapp.soak --cycles 5000
+
+The real :func:`start_ble_connection_loop` runs on a :class:`VirtualClock`
+against a stand-in transport: every client it creates connects (or fails
+to, now and then), serves a few keep-alive pings and schedule corrections,
+then drops the link, either silently or with a failing write. Thousands of
+disconnect/reconnect cycles take seconds instead of weeks.
+
+After a warm-up the harness samples the process every ``--sample-every``
+cycles: RSS, tracemalloc traced memory, thread and asyncio task counts,
+open file descriptors and the number of stand-in clients still alive
+(a dropped ``BleakClient`` that something still references is the leak this
+looks for). The run fails (exit code 1) when any of them grew beyond its
+budget between the baseline and the last sample; the top tracemalloc
+growth sites are printed to show where.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from bleak import BleakError
+
+from .config import COLORS, DAYS
+from .core import reconnect_handler
+from .core.local_tz import LOCAL_TZ
+from .core.schedule_engine import ScheduleEngine
+from .core.schedule_store import default_day
+from .util.clock import VirtualClock
+from .util.profiling import diff_snapshots
+
+DEFAULT_CYCLES = 5000
+WARMUP_CYCLES = 200
+SAMPLE_EVERY = 500
+
+# Growth allowed between the baseline and the last sample
+BUDGETS = {
+    "rss": 8 * 1024 * 1024,
+    "traced": 512 * 1024,
+    "threads": 0,
+    "tasks": 0,
+    "fds": 0,
+    "clients": 0,
+}
+
+CONNECT_LATENCY = 0.8  # virtual seconds
+CLIENT_PAYLOAD = 4096  # bytes each stand-in holds, so a leaked client shows up in memory too
+TRACE_FRAMES = 1  # every extra frame makes the run several times slower
+
+
+def _rss_bytes() -> int | None:
+    """Resident set size; psutil if installed, else /proc (Linux), else unknown."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _open_fds() -> int | None:
+    """Open file descriptors (handles on Windows with psutil), or unknown."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        process = psutil.Process()
+        return process.num_handles() if sys.platform == "win32" else process.num_fds()
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+class StandInClient:
+    """Replaces ``BleakClient`` in the reconnect loop (same calls, no radio)."""
+
+    def __init__(self, transport: "StandInTransport", address: str):
+        self.transport = transport
+        self.address = address
+        self.is_connected = False
+        self._writes_left = 0
+        self._services = bytearray(CLIENT_PAYLOAD)
+
+    async def connect(self, timeout: float = 15.0):
+        transport = self.transport
+        await transport.clock.sleep(CONNECT_LATENCY)
+        failure = transport.next_connect_failure()
+        if failure is not None:
+            raise failure
+        self.is_connected = True
+        self._writes_left = transport.rng.randint(1, 4)
+        transport.connected(self)
+
+    async def write_gatt_char(self, uuid, data, response=False):
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        self.transport.writes += 1
+        self._writes_left -= 1
+        if self._writes_left <= 0:
+            # Half of the links die quietly (is_connected turns False),
+            # the other half fail the write in progress.
+            self.is_connected = False
+            if self.transport.rng.random() < 0.5:
+                raise BleakError("link lost during write")
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+class StandInTransport:
+    """Creates :class:`StandInClient` objects and counts the cycles."""
+
+    def __init__(self, clock: VirtualClock, cycles: int, stop_event: threading.Event,
+                 on_cycle=None, seed: int = 2000, connect_failure_rate: float = 0.1, keep_clients: bool = False):
+        self.clock = clock
+        self.cycles = cycles
+        self.stop_event = stop_event
+        self.on_cycle = on_cycle
+        self.rng = random.Random(seed)
+        self.connect_failure_rate = connect_failure_rate
+        self.completed = 0
+        self.created = 0
+        self.failures = 0
+        self.writes = 0
+        self.alive = weakref.WeakSet()
+        self._failure_streak = 0
+        self._kept = [] if keep_clients else None
+
+    def factory(self, address: str) -> StandInClient:
+        client = StandInClient(self, address)
+        self.created += 1
+        self.alive.add(client)
+        if self._kept is not None:
+            self._kept.append(client)
+        return client
+
+    def next_connect_failure(self) -> Exception | None:
+        # Stay below MAX_CONNECT_ATTEMPTS in a row, the rescan path needs a real scanner
+        if (self._failure_streak < reconnect_handler.MAX_CONNECT_ATTEMPTS - 1
+                and self.rng.random() < self.connect_failure_rate):
+            self._failure_streak += 1
+            self.failures += 1
+            return asyncio.TimeoutError() if self.rng.random() < 0.3 else BleakError("device not found")
+        self._failure_streak = 0
+        return None
+
+    def connected(self, client: StandInClient):
+        self.completed += 1
+        if self.on_cycle is not None:
+            self.on_cycle(self.completed)
+        if self.completed >= self.cycles:
+            self.stop_event.set()
+
+
+class SoakApp:
+    """The subset of the application state the reconnect loop touches."""
+
+    class _BLE:
+        client = None
+
+    def __init__(self, schedule: dict):
+        self.selected_device = ("LEDDMX-00-SOAK", "AA:BB:CC:DD:EE:FF")
+        self.connection_status = "disconnected"
+        self.schedule = schedule
+        self.schedule_engine = ScheduleEngine.from_schedule(schedule)
+        self.sunrise = self.sunset = None
+        self.is_led_on = False
+        self.last_color_hex = None
+        self.last_user_input = 0.0
+        self.active_scene = None
+        self.ble = self._BLE()
+
+
+def soak_schedule() -> dict:
+    """Every day on from 08:00 to 22:00, so corrections happen during the run."""
+    color = COLORS[1][0] if len(COLORS) > 1 else COLORS[0][0]
+    return {day: dict(default_day(), color=color, on_time="08:00", off_time="22:00") for day in DAYS}
+
+
+@dataclass
+class Sample:
+    cycle: int
+    virtual_hours: float
+    rss: int | None
+    traced: int
+    threads: int
+    tasks: int
+    fds: int | None
+    clients: int
+
+
+@dataclass
+class SoakResult:
+    cycles: int
+    connect_failures: int
+    writes: int
+    samples: list[Sample] = field(default_factory=list)
+    growth: dict = field(default_factory=dict)
+    over_budget: dict = field(default_factory=dict)
+    top_growth: str = ""
+    elapsed: float = 0.0
+
+    @property
+    def passed(self) -> bool:
+        return not self.over_budget
+
+
+class Soak:
+    """Runs the reconnect loop for ``cycles`` connects and samples the process."""
+
+    def __init__(self, cycles: int = DEFAULT_CYCLES, warmup: int = WARMUP_CYCLES,
+                 sample_every: int = SAMPLE_EVERY, budgets: dict | None = None, seed: int = 2000,
+                 keep_clients: bool = False, frames: int = TRACE_FRAMES):
+        self.cycles = cycles
+        self.frames = frames
+        self.warmup = min(warmup, max(cycles - 1, 0))
+        self.sample_every = sample_every
+        self.budgets = dict(BUDGETS, **(budgets or {}))
+        self.clock = VirtualClock(LOCAL_TZ.localize(datetime(2026, 1, 5)))
+        self.stop_event = threading.Event()
+        self.transport = StandInTransport(self.clock, cycles, self.stop_event, self._on_cycle,
+                                          seed=seed, keep_clients=keep_clients)
+        self.app = SoakApp(soak_schedule())
+        self.samples = []
+        self._baseline_snapshot = None
+        self._last_snapshot = None
+
+    def _on_cycle(self, cycle: int):
+        if cycle == self.warmup or (cycle > self.warmup and (cycle - self.warmup) % self.sample_every == 0) \
+                or cycle == self.cycles:
+            self.samples.append(self.sample(cycle))
+
+    def sample(self, cycle: int) -> Sample:
+        gc.collect()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        snapshot = tracemalloc.take_snapshot()
+        if self._baseline_snapshot is None:
+            self._baseline_snapshot = snapshot
+        self._last_snapshot = snapshot
+        return Sample(
+            cycle=cycle,
+            virtual_hours=round(self.clock.monotonic() / 3600, 2),
+            rss=_rss_bytes(),
+            traced=tracemalloc.get_traced_memory()[0],
+            threads=threading.active_count(),
+            tasks=len(asyncio.all_tasks()),
+            fds=_open_fds(),
+            clients=len(self.transport.alive),
+        )
+
+    def run(self) -> SoakResult:
+        began = time.perf_counter()
+        was_tracing = tracemalloc.is_tracing()
+        loop_coro = reconnect_handler.start_ble_connection_loop(
+            self.app, self.stop_event, self.clock, client_factory=self.transport.factory)
+        try:
+            # The loop logs every step with print(); a StringIO would itself grow
+            with open(os.devnull, "w", encoding="utf-8") as sink, contextlib.redirect_stdout(sink):
+                self.clock.run(loop_coro)
+            return self._result(time.perf_counter() - began)
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+    def _result(self, elapsed: float) -> SoakResult:
+        transport = self.transport
+        result = SoakResult(transport.completed, transport.failures, transport.writes,
+                            samples=self.samples, elapsed=elapsed)
+        if len(self.samples) < 2:
+            return result
+        first, last = self.samples[0], self.samples[-1]
+        for name, budget in self.budgets.items():
+            before, after = getattr(first, name), getattr(last, name)
+            if before is None or after is None:
+                continue  # not measurable on this platform
+            result.growth[name] = after - before
+            if after - before > budget:
+                result.over_budget[name] = after - before
+        if self._baseline_snapshot is not None:
+            result.top_growth = diff_snapshots(self._baseline_snapshot, self._last_snapshot, top=10)
+        return result
+
+
+def _format_bytes(value) -> str:
+    return "-" if value is None else f"{value / 1024:.0f} KiB"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ledapp.soak", description=__doc__.split("\n")[0])
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES, help="successful connects to run")
+    parser.add_argument("--warmup", type=int, default=WARMUP_CYCLES, help="cycles before the baseline sample")
+    parser.add_argument("--sample-every", type=int, default=SAMPLE_EVERY)
+    parser.add_argument("--seed", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=TRACE_FRAMES,
+                        help="tracemalloc frames per allocation (more = deeper growth report, slower)")
+    for name, budget in BUDGETS.items():
+        parser.add_argument(f"--max-{name}", type=int, default=budget, dest=f"max_{name}",
+                            help=f"allowed growth (default {budget})")
+    parser.add_argument("--inject-leak", action="store_true",
+                        help="keep every client referenced (checks that the harness catches it)")
+    parser.add_argument("--json", action="store_true", help="machine readable output")
+    args = parser.parse_args(argv)
+    if args.cycles < 2:
+        parser.error("--cycles must be at least 2")
+
+    soak = Soak(args.cycles, args.warmup, args.sample_every, seed=args.seed, keep_clients=args.inject_leak,
+                frames=args.frames,
+                budgets={name: getattr(args, f"max_{name}") for name in BUDGETS})
+    result = soak.run()
+
+    if args.json:
+        data = asdict(result)
+        data["passed"] = result.passed
+        json.dump(data, sys.stdout, indent=2)
+        print()
+        return 0 if result.passed else 1
+
+    print(f"{'cycle':>7} {'virt h':>8} {'rss':>10} {'traced':>10} {'threads':>7} {'tasks':>5} {'fds':>4} {'clients':>7}")
+    for s in result.samples:
+        print(f"{s.cycle:>7} {s.virtual_hours:>8.1f} {_format_bytes(s.rss):>10} {_format_bytes(s.traced):>10} "
+              f"{s.threads:>7} {s.tasks:>5} {'-' if s.fds is None else s.fds:>4} {s.clients:>7}")
+    print(f"\n{result.cycles} cycles, {result.connect_failures} failed connects, {result.writes} writes, "
+          f"{result.elapsed:.1f} s")
+    print("growth: " + ", ".join(f"{name} {value:+d}" for name, value in result.growth.items()))
+    if result.passed:
+        print("OK: every counter stayed within budget")
+        return 0
+    print("FAIL: over budget: " + ", ".join(f"{name} {value:+d} (max {soak.budgets[name]})"
+                                            for name, value in result.over_budget.items()))
+    print("\nTop allocation growth since the baseline:\n" + result.top_growth)
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+"""Import-time benchmark of the entry points, with budgets.
+
+Usage::
+
+    python -m ledapp.startup_bench              # every target
+    python -m ledapp.startup_bench tray --runs 7 --top 20
+
+Each target module is imported in a fresh interpreter under
+``python -X importtime`` several times. The fastest run counts, since
+noise only ever adds time. The benchmark reports the total and the
+slowest modules, and fails (exit code 1) when a target is over its time
+budget or pulls in a module that must stay deferred until first use:
+networking, the sun calculation and the GUI2 schedule screen must not be
+imported before the tray icon shows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field
+
+DEFAULT_RUNS = 5
+DEFAULT_TOP = 15
+
+# Modules deferred to first use; none of them may appear while a target is imported
+DEFERRED = ("requests", "suntime", "aiohttp", "ledapp.core.sun_logic", "ledapp.core.location_utils",
+            "ledapp.gui.gui2_schedule_pyside", "ledapp.services.http_api", "ledapp.services.mqtt_bridge")
+
+
+@dataclass(frozen=True)
+class Target:
+    module: str
+    budget_ms: float
+    forbidden: tuple[str, ...] = DEFERRED
+
+
+# Budgets leave headroom for a slower machine, but catch a regression like an
+# eager ``requests`` import (~100 ms on its own).
+TARGETS = {
+    "entry": Target("ledapp.main", 40, DEFERRED + ("PySide6", "bleak")),
+    "ctl": Target("ledapp.ctl", 40, DEFERRED + ("PySide6", "bleak")),
+    "daemon": Target("ledapp.daemon", 200, DEFERRED + ("PySide6",)),
+    "tray": Target("ledapp.app.main", 400),
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+@dataclass
+class ModuleTime:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class BenchResult:
+    target: str
+    module: str
+    total_ms: float
+    budget_ms: float
+    runs_ms: list[float] = field(default_factory=list)
+    modules: list[ModuleTime] = field(default_factory=list)
+    deferred_loaded: list[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.total_ms <= self.budget_ms and not self.deferred_loaded
+
+
+def parse_importtime(text: str) -> list[ModuleTime]:
+    """``-X importtime`` stderr -> one entry per imported module."""
+    modules = []
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append(ModuleTime(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+
+def measure(module: str) -> list[ModuleTime]:
+    """Imports ``module`` once in a fresh interpreter."""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+    if process.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{process.stderr[-2000:]}")
+    return parse_importtime(process.stderr)
+
+
+def bench(name: str, target: Target, runs: int = DEFAULT_RUNS, budget_ms: float | None = None) -> BenchResult:
+    measure(target.module)  # warm-up: writes the .pyc files and fills the OS file cache
+    samples = []
+    for _ in range(runs):
+        modules = measure(target.module)
+        total = next((m.cumulative_us for m in modules if m.name == target.module and m.depth == 0), 0)
+        samples.append((total / 1000, modules))
+    totals = [total for total, _modules in samples]
+    best = min(samples, key=lambda sample: sample[0])[1]
+    loaded = {m.name for m in best}
+    deferred = sorted(name for name in target.forbidden
+                      if name in loaded or any(m.startswith(name + ".") for m in loaded))
+    return BenchResult(name, target.module, min(totals), target.budget_ms if budget_ms is None else budget_ms,
+                       runs_ms=totals, modules=best, deferred_loaded=deferred)
+
+
+def _report(result: BenchResult, top: int):
+    verdict = "OK" if result.passed else "FAIL"
+    print(f"{result.target} ({result.module}): {result.total_ms:.1f} ms "
+          f"(budget {result.budget_ms:.0f} ms, runs {', '.join(f'{t:.0f}' for t in result.runs_ms)}) {verdict}")
+    if result.deferred_loaded:
+        print("  loaded at import, should be deferred: " + ", ".join(result.deferred_loaded))
+    print(f"  {'self ms':>8} {'cumul ms':>9}  module")
+    for module in sorted(result.modules, key=lambda m: m.self_us, reverse=True)[:top]:
+        print(f"  {module.self_us / 1000:>8.1f} {module.cumulative_us / 1000:>9.1f}  {module.name}")
+    print()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ledapp.startup_bench", description=__doc__.split("\n")[0])
+    parser.add_argument("targets", nargs="*", metavar="TARGET",
+                        help=f"targets to measure: {', '.join(TARGETS)} (default: all)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="slowest modules to list per target")
+    parser.add_argument("--budget", type=float, help="override the budget (ms) of the measured targets")
+    parser.add_argument("--json", action="store_true", help="machine readable output")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    results = []
+    for name in args.targets or TARGETS:
+        try:
+            results.append(bench(name, TARGETS[name], max(1, args.runs), args.budget))
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 2
+
+    if args.json:
+        json.dump([dict(asdict(r), passed=r.passed) for r in results], sys.stdout, indent=2)
+        print()
+    else:
+        for result in results:
+            _report(result, args.top)
+    return 0 if all(r.passed for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
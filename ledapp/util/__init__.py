@@ -1 +1,7 @@
-from .async_helper import AsyncHelper
+def __getattr__(name):
+    # AsyncHelper pulls in PySide6; import it only when it is actually used,
+    # so Qt-free tools (clock, simulator) can live in this package too.
+    if name == "AsyncHelper":
+        from .async_helper import AsyncHelper
+        return AsyncHelper
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
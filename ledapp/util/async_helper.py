@@ -2,11 +2,23 @@
 
 import asyncio
 import threading
+import time
 import traceback
-from concurrent.futures import Future
+from concurrent.futures import CancelledError, Future
 
 from PySide6.QtCore import QMetaObject, Qt, Q_ARG, Signal
 
+from . import metrics, tracing
+from .loop_monitor import LoopMonitor
+from .profiling import PROFILER
+from .task_manager import Priority, TaskManager
+
+TASKS_SUBMITTED = metrics.counter("async_tasks_submitted", "Coroutines submitted through run_async_task")
+TASKS_FAILED = metrics.counter("async_tasks_failed", "run_async_task coroutines that raised")
+TASKS_CANCELLED = metrics.counter("async_tasks_cancelled", "run_async_task coroutines that were cancelled")
+TASKS_IN_FLIGHT = metrics.gauge("async_tasks_in_flight", "run_async_task coroutines not finished yet")
+TASK_SECONDS = metrics.histogram("async_task_seconds", "Submit-to-finish time of run_async_task coroutines")
+
 # Logolás importálása
 try:
     from ..core.reconnect_handler import log_event
@@ -29,6 +41,12 @@ class AsyncHelper:
         self.loop = asyncio.new_event_loop()
         self.event_loop_thread = threading.Thread(target=self._run_dedicated_asyncio_loop, daemon=True)
         self.event_loop_thread.start()
+        # Késés- és akadásfigyelő; az on_health callbacket a főablak állítja be
+        self.loop_monitor = LoopMonitor(self.loop, "async_helper")
+        self.loop_monitor.start()
+        PROFILER.register_loop(self.loop, "async_helper")
+        # Prioritás, időkorlát, kulcs szerinti összevonás és megszakítás (util.task_manager)
+        self.tasks = TaskManager(self.loop)
 
     def _run_dedicated_asyncio_loop(self):
         """ A dedikált szálon futó asyncio eseményhurok. """
@@ -74,14 +92,18 @@ class AsyncHelper:
             self.loop.close()
             log_event("Asyncio event loop thread finished.")
 
-    def run_async_task(self, coro, callback_success_signal=None, callback_error_signal=None):
+    def run_async_task(self, coro, callback_success_signal=None, callback_error_signal=None,
+                       priority=Priority.USER, key=None, timeout=None, replace=False):
         """
-        Futtat egy coroutine-t és signalokat bocsát ki az eredménnyel/hibával.
+        Futtat egy coroutine-t a feladatkezelőn (self.tasks) át, és signalokat bocsát ki az eredménnyel/hibával.
 
         Args:
             coro: A futtatandó asyncio coroutine.
             callback_success_signal: A sikeres végrehajtáskor kibocsátandó Signal objektum.
             callback_error_signal: Hiba esetén kibocsátandó Signal objektum.
+            priority: Prioritási osztály (Priority); a felhasználói parancsok mindig azonnal indulnak.
+            key: Azonos kulcsú, még futó feladat esetén ahhoz csatlakozik (replace=True: leállítja és újraindítja).
+            timeout: Időkorlát másodpercben (None: nincs); túllépéskor TimeoutError.
 
         Returns:
             A Future objektum, vagy None, ha a hurok nem fut.
@@ -95,9 +117,18 @@ class AsyncHelper:
                  log_event(f"HIBA: Nem található vagy nem Signal a megadott error callback: {callback_error_signal}")
             return None
 
-        future: Future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future: Future = self.tasks.submit(coro, priority, key=key, timeout=timeout, replace=replace)
+        submitted = time.perf_counter_ns()
+        task_name = getattr(coro, "__qualname__", type(coro).__name__)
+        TASKS_SUBMITTED.inc()
+        TASKS_IN_FLIGHT.inc()
 
         def done_callback(f):
+            finished = time.perf_counter_ns()
+            TASKS_IN_FLIGHT.dec()
+            TASK_SECONDS.observe((finished - submitted) / 1e9)
+            tracing.TRACER.complete(task_name, "async_helper", submitted, finished,
+                                    f"AsyncHelper: {task_name}", cancelled=f.cancelled())
             try:
                 result = f.result()
                 log_event(f"AsyncHelper: Task successful. Result type: {type(result)}, Value: {result}")
@@ -109,10 +140,14 @@ class AsyncHelper:
                 #    log_event(f"Figyelmeztetés: Nincs vagy nem Signal a megadott success callback: {callback_success_signal}")
 
             except Exception as e:
-                if isinstance(e, asyncio.CancelledError):
+                # A threadsafe Future a concurrent.futures CancelledError-ját dobja
+                if isinstance(e, (asyncio.CancelledError, CancelledError)):
+                    TASKS_CANCELLED.inc()
                     log_event("Asyncio task cancelled.")
                     return
 
+                TASKS_FAILED.inc()
+
                 bleak_error_msg = ""
                 if hasattr(e, 'dbus_error'): bleak_error_msg = f" (DBus Error: {getattr(e, 'dbus_error_details', '')})"
                 elif hasattr(e, 'winrt_error'): bleak_error_msg = f" (WinRT Error: {e.winrt_error})"
@@ -129,8 +164,17 @@ class AsyncHelper:
         future.add_done_callback(done_callback)
         return future
 
+    def cancel_task(self, key):
+        """Megszakítja a key kulccsal indított (várakozó vagy futó) feladatot."""
+        return self.tasks.cancel(key)
+
     def stop_loop(self):
         """Leállítja az asyncio eseményhurkot."""
+        self.loop_monitor.stop()
         if self.loop.is_running():
             log_event("Stopping asyncio loop (requested)...")
+            # A profilt csak a saját szálán lehet kikapcsolni (cProfile szálanként fut), ezért a hurokban
+            self.loop.call_soon_threadsafe(PROFILER.unregister_thread, "async_helper")
             self.loop.call_soon_threadsafe(self.loop.stop)
+        else:
+            PROFILER.unregister_thread("async_helper")
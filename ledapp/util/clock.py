@@ -0,0 +1,161 @@
+"""Clock abstraction for timing code.
+
+Code that needs "now" or has to wait asks :func:`get_clock` instead of
+calling ``time.time()`` / ``datetime.now()`` / ``asyncio.sleep()`` directly,
+so simulations and soak runs can drive the same logic with a
+:class:`VirtualClock`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+
+
+class RealClock:
+    """Wall clock time."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self, tz=None) -> datetime:
+        return datetime.now(tz)
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """Clock that only moves when told to.
+
+    :meth:`sleep` parks the caller on a timer heap instead of waiting.
+    :meth:`run_until` lets every runnable task settle, then jumps straight to
+    the earliest pending timer and wakes it, so a week of pings and schedule
+    checks costs as many loop iterations as there are wake-ups. Everything
+    driven this way must only wait through the clock (no real I/O).
+    """
+
+    def __init__(self, start: datetime | None = None, settle_passes: int = 8):
+        start = start or datetime.now(timezone.utc)
+        if start.tzinfo is None:
+            raise ValueError("VirtualClock needs a timezone-aware start time")
+        self._now = start.timestamp()
+        self._origin = self._now
+        self._timers: list[tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._sleeping = 0
+        self.settle_passes = settle_passes
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now - self._origin
+
+    def now(self, tz=None) -> datetime:
+        return datetime.fromtimestamp(self._now, tz)
+
+    def set(self, moment: datetime):
+        self._move_to(moment.timestamp())
+
+    def advance(self, seconds: float):
+        self._move_to(self._now + seconds)
+
+    def _move_to(self, timestamp: float):
+        if timestamp < self._now:
+            raise ValueError("VirtualClock cannot go backwards")
+        self._now = timestamp
+
+    async def sleep(self, seconds: float):
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self._now + seconds, next(self._sequence), future))
+        self._sleeping += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done() or future.cancelled():
+                self._sleeping -= 1
+            raise
+
+    @property
+    def pending_timers(self) -> int:
+        return sum(1 for _deadline, _seq, future in self._timers if not future.done())
+
+    def next_deadline(self) -> float | None:
+        """Timestamp of the earliest pending timer."""
+        self._drop_cancelled()
+        return self._timers[0][0] if self._timers else None
+
+    def _drop_cancelled(self):
+        while self._timers and self._timers[0][2].done():
+            heapq.heappop(self._timers)
+
+    async def _settle(self, sleepers: int):
+        # Give the loop a pass so woken tasks run; stop as soon as every
+        # sleeper we knew about is parked on a timer again.
+        for _ in range(self.settle_passes):
+            await asyncio.sleep(0)
+            if self._timers and self._sleeping >= sleepers:
+                return
+
+    async def run_until(self, until: datetime | None = None, task: asyncio.Future | None = None) -> int:
+        """Fires timers in deadline order until ``until`` is reached, ``task``
+        finishes or nothing is waiting any more. Returns the number of timers
+        fired. Must be awaited on the loop the sleepers run on."""
+        limit = until.timestamp() if until is not None else None
+        fired = 0
+        sleepers = self._sleeping
+        while task is None or not task.done():
+            await self._settle(sleepers)
+            sleepers = self._sleeping
+            deadline = self.next_deadline()
+            if deadline is None or (limit is not None and deadline > limit):
+                break
+            _deadline, _seq, future = heapq.heappop(self._timers)
+            if deadline > self._now:
+                self._now = deadline
+            future.set_result(None)
+            self._sleeping -= 1
+            fired += 1
+        if limit is not None and (task is None or not task.done()) and limit > self._now:
+            self._now = limit
+        return fired
+
+    def run(self, coro, until: datetime | None = None):
+        """Runs ``coro`` in a fresh event loop on virtual time; returns its
+        result, or cancels it when ``until`` is reached first."""
+
+        async def main():
+            task = asyncio.ensure_future(coro)
+            await self.run_until(until, task)
+            if not task.done():
+                task.cancel()
+            try:
+                return await task
+            except asyncio.CancelledError:
+                return None
+
+        return asyncio.run(main())
+
+
+_clock = RealClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Replaces the process wide clock; returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
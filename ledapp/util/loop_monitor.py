@@ -0,0 +1,239 @@
+"""Event-loop lag monitor and stall watchdog.
+
+A :class:`LoopMonitor` heartbeat task sleeps ``interval`` seconds on the
+watched loop and records how late it wakes up (the scheduling lag) in a
+histogram. A watchdog thread checks the heartbeats. When a loop has not
+beaten for ``stall_threshold`` seconds, something is blocking it (typically
+a synchronous Bleak/WinRT call), and the watchdog captures the stacks of the
+loop thread, its tasks and all other threads while the stall is still going
+on. The derived health ("ok", "degraded" or "stalled") is reported through
+``on_health(health, detail)``; the GUI shows it in the tray tooltip.
+
+:func:`set_cadence` slows every monitor and the watchdog down, with the
+wakeups aligned to a shared grid, while the app is idle (``util.power``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import math
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from . import metrics
+
+HEARTBEAT_INTERVAL = 0.25
+STALL_THRESHOLD = 1.0  # no heartbeat for this long (beyond the interval) = stalled
+DEGRADED_LAG = 0.1  # p95 lag above this = degraded
+DEGRADED_HOLD = 60.0  # stay degraded this long after a stall ended
+LAG_WINDOW = 240  # recent samples used for the p95 (~1 minute)
+WATCHDOG_PERIOD = 0.1
+STACK_LIMIT = 25
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+OK, DEGRADED, STALLED = "ok", "degraded", "stalled"
+
+
+class LoopMonitor:
+    """Measures the scheduling lag of one asyncio loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, name: str = "asyncio",
+                 interval: float = HEARTBEAT_INTERVAL, stall_threshold: float = STALL_THRESHOLD,
+                 on_health=None):
+        self.loop = loop
+        self.name = name
+        self.interval = interval
+        self.align = 0.0  # heartbeats on multiples of this (monotonic clock), 0: not aligned
+        self.stall_threshold = stall_threshold
+        self.on_health = on_health
+        self.health = OK
+        self.detail = ""
+        self.stall_reports = deque(maxlen=5)
+        self.lag = metrics.histogram(f"{name}_loop_lag_seconds", f"Scheduling lag of the {name} loop", LAG_BUCKETS)
+        self.stalls = metrics.counter(f"{name}_loop_stalls", f"Stalls of the {name} loop seen by the watchdog")
+        self._recent = deque(maxlen=LAG_WINDOW)
+        self._last_beat = None
+        self._next_due = None  # monotonic time the current heartbeat sleep should end
+        self._loop_thread = None
+        self._stall_started = None
+        self._last_stall_end = None
+        self._task = None
+
+    # --- loop side -----------------------------------------------------
+    def start(self):
+        """Starts the heartbeat (thread-safe) and registers with the watchdog."""
+        if _cadence:
+            self.interval, self.align = _cadence["heartbeat"], _cadence["align"]
+        self._last_beat = time.monotonic()
+        self._next_due = self._last_beat + self.interval
+        self.loop.call_soon_threadsafe(self._start_heartbeat)
+        _watchdog.add(self)
+
+    def set_interval(self, interval: float, align: float = 0.0):
+        """Changes the heartbeat cadence (thread-safe); a shorter one takes effect at once."""
+        shorter = interval < self.interval
+        self.interval, self.align = interval, align
+        if shorter and self._task is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._restart_heartbeat)
+
+    def _restart_heartbeat(self):
+        if self._task is None:
+            return  # stopped meanwhile
+        self._task.cancel()
+        self._last_beat = time.monotonic()
+        self._next_due = self._last_beat + self.interval
+        self._task = self.loop.create_task(self._heartbeat())
+
+    def stop(self):
+        _watchdog.remove(self)
+        task = self._task
+        if task is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(task.cancel)
+        self._task = None
+
+    def _start_heartbeat(self):
+        self._loop_thread = threading.get_ident()
+        self._task = self.loop.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        loop = self.loop
+        while True:
+            now = loop.time()
+            delay = self.interval
+            if self.align > 0:
+                delay = math.ceil((now + delay) / self.align) * self.align - now
+            expected = now + delay
+            self._next_due = time.monotonic() + delay
+            await asyncio.sleep(delay)
+            lag = max(0.0, loop.time() - expected)
+            self.lag.observe(lag)
+            self._recent.append(lag)
+            self._last_beat = time.monotonic()
+
+    # --- watchdog side -------------------------------------------------
+    def p95(self) -> float:
+        while True:
+            try:
+                recent = sorted(self._recent)
+                break
+            except RuntimeError:  # the heartbeat appended meanwhile
+                continue
+        return recent[int(len(recent) * 0.95)] if recent else 0.0
+
+    def check(self, now: float):
+        """Called by the watchdog thread; updates the health state."""
+        if self._last_beat is None:
+            return
+        silent = now - self._next_due
+        if silent > self.stall_threshold:
+            if self._stall_started is None:
+                self._stall_started = self._next_due
+                self.stalls.inc()
+                self._capture(silent)
+            self._set_health(STALLED, f"no heartbeat for {silent:.1f}s")
+            return
+        if self._stall_started is not None:
+            logging.warning("LoopMonitor[%s]: loop resumed after %.1fs", self.name, now - self._stall_started)
+            self._stall_started = None
+            self._last_stall_end = now
+        p95 = self.p95()
+        if p95 > DEGRADED_LAG:
+            self._set_health(DEGRADED, f"p95 lag {p95 * 1000:.0f} ms")
+        elif self._last_stall_end is not None and now - self._last_stall_end < DEGRADED_HOLD:
+            self._set_health(DEGRADED, f"stalled {now - self._last_stall_end:.0f}s ago")
+        else:
+            self._set_health(OK, f"p95 lag {p95 * 1000:.0f} ms")
+
+    def _set_health(self, health: str, detail: str):
+        changed = health != self.health
+        self.health, self.detail = health, detail
+        if changed and self.on_health is not None:
+            try:
+                self.on_health(health, detail)
+            except Exception:
+                logging.exception("LoopMonitor[%s]: health callback failed", self.name)
+
+    def _capture(self, silent: float):
+        """Stacks of the blocked loop thread, its tasks and the other threads."""
+        frames = sys._current_frames()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        report = {"loop": self.name, "time": time.time(), "silent": silent, "threads": {}, "tasks": []}
+        for ident, frame in frames.items():
+            label = f"{names.get(ident, ident)}{' (loop)' if ident == self._loop_thread else ''}"
+            report["threads"][label] = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+        try:
+            # The loop is blocked, so its task set does not change under us
+            tasks = list(asyncio.all_tasks(self.loop))
+        except RuntimeError:
+            tasks = []
+        for task in tasks:
+            out = io.StringIO()
+            task.print_stack(limit=STACK_LIMIT, file=out)
+            report["tasks"].append({"name": task.get_name(), "stack": out.getvalue()})
+        self.stall_reports.append(report)
+        loop_stack = next((s for label, s in report["threads"].items() if label.endswith("(loop)")), "?")
+        logging.warning("LoopMonitor[%s]: loop stalled for %.1fs, loop thread is at:\n%s",
+                        self.name, silent, loop_stack)
+
+
+class _Watchdog:
+    """One daemon thread checking every registered monitor."""
+
+    def __init__(self):
+        self._monitors = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.period = WATCHDOG_PERIOD
+        self.align = 0.0
+
+    def add(self, monitor: LoopMonitor):
+        with self._lock:
+            if monitor not in self._monitors:
+                self._monitors.append(monitor)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+                self._thread.start()
+
+    def remove(self, monitor: LoopMonitor):
+        with self._lock:
+            if monitor in self._monitors:
+                self._monitors.remove(monitor)
+
+    def _run(self):
+        while True:
+            delay = self.period
+            if self.align > 0:
+                now = time.monotonic()
+                delay = math.ceil((now + delay) / self.align) * self.align - now
+            time.sleep(delay)
+            with self._lock:
+                monitors = list(self._monitors)
+                if not monitors:
+                    self._thread = None
+                    return
+            now = time.monotonic()
+            for monitor in monitors:
+                try:
+                    monitor.check(now)
+                except Exception:
+                    logging.exception("LoopMonitor watchdog: check of %s failed", monitor.name)
+
+
+_watchdog = _Watchdog()
+_cadence = {}  # the last set_cadence(), also used by monitors started later
+
+
+def set_cadence(heartbeat: float, watchdog: float, align: float = 0.0):
+    """Heartbeat interval and watchdog period of every monitor, wakeups aligned to ``align``."""
+    _cadence.update(heartbeat=heartbeat, align=align)
+    _watchdog.period, _watchdog.align = watchdog, align
+    with _watchdog._lock:
+        monitors = list(_watchdog._monitors)
+    for monitor in monitors:
+        monitor.set_interval(heartbeat, align)
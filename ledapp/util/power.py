@@ -0,0 +1,188 @@
+"""Idle-aware power policy: fewer wakeups while the window is hidden.
+
+The GUI reports whether its window is visible. Hidden in the tray the app
+is in ``background`` mode, and after ``IDLE_AFTER`` seconds without user
+input (tray, IPC/HTTP/MQTT commands) in ``idle`` mode. In these modes:
+
+* the GUI stops its UI timers (the GUI2 clock);
+* non-critical waits (the reconnect loop's poll) are stretched by the
+  mode's factor via :meth:`PowerPolicy.sleep`;
+* the remaining wakeups are aligned onto one shared grid (multiples of
+  the mode's ``tick`` on the monotonic clock). The reconnect loop, the
+  LoopMonitor heartbeats and the watchdog thread then wake up together
+  instead of each on its own phase. The sleeps go through the loop's
+  timer wheel (``util.timer_wheel``) with the ``tick`` as tolerance, so
+  they also share wakeups with the other timers there;
+* the LoopMonitor heartbeat and watchdog cadence is slowed down.
+
+When the window is shown, :meth:`PowerPolicy.set_visible` switches back to
+``active`` at once: stretched sleeps return immediately and the
+monitors go back to their normal cadence.
+
+Headless processes (daemon, simulation, soak) never report a hidden window
+and stay ``active``, with unchanged timing.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from dataclasses import dataclass
+
+from . import loop_monitor, metrics, timer_wheel
+from .clock import RealClock, get_clock
+
+ACTIVE, BACKGROUND, IDLE = "active", "background", "idle"
+IDLE_AFTER = 300.0  # seconds hidden without user input
+
+
+@dataclass(frozen=True)
+class PowerProfile:
+    stretch: float  # factor for non-critical waits
+    tick: float  # wakeups are aligned to multiples of this (0: not aligned)
+    heartbeat: float  # LoopMonitor heartbeat interval
+    watchdog: float  # LoopMonitor watchdog period
+
+
+PROFILES = {
+    ACTIVE: PowerProfile(1.0, 0.0, loop_monitor.HEARTBEAT_INTERVAL, loop_monitor.WATCHDOG_PERIOD),
+    BACKGROUND: PowerProfile(4.0, 1.0, 1.0, 1.0),
+    IDLE: PowerProfile(10.0, 5.0, 5.0, 5.0),
+}
+
+MODE = metrics.gauge("power_mode", "0 active, 1 background (hidden), 2 idle")
+_MODE_VALUES = {ACTIVE: 0, BACKGROUND: 1, IDLE: 2}
+
+
+def align(delay: float, tick: float, now: float) -> float:
+    """``delay`` extended to the next multiple of ``tick`` on the ``now`` time line."""
+    if tick <= 0:
+        return delay
+    return math.ceil((now + delay) / tick) * tick - now
+
+
+class PowerPolicy:
+    """Current power mode, derived from window visibility and user activity."""
+
+    def __init__(self, idle_after: float = IDLE_AFTER, clock=None):
+        self.idle_after = idle_after
+        self._clock = clock
+        self._visible = True
+        self._quiet_since = None  # monotonic time of hiding or of the last input while hidden
+        self._mode = ACTIVE
+        self._listeners = []
+        self._waiters = set()  # (loop, future) of sleeps to cut short on activation
+        self._lock = threading.Lock()
+
+    @property
+    def clock(self):
+        return self._clock or get_clock()
+
+    @property
+    def mode(self) -> str:
+        return self.refresh()
+
+    @property
+    def profile(self) -> PowerProfile:
+        return PROFILES[self.mode]
+
+    def add_listener(self, listener):
+        """``listener(mode)`` is called on every mode change, on the thread that noticed it."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # --- inputs ----------------------------------------------------------
+    def set_visible(self, visible: bool):
+        with self._lock:
+            if visible == self._visible:
+                return
+            self._visible = visible
+            self._quiet_since = None if visible else self.clock.monotonic()
+        self.refresh()
+
+    def note_activity(self):
+        """User input while hidden (tray, remote command): postpones idle mode."""
+        with self._lock:
+            if not self._visible:
+                self._quiet_since = self.clock.monotonic()
+        self.refresh()
+
+    def refresh(self) -> str:
+        """Re-evaluates the mode (idle starts by time), notifies listeners on change."""
+        with self._lock:
+            if self._visible:
+                mode = ACTIVE
+            elif self.clock.monotonic() - self._quiet_since >= self.idle_after:
+                mode = IDLE
+            else:
+                mode = BACKGROUND
+            changed, self._mode = mode != self._mode, mode
+            waiters = self._waiters if changed and mode == ACTIVE else ()
+            if waiters:
+                self._waiters = set()
+        if changed:
+            self._apply(mode, waiters)
+        return mode
+
+    def _apply(self, mode: str, waiters):
+        logging.info("Power: %s mode", mode)
+        MODE.set(_MODE_VALUES[mode])
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # loop already closed
+                pass
+        profile = PROFILES[mode]
+        loop_monitor.set_cadence(profile.heartbeat, profile.watchdog, profile.tick)
+        for listener in list(self._listeners):
+            try:
+                listener(mode)
+            except Exception:
+                logging.exception("Power: mode listener failed")
+
+    # --- waiting ---------------------------------------------------------
+    def stretched(self, delay: float) -> float:
+        """A non-critical wait in the current mode: stretched and aligned to the shared grid."""
+        profile = self.profile
+        return align(delay * profile.stretch, profile.tick, self.clock.monotonic())
+
+    async def sleep(self, delay: float, clock=None):
+        """Non-critical wait. Stretched while hidden, returns at once when the window is shown."""
+        clock = clock or self.clock
+        active = self.mode == ACTIVE
+        if not isinstance(clock, RealClock):
+            await clock.sleep(delay if active else self.stretched(delay))  # virtual time: nothing to cut short
+            return
+        wheel = timer_wheel.for_loop()
+        if active:
+            await wheel.sleep(delay, name="power.sleep")
+            return
+        profile = self.profile
+        delay = self.stretched(delay)
+        loop = wheel.loop
+        entry = (loop, loop.create_future())
+        with self._lock:
+            if self._mode == ACTIVE:
+                return  # shown meanwhile
+            self._waiters.add(entry)
+        # Woken by the wheel, or at once by the activation (_wake on the same future)
+        timer = wheel.call_later(delay, _wake, entry[1], tolerance=max(profile.tick, timer_wheel.DEFAULT_TOLERANCE),
+                                 name="power.sleep")
+        try:
+            await entry[1]
+        finally:
+            timer.cancel()
+            with self._lock:
+                self._waiters.discard(entry)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+POWER = PowerPolicy()
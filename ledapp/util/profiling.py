@@ -0,0 +1,249 @@
+"""Built-in CPU (cProfile) and memory (tracemalloc) profiling.
+
+cProfile only sees the thread it was enabled in, so the profiler keeps
+one ``cProfile.Profile`` per registered thread: the Qt GUI thread and the
+AsyncHelper loop (with the reconnect loop on it) in the GUI, the main loop
+in the daemon.
+Each profile is enabled and disabled on its own thread through the
+runner the thread registered (``loop.call_soon_threadsafe``, a queued
+Qt signal). When profiling stops, the per-thread stats are merged into a
+single ``.prof`` dump and a text summary.
+
+Memory profiling uses tracemalloc. Every snapshot is written as a ``.snap``
+file, together with a top-N allocation diff against the previous snapshot.
+Two saved snapshots can also be compared later::
+
+    python -m ledapp.util.profiling diff profiles/a.snap profiles/b.snap
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+from concurrent.futures import Future
+from datetime import datetime
+
+from ..config import PROFILE_DIR
+
+TOP_N = 25
+TRACE_FRAMES = 10
+STOP_TIMEOUT = 2.0  # a blocked loop must not hang the caller
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def diff_snapshots(old: tracemalloc.Snapshot, new: tracemalloc.Snapshot, top: int = TOP_N,
+                   key_type: str = "lineno") -> str:
+    """Top-N allocation growth between two snapshots, as text."""
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    stats = new.filter_traces(filters).compare_to(old.filter_traces(filters), key_type)
+    total = sum(stat.size_diff for stat in stats)
+    lines = [f"Total growth: {total / 1024:+.1f} KiB in {len(stats)} locations", ""]
+    lines.extend(str(stat) for stat in stats[:top])
+    return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """Starts/stops cProfile and tracemalloc for the whole app."""
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self._runners = {}  # name -> thread-safe "run this callable on that thread"
+        self._profiles = {}  # name -> (thread ident, cProfile.Profile)
+        self._lock = threading.Lock()
+        self.cpu_active = False
+        self._last_snapshot = None
+
+    @property
+    def mem_active(self) -> bool:
+        return tracemalloc.is_tracing() and self._last_snapshot is not None
+
+    def _path(self, kind: str, suffix: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"ledapp-{kind}-{_timestamp()}")
+        path, n = base + suffix, 1
+        while os.path.exists(path):  # two dumps within one second
+            n += 1
+            path = f"{base}-{n}{suffix}"
+        return path
+
+    # --- covered threads -----------------------------------------------
+    def register_thread(self, name: str, call_soon):
+        """Covers the thread behind ``call_soon(fn)``, a thread-safe way to run
+        ``fn`` on it (``loop.call_soon_threadsafe``, a queued Qt signal)."""
+        with self._lock:
+            self._runners[name] = call_soon
+            active = self.cpu_active
+        if active:
+            call_soon(lambda: self._enable_here(name))
+
+    def register_loop(self, loop, name: str):
+        self.register_thread(name, loop.call_soon_threadsafe)
+
+    def unregister_thread(self, name: str):
+        """Call from the covered thread before it exits; its stats are kept."""
+        with self._lock:
+            self._runners.pop(name, None)
+            entry = self._profiles.get(name)
+        if entry is not None and entry[0] == threading.get_ident():
+            entry[1].disable()
+
+    def _enable_here(self, name: str):
+        profile = cProfile.Profile()
+        with self._lock:
+            if not self.cpu_active or name in self._profiles:
+                return
+            self._profiles[name] = (threading.get_ident(), profile)
+        profile.enable()
+
+    def _disable(self, name: str):
+        """Disables ``name``'s profile on its own thread (cProfile is per thread)."""
+        ident, profile = self._profiles[name]
+        if ident == threading.get_ident():
+            profile.disable()
+            return
+        call_soon = self._runners.get(name)
+        if call_soon is None:
+            return  # thread already gone; unregister_thread disabled it
+        done = Future()
+
+        def disable():
+            profile.disable()
+            done.set_result(None)
+
+        try:
+            call_soon(disable)
+            done.result(timeout=STOP_TIMEOUT)
+        except Exception as e:
+            # Thread stuck or its loop closed: the dump goes on with what is there
+            logging.warning("Profiler: could not stop profiling in %s: %s", name, e)
+
+    # --- CPU -----------------------------------------------------------
+    def start_cpu(self):
+        with self._lock:
+            if self.cpu_active:
+                return
+            self.cpu_active = True
+            self._profiles = {}
+            runners = dict(self._runners)
+        for name, call_soon in runners.items():
+            try:
+                call_soon(lambda name=name: self._enable_here(name))
+            except RuntimeError as e:  # closed loop
+                logging.warning("Profiler: cannot profile %s: %s", name, e)
+        logging.info("Profiler: CPU profiling started in %s", ", ".join(runners) or "no threads")
+
+    def stop_cpu(self) -> str | None:
+        """Stops cProfile everywhere; returns the ``.prof`` path (a ``.txt`` summary sits next to it)."""
+        with self._lock:
+            if not self.cpu_active:
+                return None
+            names = list(self._profiles)
+        for name in names:
+            self._disable(name)
+        with self._lock:
+            self.cpu_active = False
+            profiles, self._profiles = self._profiles, {}
+
+        stats = None
+        for name, (_ident, profile) in profiles.items():
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:  # a thread that never ran any Python code
+                logging.debug("Profiler: no samples from %s", name)
+        if stats is None:
+            return None
+        path = self._path("cpu", ".prof")
+        stats.dump_stats(path)
+        summary = io.StringIO()
+        summary.write(f"Threads: {', '.join(profiles)}\n\n")
+        stats.stream = summary
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_N)
+        with open(path[:-5] + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        logging.info("Profiler: CPU profile written to %s", path)
+        return path
+
+    # --- memory --------------------------------------------------------
+    def start_mem(self, frames: int = TRACE_FRAMES):
+        if self.mem_active:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._last_snapshot = tracemalloc.take_snapshot()
+        logging.info("Profiler: tracemalloc started (%d frames)", frames)
+
+    def snapshot_mem(self) -> str | None:
+        """Writes a ``.snap`` and a ``.txt`` diff against the previous snapshot."""
+        if not self.mem_active:
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        path = self._path("mem", ".snap")
+        snapshot.dump(path)
+        with open(path[:-5] + ".txt", "w", encoding="utf-8") as f:
+            current, peak = tracemalloc.get_traced_memory()
+            f.write(f"Traced: {current / 1024:.1f} KiB (peak {peak / 1024:.1f} KiB)\n")
+            f.write(diff_snapshots(self._last_snapshot, snapshot))
+        self._last_snapshot = snapshot
+        logging.info("Profiler: memory snapshot written to %s", path)
+        return path
+
+    def stop_mem(self) -> str | None:
+        path = self.snapshot_mem()
+        self._last_snapshot = None
+        tracemalloc.stop()
+        return path
+
+    # --- both ----------------------------------------------------------
+    @property
+    def active(self) -> bool:
+        return self.cpu_active or self.mem_active
+
+    def start(self, cpu: bool = True, mem: bool = True):
+        if cpu:
+            self.start_cpu()
+        if mem:
+            self.start_mem()
+
+    def stop(self) -> list[str]:
+        """Stops whatever runs; returns the written dump paths."""
+        return [p for p in (self.stop_cpu(), self.stop_mem() if self.mem_active else None) if p]
+
+
+PROFILER = Profiler()
+
+
+def _main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ledapp.util.profiling")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diff = commands.add_parser("diff", help="top-N allocation diff between two .snap files")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--top", type=int, default=TOP_N)
+    diff.add_argument("--by", choices=("lineno", "filename", "traceback"), default="lineno")
+    stats = commands.add_parser("stats", help="print the top functions of a .prof file")
+    stats.add_argument("path")
+    stats.add_argument("--sort", default="cumulative")
+    stats.add_argument("--top", type=int, default=TOP_N)
+    args = parser.parse_args(argv)
+    if args.command == "diff":
+        old, new = tracemalloc.Snapshot.load(args.old), tracemalloc.Snapshot.load(args.new)
+        print(diff_snapshots(old, new, args.top, args.by), end="")
+    else:
+        pstats.Stats(args.path).sort_stats(args.sort).print_stats(args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
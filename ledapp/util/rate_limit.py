@@ -0,0 +1,141 @@
+"""Per-device token bucket in front of the BLE writes.
+
+The cheap controllers drop or garble writes that come too fast. Every GATT
+write (``BLEService``, and the schedule corrections and keep-alive pings
+of the reconnect loop) first takes a token from the device's bucket. The
+bucket holds at most ``burst`` tokens and refills at ``rate`` tokens per
+second. With no token left the writer waits for the next one, so callers
+see backpressure (a slower ``send_command``) instead of a lost frame.
+
+The rate is either configured (``ble_write_rate`` setting, writes per
+second) or learned: additive increase, multiplicative decrease. A failed
+write on a link that is still up halves the rate (down to ``MIN_RATE``) and
+drains the burst. ``SUCCESS_STREAK`` successful writes in a row that had to
+wait for a token raise it by ``INCREASE`` (up to ``MAX_RATE``). A failure
+that came with a lost connection says nothing about the rate and is
+ignored. Sparse writes (a ping every 20 s) never wait, so they do not raise
+the rate either.
+
+All waiting goes through the clock (``util.clock``), so soak runs and
+simulations drive the buckets in virtual time. The buckets live for the
+process, keyed by device address: a reconnect keeps what was learned.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from . import metrics
+from .clock import get_clock
+
+DEFAULT_RATE = 10.0  # writes per second; the starting point of the learned rate
+DEFAULT_BURST = 4
+MIN_RATE = 1.0
+MAX_RATE = 40.0
+DECREASE = 0.5  # rate factor after a failed write
+INCREASE = 1.0  # writes per second added after a streak of throttled successes
+SUCCESS_STREAK = 20
+MIN_WAIT = 0.001  # shortest token wait; a rounding-sized one would not move an epoch-based clock
+
+WAITS = metrics.histogram("ble_rate_limit_wait_seconds", "Time writes waited for a rate limiter token",
+                          (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+THROTTLED = metrics.counter("ble_rate_limit_throttled", "Writes that had to wait for a token")
+DECREASES = metrics.counter("ble_rate_limit_decreases", "Learned rate reductions after a failed write")
+RATE = metrics.gauge("ble_write_rate", "Write rate limit of the last used device (writes per second)")
+
+
+class TokenBucket:
+    """Token bucket of one device; ``adaptive`` buckets learn their rate."""
+
+    def __init__(self, name: str, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, adaptive: bool = True,
+                 min_rate: float = MIN_RATE, max_rate: float = MAX_RATE):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self.adaptive = adaptive
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self._tokens = float(self.burst)
+        self._stamp = None  # clock.monotonic() of the last refill
+        self._throttled = False  # the last acquire had to wait
+        self._streak = 0
+
+    def _refill(self, now: float):
+        if self._stamp is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    async def acquire(self, clock=None) -> float:
+        """Takes a token, waiting for it if needed; returns the seconds waited."""
+        clock = clock or get_clock()
+        started = clock.monotonic()
+        slept = False  # only a real wait counts as throttled, not the time between two clock reads
+        while True:
+            now = clock.monotonic()
+            self._refill(now)
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                break
+            await clock.sleep(max(MIN_WAIT, (1.0 - self._tokens) / self.rate))
+            slept = True
+        self._throttled = slept
+        if not slept:
+            RATE.set(self.rate)
+            return 0.0
+        waited = now - started
+        THROTTLED.inc()
+        WAITS.observe(waited)
+        RATE.set(self.rate)
+        return waited
+
+    def record_success(self):
+        if not self.adaptive:
+            return
+        if not self._throttled:
+            return  # an unhurried write says nothing about the limit
+        self._streak += 1
+        if self._streak >= SUCCESS_STREAK and self.rate < self.max_rate:
+            self._streak = 0
+            self.rate = min(self.max_rate, self.rate + INCREASE)
+            RATE.set(self.rate)
+            logging.debug("Rate limit %s: raised to %.1f writes/s", self.name, self.rate)
+
+    def record_failure(self, connected: bool = True):
+        """A failed write; only one on a link that is still ``connected`` lowers the learned rate."""
+        self._streak = 0
+        if not self.adaptive or not connected:
+            return
+        self.rate = max(self.min_rate, self.rate * DECREASE)
+        self._tokens = min(self._tokens, 0.0)
+        DECREASES.inc()
+        RATE.set(self.rate)
+        logging.info("Rate limit %s: write failed, lowered to %.1f writes/s", self.name, self.rate)
+
+    def snapshot(self) -> dict:
+        return {"rate": round(self.rate, 2), "burst": self.burst, "adaptive": self.adaptive,
+                "tokens": round(self._tokens, 2)}
+
+
+_settings = {"rate": None, "burst": DEFAULT_BURST}
+_buckets = {}
+
+
+def configure(rate: float | None = None, burst: int | None = None):
+    """Settings of the buckets created from now on; ``rate`` None (or 0) means learned."""
+    _settings["rate"] = rate or None
+    _settings["burst"] = burst or DEFAULT_BURST
+
+
+def for_device(address: str | None) -> TokenBucket:
+    """The bucket of ``address``, created on first use."""
+    key = (address or "").upper()
+    bucket = _buckets.get(key)
+    if bucket is None:
+        rate = _settings["rate"]
+        bucket = _buckets[key] = TokenBucket(key or "?", rate or DEFAULT_RATE, _settings["burst"], adaptive=rate is None)
+    return bucket
+
+
+def snapshot() -> dict:
+    """``{address: bucket state}`` of every device written to so far."""
+    return {key: bucket.snapshot() for key, bucket in _buckets.items()}
@@ -0,0 +1,282 @@
+"""Priority-aware task manager for the shared asyncio loop.
+
+:class:`TaskManager` (``AsyncHelper.tasks``) runs submitted coroutines on
+the loop with
+
+* a priority class, :class:`Priority`: user command > schedule >
+  keep-alive > scan. User tasks start at once. Background tasks (every
+  other class) share ``max_background`` slots; the ones waiting for a
+  slot start in priority order, then in submission order;
+* an optional timeout per task (``asyncio.wait_for``). A task over its
+  timeout fails with ``TimeoutError``;
+* keyed deduplication. A submit with the ``key`` of a task still queued or
+  running joins that task (its future is returned, the new coroutine is
+  closed unused). ``replace=True`` cancels the old task instead and runs
+  the new one;
+* cancel by key, and :meth:`TaskManager.snapshot`, the live table of the
+  queued and running tasks (``ledapp ctl tasks``).
+
+The priority of the running task is kept in a context variable. The BLE
+write queue (:class:`PriorityLock` in ``BLEService``) reads it, so a user's
+power-off is written before the background writes queued ahead of it.
+Code not started through the manager (the control front-ends, direct
+awaits) counts as a user command; :func:`priority` marks a block as
+background work, e.g. the frames of a scene.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from . import metrics
+
+MAX_BACKGROUND = 3  # background tasks running at once (the reconnect loop holds one)
+
+
+class Priority(IntEnum):
+    USER = 0
+    SCHEDULE = 1
+    KEEPALIVE = 2
+    SCAN = 3
+
+
+_PRIORITY = contextvars.ContextVar("task_priority", default=Priority.USER)
+
+QUEUED = metrics.gauge("task_manager_queued", "Background tasks waiting for a slot")
+RUNNING = metrics.gauge("task_manager_running", "Tasks running under the task manager")
+QUEUE_WAIT = metrics.histogram("task_manager_queue_wait_seconds", "Submit-to-start time of managed tasks")
+DEDUPLICATED = metrics.counter("task_manager_deduplicated", "Submits joined to a running task with the same key")
+TIMEOUTS = metrics.counter("task_manager_timeouts", "Managed tasks cancelled by their timeout")
+
+
+def current_priority() -> Priority:
+    """Priority of the running task (USER outside the manager)."""
+    return _PRIORITY.get()
+
+
+@contextlib.contextmanager
+def priority(value: Priority):
+    """Runs the block (in the current task) with priority ``value``."""
+    token = _PRIORITY.set(Priority(value))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+@dataclass(eq=False)
+class ManagedTask:
+    """One submitted coroutine; ``future`` is a thread-safe ``concurrent.futures.Future``."""
+
+    name: str
+    priority: Priority
+    key: str | None
+    timeout: float | None
+    seq: int
+    coro: object = field(repr=False)
+    future: Future = field(default_factory=Future, repr=False)
+    submitted: float = field(default_factory=time.monotonic)
+    started: float | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+    @property
+    def state(self) -> str:
+        return "queued" if self.started is None else "running"
+
+
+class TaskManager:
+    """Runs coroutines on ``loop`` by priority; all public methods are thread-safe."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_background: int = MAX_BACKGROUND):
+        self.loop = loop
+        self.max_background = max_background
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._tasks = {}  # seq -> ManagedTask, queued or running
+        self._by_key = {}
+        self._queue = []  # heap of (priority, seq, task) waiting for a background slot (loop thread)
+        self._background = 0  # background tasks running (loop thread)
+
+    def submit(self, coro, priority: Priority = Priority.USER, key: str | None = None,
+               timeout: float | None = None, replace: bool = False, name: str | None = None) -> Future:
+        """Queues ``coro``; returns the future of its result (or of the task it was joined to)."""
+        name = name or getattr(coro, "__qualname__", type(coro).__name__)
+        with self._lock:
+            existing = self._by_key.get(key) if key is not None else None
+            if existing is not None and existing.future.done():
+                existing = None
+            if existing is not None and not replace:
+                coro.close()
+                DEDUPLICATED.inc()
+                logging.debug("Tasks: %s joined the running %s (key %s)", name, existing.name, key)
+                return existing.future
+            managed = ManagedTask(name, Priority(priority), key, timeout, next(self._seq), coro)
+            self._tasks[managed.seq] = managed
+            if key is not None:
+                self._by_key[key] = managed
+        if existing is not None:
+            existing.future.cancel()  # replaced; outside the lock, the callback forgets it
+        managed.future.add_done_callback(lambda future: self._on_future_done(managed))
+        self._call_in_loop(self._enqueue, managed)
+        return managed.future
+
+    def cancel(self, key: str) -> bool:
+        """Cancels the queued or running task submitted with ``key``."""
+        with self._lock:
+            managed = self._by_key.get(key)
+        return managed is not None and managed.future.cancel()
+
+    def snapshot(self) -> list[dict]:
+        """The in-flight table: queued and running tasks, by priority."""
+        now = time.monotonic()
+        with self._lock:
+            tasks = sorted(self._tasks.values(), key=lambda t: (t.priority, t.seq))
+        return [{"name": t.name, "priority": t.priority.name.lower(), "key": t.key, "state": t.state,
+                 "age": round(now - t.submitted, 3), "timeout": t.timeout} for t in tasks]
+
+    # --- loop thread -----------------------------------------------------
+    def _call_in_loop(self, function, managed):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            function(managed)
+        else:
+            try:
+                self.loop.call_soon_threadsafe(function, managed)
+            except RuntimeError:  # loop closed
+                managed.coro.close()
+                managed.future.cancel()
+
+    def _enqueue(self, managed: ManagedTask):
+        if managed.future.done():  # cancelled before it reached the loop
+            managed.coro.close()
+            return
+        if managed.priority == Priority.USER or self._background < self.max_background:
+            self._start(managed)
+        else:
+            heapq.heappush(self._queue, (managed.priority, managed.seq, managed))
+            QUEUED.set(len(self._queue))
+
+    def _start(self, managed: ManagedTask):
+        managed.started = time.monotonic()
+        QUEUE_WAIT.observe(managed.started - managed.submitted)
+        RUNNING.inc()
+        if managed.priority != Priority.USER:
+            self._background += 1
+        managed.task = self.loop.create_task(self._run(managed), name=managed.name)
+        managed.task.add_done_callback(lambda task: self._finished(managed, task))
+
+    async def _run(self, managed: ManagedTask):
+        _PRIORITY.set(managed.priority)  # the task runs in its own copy of the context
+        if managed.timeout is None:
+            return await managed.coro
+        try:
+            return await asyncio.wait_for(managed.coro, managed.timeout)
+        except asyncio.TimeoutError:
+            TIMEOUTS.inc()
+            logging.warning("Tasks: %s timed out after %.1fs", managed.name, managed.timeout)
+            raise
+
+    def _finished(self, managed: ManagedTask, task: asyncio.Task):
+        RUNNING.dec()
+        if managed.priority != Priority.USER:
+            self._background -= 1
+        self._forget(managed)
+        try:
+            if task.cancelled():
+                managed.future.cancel()
+            elif task.exception() is not None:
+                managed.future.set_exception(task.exception())
+            else:
+                managed.future.set_result(task.result())
+        except InvalidStateError:
+            pass  # cancelled by the caller meanwhile
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._queue and self._background < self.max_background:
+            _priority, _seq, managed = heapq.heappop(self._queue)
+            self._start(managed)
+        QUEUED.set(len(self._queue))
+
+    def _on_future_done(self, managed: ManagedTask):
+        if managed.future.cancelled():
+            self._call_in_loop(self._cancel, managed)
+
+    def _cancel(self, managed: ManagedTask):
+        if managed.task is not None:
+            managed.task.cancel()
+            return
+        entry = (managed.priority, managed.seq, managed)
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            QUEUED.set(len(self._queue))
+        managed.coro.close()
+        self._forget(managed)
+
+    def _forget(self, managed: ManagedTask):
+        with self._lock:
+            self._tasks.pop(managed.seq, None)
+            if managed.key is not None and self._by_key.get(managed.key) is managed:
+                del self._by_key[managed.key]
+
+
+class PriorityLock:
+    """``asyncio.Lock`` that is handed to the waiter of the highest priority, FIFO within one class.
+
+    The priority is the waiting task's :func:`current_priority`.
+    """
+
+    def __init__(self):
+        self._locked = False
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+    def locked(self) -> bool:
+        return self._locked
+
+    async def acquire(self) -> bool:
+        if not self._locked and not self._waiters:
+            self._locked = True
+            return True
+        entry = (current_priority(), next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        try:
+            await entry[2]
+        except asyncio.CancelledError:
+            if entry[2].done() and not entry[2].cancelled():
+                self.release()  # handed over just before the cancel: pass it on
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        return True  # handed over by release(); still locked
+
+    def release(self):
+        if not self._locked:
+            raise RuntimeError("PriorityLock is not acquired")
+        while self._waiters:
+            _priority, _seq, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self._locked = False
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
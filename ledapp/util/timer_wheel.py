@@ -0,0 +1,326 @@
+"""Hierarchical timer wheel: one place for all deadlines of an asyncio loop.
+
+Periodic work (the GUI2 clock, the reconnect loop's poll, the power-aware
+sleeps, retries) registers a deadline with a *tolerance* here, instead of
+arming its own ``QTimer`` or ``asyncio.sleep``. A timer fires no earlier
+than its deadline and no later than deadline + tolerance (plus the loop's
+scheduling lag). The wheel arms a single ``loop.call_at`` for the earliest
+such latest time. On that wakeup it also fires every other timer whose
+deadline has already passed, so deadlines that lie within each other's
+tolerance share one wakeup instead of waking the loop one by one.
+
+The wheel is hierarchical (``LEVELS`` levels of ``SLOTS`` slots). Level 0
+holds the next ``SLOTS`` ticks of ``RESOLUTION`` seconds, and each level
+above covers ``SLOTS`` times the span of the one below. Inserting and
+cancelling cost O(1). A slot of a higher level is redistributed to the
+lower levels when the time reaches it (cascading). The wheel is tickless:
+it does not wake up per tick, only for the earliest timer.
+
+There is one wheel per loop, from :func:`for_loop`. In the GUI that is the
+AsyncHelper loop, in the daemon its main loop. ``call_at``, ``call_later``,
+``call_every`` and :meth:`Timer.cancel` may be called from any thread. The
+callbacks run on the loop thread; a callback returning a coroutine is
+started as a task. GUI callbacks hop to the GUI thread themselves, e.g.
+through the window's ``run_in_gui_signal``.
+
+:meth:`TimerWheel.snapshot` lists everything scheduled (``ledapp ctl
+timers``), and the ``timer_wheel_*`` metrics count wakeups and how many
+timers each wakeup served.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import threading
+import weakref
+
+from . import metrics
+
+RESOLUTION = 0.01  # seconds per tick (level 0 slot)
+SLOTS = 64  # slots per level, a power of two
+LEVELS = 4  # 64**4 ticks of 10 ms: ~46 hours; later deadlines wait in the top level
+DEFAULT_TOLERANCE = 0.05
+MERGE_LEVELS = 2  # levels searched for passed deadlines on a wakeup (tolerances up to ~41 s)
+
+WAKEUPS = metrics.counter("timer_wheel_wakeups", "Loop wakeups of the timer wheels")
+FIRED = metrics.counter("timer_wheel_fired", "Timers fired by the timer wheels")
+MERGED = metrics.counter("timer_wheel_merged", "Timers fired before their latest time, on another timer's wakeup")
+PENDING = metrics.gauge("timer_wheel_pending", "Timers scheduled on the timer wheels")
+BATCH = metrics.histogram("timer_wheel_batch_size", "Timers fired per wakeup", (1, 2, 3, 5, 8, 13, 21))
+
+
+class Timer:
+    """A scheduled callback. Returned by the ``call_*`` methods of :class:`TimerWheel`."""
+
+    __slots__ = ("wheel", "callback", "args", "deadline", "tolerance", "period", "name",
+                 "cancelled", "_expires", "_slot", "_level", "__weakref__")
+
+    def __init__(self, wheel, callback, args, deadline, tolerance, period, name):
+        self.wheel = wheel
+        self.callback = callback
+        self.args = args
+        self.deadline = deadline  # loop time
+        self.tolerance = tolerance
+        self.period = period  # None for a one-shot timer
+        self.name = name
+        self.cancelled = False
+        self._expires = None  # tick the wheel fires it at, at the latest
+        self._slot = None  # the set holding it
+        self._level = None
+
+    def cancel(self):
+        """Removes the timer (thread-safe); a running periodic timer is not rescheduled."""
+        if not self.cancelled:
+            self.cancelled = True
+            self.wheel._call_in_loop(self.wheel._remove, self)
+
+    def __repr__(self):
+        kind = f"every {self.period:g}s" if self.period else "once"
+        return f"<Timer {self.name} {kind} at {self.deadline:.3f}+{self.tolerance:g}>"
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TimerWheel:
+    """The timers of one asyncio loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, resolution: float = RESOLUTION,
+                 slots: int = SLOTS, levels: int = LEVELS):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.loop = loop
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._origin = loop.time()
+        self._tick = 0  # last tick processed
+        self._wheel = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._counts = [0] * levels
+        self._handle = None  # asyncio handle of the next wakeup
+        self._wake_tick = None
+        self.wakeups = 0
+        self.fired = 0
+
+    # --- scheduling (any thread) -----------------------------------------
+    def call_at(self, when: float, callback, *args, tolerance: float = DEFAULT_TOLERANCE, name: str | None = None) -> Timer:
+        """``callback(*args)`` once, at loop time ``when`` (+ up to ``tolerance`` seconds)."""
+        return self._add(when, callback, args, tolerance, None, name)
+
+    def call_later(self, delay: float, callback, *args, tolerance: float = DEFAULT_TOLERANCE,
+                   name: str | None = None) -> Timer:
+        """``callback(*args)`` once, ``delay`` seconds from now (+ up to ``tolerance`` seconds)."""
+        return self._add(self.loop.time() + max(0.0, delay), callback, args, tolerance, None, name)
+
+    def call_every(self, period: float, callback, *args, tolerance: float = DEFAULT_TOLERANCE,
+                   delay: float | None = None, name: str | None = None) -> Timer:
+        """``callback(*args)`` every ``period`` seconds until cancelled.
+
+        The first call is ``delay`` seconds from now (default: ``period``).
+        The deadlines stay on that grid: a late or merged wakeup does not
+        shift the next one, and periods missed altogether are skipped.
+        """
+        if period <= 0:
+            raise ValueError("period must be positive")
+        first = self.loop.time() + (period if delay is None else max(0.0, delay))
+        return self._add(first, callback, args, tolerance, period, name)
+
+    async def sleep(self, delay: float, tolerance: float = DEFAULT_TOLERANCE, name: str = "sleep"):
+        """``asyncio.sleep`` through the wheel (on the wheel's loop)."""
+        future = self.loop.create_future()
+        timer = self.call_later(delay, _resolve, future, tolerance=tolerance, name=name)
+        try:
+            await future
+        finally:
+            timer.cancel()
+
+    def _add(self, deadline, callback, args, tolerance, period, name) -> Timer:
+        timer = Timer(self, callback, args, deadline, max(0.0, tolerance), period,
+                      name or getattr(callback, "__qualname__", None) or repr(callback))
+        self._call_in_loop(self._schedule, timer)
+        return timer
+
+    def _call_in_loop(self, function, timer):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            function(timer)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(function, timer)
+
+    # --- the wheel (loop thread) -----------------------------------------
+    def _ticks(self, when: float) -> float:
+        return (when - self._origin) / self.resolution
+
+    def _schedule(self, timer: Timer):
+        if timer.cancelled:
+            return
+        # Not before the deadline, not after deadline + tolerance (a tick is the finest step)
+        expires = max(math.ceil(self._ticks(timer.deadline)), math.floor(self._ticks(timer.deadline + timer.tolerance)))
+        self._place(timer, max(expires, self._tick + 1))
+        PENDING.inc()
+        if self._wake_tick is None or timer._expires < self._wake_tick:
+            self._arm(timer._expires)
+
+    def _place(self, timer: Timer, expires: int):
+        timer._expires = expires
+        for level in range(self.levels):
+            shift = level * self._bits
+            if (expires >> shift) - (self._tick >> shift) < self.slots:
+                break
+        else:
+            # Beyond the top level: parked in its last slot, placed again when that slot cascades
+            expires = (self._tick >> shift) + self.slots - 1 << shift
+        slot = self._wheel[level][(expires >> shift) & self._mask]
+        slot.add(timer)
+        timer._slot, timer._level = slot, level
+        self._counts[level] += 1
+
+    def _remove(self, timer: Timer):
+        if timer._slot is None:
+            return  # fired, or not scheduled yet
+        timer._slot.discard(timer)
+        self._counts[timer._level] -= 1
+        timer._slot = None
+        PENDING.dec()
+        expires = timer._expires
+        if expires == self._wake_tick:
+            self._arm(self._next_tick())
+
+    def _arm(self, tick):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle, self._wake_tick = None, tick
+        if tick is not None:
+            self._handle = self.loop.call_at(self._origin + tick * self.resolution, self._wake)
+
+    def _next_tick(self):
+        """The earliest expiry tick of all timers, None when the wheel is empty."""
+        best = None
+        for level in range(self.levels):
+            if not self._counts[level]:
+                continue
+            base = self._tick >> level * self._bits
+            for offset in range(self.slots):
+                slot = self._wheel[level][(base + offset) & self._mask]
+                if slot:
+                    earliest = min(timer._expires for timer in slot)
+                    best = earliest if best is None else min(best, earliest)
+                    break  # the slots of a level are in time order
+        return best
+
+    def _cascade(self, level: int, index: int):
+        slot = self._wheel[level][index]
+        if not slot:
+            return
+        timers = list(slot)
+        slot.clear()
+        self._counts[level] -= len(timers)
+        for timer in timers:
+            self._place(timer, timer._expires)
+
+    def _advance(self, target: int, due: list):
+        """Moves the wheel to tick ``target``; the expired timers go to ``due``."""
+        while self._tick < target:
+            span = 1  # jump straight to the next boundary of the lowest non-empty level
+            for level in range(self.levels):
+                if self._counts[level]:
+                    break
+                span <<= self._bits
+            else:
+                self._tick = target
+                return
+            tick = min((self._tick // span + 1) * span, target)
+            self._tick = tick
+            for level in range(self.levels - 1, 0, -1):
+                shift = level * self._bits
+                if not tick & ((1 << shift) - 1):
+                    self._cascade(level, (tick >> shift) & self._mask)
+            slot = self._wheel[0][tick & self._mask]
+            if slot:
+                self._counts[0] -= len(slot)
+                due.extend(slot)
+                slot.clear()
+
+    def _wake(self):
+        wake_tick = self._wake_tick
+        self._handle = self._wake_tick = None
+        now = self.loop.time()
+        due = []
+        # The loop may run the handle a clock resolution early: the armed tick counts as reached
+        self._advance(max(math.floor(self._ticks(now)), wake_tick or 0), due)
+        merged = 0
+        for level in range(min(MERGE_LEVELS, self.levels)):
+            if not self._counts[level]:
+                continue
+            for slot in self._wheel[level]:
+                if not slot:
+                    continue
+                ready = [timer for timer in slot if timer.deadline <= now]
+                for timer in ready:
+                    slot.discard(timer)
+                self._counts[level] -= len(ready)
+                merged += len(ready)
+                due.extend(ready)
+        if due:
+            self.wakeups += 1
+            WAKEUPS.inc()
+            MERGED.inc(merged)
+            BATCH.observe(len(due))
+            due.sort(key=lambda timer: timer.deadline)
+            for timer in due:
+                timer._slot = None
+                PENDING.dec()
+                self._fire(timer, now)
+        self._arm(self._next_tick())
+
+    def _fire(self, timer: Timer, now: float):
+        if timer.cancelled:
+            return
+        self.fired += 1
+        FIRED.inc()
+        if timer.period:
+            missed = max(0, math.floor((now - timer.deadline) / timer.period))
+            timer.deadline += (missed + 1) * timer.period
+        try:
+            result = timer.callback(*timer.args)
+            if asyncio.iscoroutine(result):
+                self.loop.create_task(result, name=timer.name)
+        except Exception:
+            logging.exception("Timer wheel: %s failed", timer.name)
+        if timer.period and not timer.cancelled:
+            self._schedule(timer)
+
+    # --- introspection ---------------------------------------------------
+    def snapshot(self) -> list[dict]:
+        """Every scheduled timer, earliest first (call on the loop thread)."""
+        now = self.loop.time()
+        timers = [timer for level in self._wheel for slot in level for timer in slot]
+        timers.sort(key=lambda timer: timer.deadline)
+        return [{"name": timer.name, "due_in": round(timer.deadline - now, 3), "tolerance": timer.tolerance,
+                 "period": timer.period} for timer in timers]
+
+    def __len__(self):
+        return sum(self._counts)
+
+
+_wheels = weakref.WeakKeyDictionary()
+_wheels_lock = threading.Lock()
+
+
+def for_loop(loop: asyncio.AbstractEventLoop | None = None) -> TimerWheel:
+    """The timer wheel of ``loop`` (default: the running loop), created on first use."""
+    loop = loop or asyncio.get_running_loop()
+    with _wheels_lock:
+        wheel = _wheels.get(loop)
+        if wheel is None:
+            wheel = _wheels[loop] = TimerWheel(loop)
+        return wheel
@@ -0,0 +1,169 @@
+"""Opt-in span tracer with Chrome / Perfetto trace-event export.
+
+Spans are recorded with ``time.perf_counter_ns`` into a bounded ring
+buffer, so a long-running app keeps only the most recent events. Code
+running inside an asyncio task gets the task as its own track (a
+synthetic ``tid``), so overlapping coroutines on one loop thread show up
+side by side instead of as broken nesting. Load the exported JSON in
+``chrome://tracing`` or https://ui.perfetto.dev.
+
+While the tracer is disabled, ``span()`` returns a shared no-op context
+manager, so instrumented code costs one attribute check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_CAPACITY = 20000
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def set(self, **_args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _track() -> tuple[int, str]:
+    """(tid, track name) of the caller: its asyncio task, else its thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task) & 0x7FFFFFFF, f"task {task.get_name()}"
+    thread = threading.current_thread()
+    return thread.ident & 0x7FFFFFFF, f"thread {thread.name}"
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start", "tid")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        """Adds arguments once the span is open (e.g. a result)."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.tid = self.tracer._register_track()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, _exc, _tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._complete(self.name, self.cat, self.start, time.perf_counter_ns(), self.tid, self.args)
+        return False
+
+
+class Tracer:
+    """Ring buffer of trace events; disabled until :meth:`start` is called."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.enabled = False
+        self._events = deque(maxlen=capacity)
+        self._tracks = {}  # tid -> track name
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    @property
+    def capacity(self) -> int:
+        return self._events.maxlen
+
+    def start(self, capacity: int | None = None):
+        if capacity and capacity != self._events.maxlen:
+            self._events = deque(self._events, maxlen=capacity)
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+        self._tracks.clear()
+
+    def span(self, name: str, cat: str = "app", **args):
+        """``with tracer.span("ble.write", "ble", command=...):`` records one span."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, cat, args)
+
+    def instant(self, name: str, cat: str = "app", **args):
+        if self.enabled:
+            tid = self._register_track()
+            self._events.append(("i", name, cat, time.perf_counter_ns(), 0, tid, args))
+
+    def complete(self, name: str, cat: str, start_ns: int, end_ns: int, track: str, **args):
+        """Records a span measured elsewhere (e.g. across threads) on a named track."""
+        if self.enabled:
+            tid = hash(track) & 0x7FFFFFFF
+            if tid not in self._tracks:
+                if len(self._tracks) >= self._events.maxlen:
+                    self._prune_tracks()
+                self._tracks[tid] = track
+            self._complete(name, cat, start_ns, end_ns, tid, args)
+
+    def _register_track(self) -> int:
+        tid, track = _track()
+        if self._tracks.get(tid) != track:
+            if len(self._tracks) >= self._events.maxlen:
+                self._prune_tracks()
+            self._tracks[tid] = track  # task ids are reused, the newest name wins
+        return tid
+
+    def _prune_tracks(self):
+        """Forgets tracks whose events already left the ring buffer."""
+        live = {event[5] for event in list(self._events)}
+        self._tracks = {tid: track for tid, track in self._tracks.items() if tid in live}
+
+    def _complete(self, name, cat, start_ns, end_ns, tid, args):
+        self._events.append(("X", name, cat, start_ns, end_ns - start_ns, tid, args))
+
+    # --- export --------------------------------------------------------
+    def to_chrome(self) -> dict:
+        origin, pid = self._origin, self._pid
+        events = [{"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": "LEDapp"}}]
+        events.extend({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": track}}
+                      for tid, track in list(self._tracks.items()))
+        for ph, name, cat, start, duration, tid, args in list(self._events):
+            event = {"ph": ph, "name": name, "cat": cat, "pid": pid, "tid": tid,
+                     "ts": (start - origin) / 1000.0, "args": args}
+            if ph == "X":
+                event["dur"] = duration / 1000.0
+            else:
+                event["s"] = "t"
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> int:
+        """Writes the buffer as Chrome trace JSON; returns the number of events."""
+        trace = self.to_chrome()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, default=str)
+        return len(trace["traceEvents"])
+
+
+TRACER = Tracer()
+
+span = TRACER.span
+instant = TRACER.instant
@@ -0,0 +1,31 @@
+from ledapp.core.device_registry import DeviceRegistry
+
+
+def _registry(tmp_path):
+    registry = DeviceRegistry(str(tmp_path / "devices.json"))
+    registry.observe([("ELK-BLEDOM", "aa:00:00:00:00:01", -60), ("ELK-BLEDOM", "aa:00:00:00:00:02", -70)])
+    registry.update("AA:00:00:00:00:01", friendly_name="Nappali")
+    return registry
+
+
+def test_readdress_never_replaces_an_identified_device(tmp_path):
+    registry = _registry(tmp_path)
+    registry.update("AA:00:00:00:00:02", friendly_name="Konyha", groups=["fsz"])
+
+    assert registry.readdress("AA:00:00:00:00:01", "AA:00:00:00:00:02") is None
+
+    reloaded = DeviceRegistry(registry.path)
+    assert reloaded.get("AA:00:00:00:00:01").label == "Nappali"
+    assert reloaded.get("AA:00:00:00:00:02").label == "Konyha"
+    assert [r.address for r in reloaded.group("fsz")] == ["AA:00:00:00:00:02"]
+
+
+def test_readdress_merges_a_scan_only_record(tmp_path):
+    registry = _registry(tmp_path)
+
+    moved = registry.readdress("AA:00:00:00:00:01", "AA:00:00:00:00:02")
+
+    assert moved.address == "AA:00:00:00:00:02" and moved.label == "Nappali"
+    assert registry.get("AA:00:00:00:00:01") is None
+    assert [r.address for r in registry.find("nappali")] == ["AA:00:00:00:00:02"]
+    assert sorted(rssi for _ts, rssi in moved.rssi) == [-70, -60]
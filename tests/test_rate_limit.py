@@ -0,0 +1,43 @@
+import asyncio
+
+from ledapp.util import rate_limit
+from ledapp.util.clock import RealClock, VirtualClock
+from ledapp.util.rate_limit import TokenBucket
+
+
+def _write_every(bucket, clock, count, spacing):
+    async def writes():
+        for _ in range(count):
+            await bucket.acquire(clock)
+            bucket.record_success()
+            await clock.sleep(spacing)
+    if isinstance(clock, VirtualClock):
+        clock.run(writes())
+    else:
+        asyncio.run(writes())
+
+
+def test_spaced_writes_leave_rate_unchanged():
+    clock = VirtualClock()
+    bucket = TokenBucket("test")
+    throttled = rate_limit.THROTTLED.value
+    _write_every(bucket, clock, 3 * rate_limit.SUCCESS_STREAK, 20.0)  # keep-alive pings
+    assert bucket.rate == rate_limit.DEFAULT_RATE
+    assert rate_limit.THROTTLED.value == throttled
+
+
+def test_unhurried_writes_on_real_clock_are_not_throttled():
+    bucket = TokenBucket("test", burst=100)
+    throttled = rate_limit.THROTTLED.value
+    _write_every(bucket, RealClock(), 25, 0.0)
+    assert bucket.rate == rate_limit.DEFAULT_RATE
+    assert rate_limit.THROTTLED.value == throttled
+
+
+def test_throttled_streak_raises_rate():
+    clock = VirtualClock()
+    bucket = TokenBucket("test", burst=1)
+    throttled = rate_limit.THROTTLED.value
+    _write_every(bucket, clock, rate_limit.SUCCESS_STREAK + 1, 0.0)
+    assert bucket.rate == rate_limit.DEFAULT_RATE + rate_limit.INCREASE
+    assert rate_limit.THROTTLED.value == throttled + rate_limit.SUCCESS_STREAK